@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Local ATLAS API Server
+
+Self-hosted equivalent of the Cloudflare Worker API used by index.html, so
+the map can run against a local dataset and the API can be load-tested.
+
+Endpoints (GET, JSON, CORS-enabled):
+    /api/all                      {"count": n, "results": [...]}
+    /api/search?q=miami&limit=100 {"query": q, "count": n, "results": [...]}
+    /api/suggest?q=fra&limit=10   {"query": q, "suggestions": [{"text": t, "count": n}, ...]}
+    /api/country?name=Germany     {"country": name, "count": n, "results": [...]}
+    /api/filter?country=Germany&company=Equinix&limit=100
+                                  {"count": n, "facets": {"country": [...], ...}, "results": [...]}
+    /api/stats                    {"total": n, "countries": k, "companies": m, "regions": [...], ...}
+    /api/clusters?zoom=5&bbox=south,west,north,east
+                                  {"zoom": z, "count": n, "clusters": [{"lat", "lon", "count", ...}]}
+
+/api/filter takes any of country, company, state, quality (repeat a
+parameter to match any of several values) and returns the matching count,
+top-20 facet counts per column within the filter, and the first limit rows.
+
+- Dataset is loaded once into in-memory indexes: bitmap filter index
+  (bitmap_index.py) for /api/country and /api/filter, text index
+  (search_index.py, loaded from disk when present) for search and suggest
+- /api/clusters returns precomputed marker clusters (cluster_pyramid.py)
+  for a zoom level and viewport, so the map does not cluster client-side
+- /api/stats is the stats JSON the pipeline writes (stats_engine.py), or
+  built at startup when that file is missing or stale
+- Response bodies are gzip-compressed once and served pre-compressed to
+  clients that accept gzip
+- Strong ETags on every response; If-None-Match returns 304
+- Small LRU cache of rendered responses for search/country queries
+- HTTP/1.1 keep-alive on plain asyncio streams (no framework dependency)
+- A handler error is logged with its traceback and answered with a 500
+  JSON error; the connection and server keep running
+
+Usage:
+    python api_server.py [--host 127.0.0.1] [--port 8787] [--data datacenters_cleaned.json]
+                         [--index datacenters_cleaned.search.npz] [--stats datacenters_cleaned.stats.json]
+
+Point index.html at it by setting API_BASE = 'http://127.0.0.1:8787'.
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+import traceback
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from bitmap_index import FILTER_COLUMNS, BitmapIndex
+from cluster_pyramid import ClusterPyramid
+from dataset_io import load_dataset
+from search_index import INDEX_FILE, SUGGEST_LIMIT, SearchIndex, load_or_build
+from stats_engine import STATS_FILE, DatasetStats
+from stats_engine import load_or_build as load_or_build_stats
+
+DATA_FILE = 'datacenters_cleaned.json'
+HOST = '127.0.0.1'
+PORT = 8787
+
+CACHE_SIZE = 256          # Rendered search/country responses kept in the LRU
+SEARCH_LIMIT = 100        # Default max results for /api/search
+MAX_REQUEST_LINE = 8192
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+
+
+class Response:
+    """A rendered JSON response: raw + gzip body and ETag, built once"""
+
+    __slots__ = ('status', 'body', 'gzip_body', 'etag')
+
+    def __init__(self, payload, status=200):
+        self.status = status
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=6)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+
+
+class LRUCache:
+    """Fixed-size least-recently-used cache"""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self.items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return item
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+
+class DatasetAPI:
+    """In-memory indexes and response rendering for the API endpoints"""
+
+    def __init__(self, data, search_index=None, stats=None):
+        self.data = data
+        self.filters = BitmapIndex.from_records(data)
+        self.country_names = {country.lower(): country for country in self.filters.value_counts('country')}
+
+        self.index = search_index if search_index is not None else SearchIndex.from_records(data)
+        self.pyramid = ClusterPyramid.from_records(data)
+
+        self.cache = LRUCache()
+        self.all_response = Response({'count': len(data), 'results': data})
+        self.stats = stats if stats is not None else DatasetStats.from_records(data)
+        self.stats_response = Response(self.stats.to_json(full=False))
+
+    def search(self, query, limit):
+        return [self.data[i] for i in self.index.search(query, limit)]
+
+    def handle(self, path, params):
+        """Return a Response for an API path and parsed query params"""
+        if path == '/api/all':
+            return self.all_response
+        if path == '/api/stats':
+            return self.stats_response
+
+        if path == '/api/search':
+            query = params.get('q', [''])[0].strip()
+            if not query:
+                return Response({'error': 'missing q parameter'}, 400)
+            try:
+                limit = max(1, int(params.get('limit', [SEARCH_LIMIT])[0]))
+            except ValueError:
+                return Response({'error': 'invalid limit'}, 400)
+            key = ('search', query.lower(), limit)
+            response = self.cache.get(key)
+            if response is None:
+                results = self.search(query, limit)
+                response = Response({'query': query, 'count': len(results), 'results': results})
+                self.cache.put(key, response)
+            return response
+
+        if path == '/api/suggest':
+            query = params.get('q', [''])[0]
+            if not query.strip():
+                return Response({'error': 'missing q parameter'}, 400)
+            try:
+                limit = max(1, int(params.get('limit', [SUGGEST_LIMIT])[0]))
+            except ValueError:
+                return Response({'error': 'invalid limit'}, 400)
+            key = ('suggest', query.lower(), limit)
+            response = self.cache.get(key)
+            if response is None:
+                suggestions = [{'text': text, 'count': count} for text, count in self.index.suggest(query, limit)]
+                response = Response({'query': query, 'suggestions': suggestions})
+                self.cache.put(key, response)
+            return response
+
+        if path == '/api/country':
+            name = (params.get('name') or params.get('country') or [''])[0].strip()
+            if not name:
+                return Response({'error': 'missing name parameter'}, 400)
+            key = ('country', name.lower())
+            response = self.cache.get(key)
+            if response is None:
+                country = self.country_names.get(name.lower(), name)
+                rows = self.filters.filter(country=country).to_rows()
+                results = [self.data[i] for i in rows.tolist()]
+                response = Response({'country': country, 'count': len(results), 'results': results})
+                self.cache.put(key, response)
+            return response
+
+        if path == '/api/filter':
+            criteria = {column: params[column] for column in FILTER_COLUMNS if column in params}
+            try:
+                limit = max(0, int(params.get('limit', [SEARCH_LIMIT])[0]))
+            except ValueError:
+                return Response({'error': 'invalid limit'}, 400)
+            key = ('filter', tuple(sorted((c, tuple(v)) for c, v in criteria.items())), limit)
+            response = self.cache.get(key)
+            if response is None:
+                rows = self.filters.filter(**criteria)
+                facets = {column: [{'value': v, 'count': n} for v, n in self.filters.facets(column, rows)]
+                          for column in FILTER_COLUMNS}
+                results = [self.data[i] for i in rows.first(limit).tolist()]
+                response = Response({'count': len(rows), 'filters': criteria, 'facets': facets, 'results': results})
+                self.cache.put(key, response)
+            return response
+
+        if path == '/api/clusters':
+            try:
+                zoom = int(params.get('zoom', ['0'])[0])
+                bbox = params.get('bbox', ['-90,-180,90,180'])[0].split(',')
+                south, west, north, east = (round(float(v), 4) for v in bbox)
+            except ValueError:
+                return Response({'error': 'invalid zoom or bbox (south,west,north,east)'}, 400)
+            key = ('clusters', zoom, south, west, north, east)
+            response = self.cache.get(key)
+            if response is None:
+                clusters = self.pyramid.clusters(zoom, south, west, north, east)
+                response = Response({'zoom': min(max(zoom, self.pyramid.min_zoom), self.pyramid.max_zoom),
+                                     'count': len(clusters), 'clusters': clusters})
+                self.cache.put(key, response)
+            return response
+
+        return None
+
+
+NOT_FOUND = Response({'error': 'not found'}, 404)
+BAD_METHOD = Response({'error': 'method not allowed'}, 405)
+SERVER_ERROR = Response({'error': 'internal server error'}, 500)
+
+
+def render(response, request_headers, head_only=False):
+    """Serialize a Response to HTTP bytes, honoring gzip and If-None-Match"""
+    headers = [
+        ('Content-Type', 'application/json; charset=utf-8'),
+        ('ETag', response.etag),
+        ('Cache-Control', 'public, max-age=60'),
+        ('Vary', 'Accept-Encoding'),
+        ('Access-Control-Allow-Origin', '*'),
+    ]
+
+    status = response.status
+    body = b''
+    if status == 200 and response.etag in [t.strip() for t in request_headers.get('if-none-match', '').split(',')]:
+        status = 304
+    elif 'gzip' in request_headers.get('accept-encoding', ''):
+        headers.append(('Content-Encoding', 'gzip'))
+        body = response.gzip_body
+    else:
+        body = response.body
+
+    headers.append(('Content-Length', str(len(body))))
+    head = f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in headers) + "\r\n"
+    return head.encode('latin-1') + (b'' if head_only else body)
+
+
+class APIServer:
+    """Minimal HTTP/1.1 server for DatasetAPI"""
+
+    def __init__(self, api):
+        self.api = api
+        self.requests = 0
+        self.errors = 0
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line or len(request_line) > MAX_REQUEST_LINE:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                self.requests += 1
+                if method == 'OPTIONS':
+                    writer.write(b"HTTP/1.1 204 No Content\r\nAccess-Control-Allow-Origin: *\r\n"
+                                 b"Access-Control-Allow-Methods: GET, HEAD, OPTIONS\r\nContent-Length: 0\r\n\r\n")
+                else:
+                    if method not in ('GET', 'HEAD'):
+                        response = BAD_METHOD
+                    else:
+                        url = urlsplit(target)
+                        try:
+                            response = self.api.handle(unquote(url.path).rstrip('/') or '/',
+                                                       parse_qs(url.query)) or NOT_FOUND
+                        except Exception:
+                            # A handler bug must not drop the connection without a response
+                            self.errors += 1
+                            print(f"[ERROR] {method} {target}")
+                            traceback.print_exc()
+                            response = SERVER_ERROR
+                    writer.write(render(response, headers, head_only=(method == 'HEAD')))
+                await writer.drain()
+
+                if version == 'HTTP/1.0' or headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(data_file=DATA_FILE, host=HOST, port=PORT, index_file=INDEX_FILE, stats_file=STATS_FILE):
+    start = time.perf_counter()
+    data = load_dataset(data_file)
+    api = DatasetAPI(data, load_or_build(data, index_file, data_file),
+                     load_or_build_stats(data, stats_file, data_file))
+    print(f"Loaded {len(api.data)} facilities from {data_file} in {(time.perf_counter() - start)*1000:.0f}ms")
+    print(f"  search index: {len(api.index.vocab)} words")
+    print(f"  /api/all: {len(api.all_response.body)/1024:.0f}KB raw, {len(api.all_response.gzip_body)/1024:.0f}KB gzip")
+
+    server = APIServer(api)
+    listener = await asyncio.start_server(server.handle_connection, host, port)
+    print(f"Serving on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the ATLAS API locally')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--index', default=INDEX_FILE)
+    parser.add_argument('--stats', default=STATS_FILE)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.data, args.host, args.port, args.index, args.stats))
+    except KeyboardInterrupt:
+        print("\n[STOPPED] Server stopped")
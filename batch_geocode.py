@@ -3,109 +3,143 @@
 Batch Geocoding Script for ATLAS Data Center Project
 
 Uses OpenStreetMap Nominatim (free) to geocode facilities without coordinates.
-Processes ~3,973 facilities at 1 request/second (~1.1 hours total).
+Requests run concurrently across every endpoint in NOMINATIM_ENDPOINTS, so
+throughput is the sum of the endpoint rates (public Nominatim alone is
+~0.9 req/sec, ~1.1 hours for ~3,973 facilities).
 
 Features:
-- Free geocoding via Nominatim
-- Rate limiting (1 req/sec compliance)
+- Free geocoding via Nominatim (public or self-hosted instances)
+- Token-bucket rate limiting per endpoint (1 req/sec compliance on public)
+- Several requests in flight at once (see geocode_engine.py)
 - Progress tracking
-- Error handling and retry logic
-- Incremental saves (resume if interrupted)
-- Coordinate validation
+- Error handling and retry logic with exponential backoff
+- Append-only progress journal, replayed on resume; one atomic save at the end
+- Facilities sharing an address are geocoded once
+- Persistent SQLite cache of hits, misses and rejected results (see geocode_cache.py);
+  addresses that failed (timeouts, service errors) are not cached and are
+  retried on the next run
+- Coordinate validation against per-country bounds (see coord_validation.py)
+- City-level queries (no street address) are resolved offline from a GeoNames
+  gazetteer when its files are present (see gazetteer.py); only street
+  addresses and unresolved cities go to Nominatim
+- Geocoded coordinates are added to the processing manifest (see
+  process_manifest.py), so the next pipeline run keeps them for unchanged
+  records instead of leaving them to be geocoded again
+- Run report with per-stage timings, request latency histogram and
+  retry/timeout counts (batch_geocode.metrics.json, see run_metrics.py)
 """
 
-import json
 import time
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 from datetime import datetime
 
+from dataset_io import GeocodeJournal, load_dataset, save_dataset
+from geocode_cache import GeocodeCache, normalize_address
+from coord_validation import get_validator
+from geocode_engine import FAILED, GeocodeEngine
+from gazetteer import get_gazetteer, is_city_level
+from process_manifest import MANIFEST_FILE, ProcessManifest
+from run_metrics import RunMetrics
+
 # Configuration
 INPUT_FILE = 'datacenters_cleaned.json'
 OUTPUT_FILE = 'datacenters_cleaned.json'
+JOURNAL_FILE = 'datacenters_cleaned.geocode_journal.jsonl'
 BACKUP_FILE = f'datacenters_cleaned_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-RATE_LIMIT_DELAY = 1.1  # Seconds between requests (slightly over 1 sec for safety)
+CACHE_FILE = 'geocode_cache.sqlite'
+GEOCODE_VERSION = 1   # Bump to mark coordinates geocoded from here on as a new version
+
+# Cache TTLs in days per outcome - expired entries are geocoded again
+CACHE_TTL_DAYS = {'ok': 365, 'invalid': 90, 'miss': 30}
+
+# Nominatim endpoints - add self-hosted instances to raise throughput.
+# 'rate' is requests/sec, 'concurrency' is max requests in flight.
+NOMINATIM_ENDPOINTS = [
+    {'domain': 'nominatim.openstreetmap.org', 'scheme': 'https', 'rate': 0.9, 'burst': 1, 'concurrency': 1},
+    # {'domain': 'localhost:8080', 'scheme': 'http', 'rate': 20, 'burst': 20, 'concurrency': 8},
+]
 
-# Initialize geocoder
-geolocator = Nominatim(user_agent="atlas_datacenter_project_v2")
+# Initialize geocoder and coordinate validator (bounds table loaded once)
+engine = GeocodeEngine(NOMINATIM_ENDPOINTS)
+validator = get_validator()
 
 def geocode_address(address, max_retries=3):
-    """Geocode an address with retry logic"""
-    for attempt in range(max_retries):
-        try:
-            location = geolocator.geocode(address, timeout=10)
-            if location:
-                return [location.latitude, location.longitude]
-            return None
-        except GeocoderTimedOut:
-            if attempt < max_retries - 1:
-                time.sleep(2)
-                continue
-            return None
-        except GeocoderServiceError:
-            if attempt < max_retries - 1:
-                time.sleep(5)
-                continue
-            return None
-        except Exception as e:
-            print(f"    Error: {e}")
-            return None
-    return None
+    """Geocode a single address with retry/backoff logic"""
+    return engine.geocode(address, max_retries)
 
 def validate_coords(coords, country):
-    """Basic validation - coords should be within reasonable ranges"""
-    if not coords or len(coords) != 2:
-        return False
-
-    lat, lon = coords
-
-    # Basic range check
-    if lat < -90 or lat > 90 or lon < -180 or lon > 180:
-        return False
-
-    # Country-specific bounds (basic checks)
-    country_bounds = {
-        'United States': {'lat': (24, 50), 'lon': (-125, -66)},
-        'Brazil': {'lat': (-35, 5), 'lon': (-75, -30)},
-        'Australia': {'lat': (-44, -10), 'lon': (113, 154)},
-        'United Kingdom': {'lat': (49, 61), 'lon': (-8, 2)},
-        'Germany': {'lat': (47, 55), 'lon': (5, 16)},
-        'France': {'lat': (41, 51), 'lon': (-5, 10)},
-        'Canada': {'lat': (41, 84), 'lon': (-141, -52)},
-        'India': {'lat': (6, 36), 'lon': (68, 98)},
-        'South Africa': {'lat': (-35, -22), 'lon': (16, 33)},
-        'Singapore': {'lat': (1, 2), 'lon': (103, 104)},
-    }
-
-    if country in country_bounds:
-        bounds = country_bounds[country]
-        if lat < bounds['lat'][0] or lat > bounds['lat'][1]:
-            return False
-        if lon < bounds['lon'][0] or lon > bounds['lon'][1]:
-            return False
-
-    return True
+    """Validate coords against range, null island and the country bounds table"""
+    return validator.is_valid(coords, country)
+
+def build_address(dc):
+    """Build the geocoder query string for a facility"""
+    address_parts = []
+    if dc.get('address'):
+        address_parts.append(dc['address'])
+    elif dc.get('city'):
+        address_parts.append(dc['city'])
+        if dc.get('state'):
+            address_parts.append(dc['state'])
+        if dc.get('country'):
+            address_parts.append(dc['country'])
+
+    return ', '.join(address_parts)
+
+def plan_queries(data, indices):
+    """Group facilities by canonical query string
+
+    Returns {normalized_query: (address, [facility indices])} in first-seen order.
+    """
+    groups = {}
+    for idx in indices:
+        address = build_address(data[idx])
+        key = normalize_address(address)
+        if key in groups:
+            groups[key][1].append(idx)
+        else:
+            groups[key] = (address, [idx])
+    return groups
+
+def record_geocoded(data, had_coords):
+    """Store coordinates found this run in the processing manifest"""
+    rows = [i for i, dc in enumerate(data) if dc.get('city_coords') and not had_coords[i]]
+    manifest = ProcessManifest.load(MANIFEST_FILE)
+    recorded = manifest.record_geocoded(OUTPUT_FILE, data, rows, GEOCODE_VERSION)
+    if recorded:
+        manifest.save()
+        print(f"Recorded {recorded} geocoded facilities in {MANIFEST_FILE}")
 
 def batch_geocode():
     """Main geocoding function"""
+    metrics = RunMetrics('batch_geocode')
+    engine.metrics = metrics
 
     print("="*70)
     print("ATLAS BATCH GEOCODING")
     print("="*70)
     print(f"\nUsing: OpenStreetMap Nominatim (free)")
-    print(f"Rate: 1 request per {RATE_LIMIT_DELAY} seconds")
+    print(f"Endpoints: {engine.describe()}")
+    print(f"Rate: {engine.requests_per_second:g} requests/sec, up to {engine.workers} in flight")
     print(f"Input: {INPUT_FILE}")
     print(f"Output: {OUTPUT_FILE}")
+    print(f"Cache: {CACHE_FILE}")
 
     # Load data
     print(f"\nLoading data...")
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    with metrics.stage('load') as stage:
+        data = load_dataset(INPUT_FILE)
+        stage['records'] = len(data)
 
     # Create backup
     print(f"Creating backup: {BACKUP_FILE}")
-    with open(BACKUP_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    with metrics.stage('backup', records=len(data)):
+        save_dataset(data, BACKUP_FILE)
+
+    # Resume: replay results journaled by an interrupted run
+    had_coords = [bool(dc.get('city_coords')) for dc in data]
+    journal = GeocodeJournal(JOURNAL_FILE)
+    resumed = journal.replay(data)
+    if resumed:
+        print(f"Resumed {resumed} results from {JOURNAL_FILE}")
 
     # Find facilities without coordinates
     facilities_to_geocode = []
@@ -118,91 +152,181 @@ def batch_geocode():
 
     if total_to_geocode == 0:
         print("\n[INFO] All facilities already have coordinates!")
+        if resumed:
+            with metrics.stage('save', records=len(data)):
+                save_dataset(data, OUTPUT_FILE)
+                journal.remove()
+                record_geocoded(data, had_coords)
+        metrics.finish()
         return
 
-    estimated_time = (total_to_geocode * RATE_LIMIT_DELAY) / 60
-    print(f"Estimated time: {estimated_time:.1f} minutes ({estimated_time/60:.1f} hours)")
-    print(f"\nStarting geocoding...\n")
+    # Plan: group facilities that share a canonical query so each unique
+    # address is geocoded once and the result written to every member
+    groups = plan_queries(data, facilities_to_geocode)
+    print(f"Unique queries: {len(groups)} (for {total_to_geocode} facilities)")
 
     # Statistics
-    successful = 0
-    failed = 0
-    invalid = 0
+    stats = {'count': 0, 'successful': 0, 'failed': 0, 'invalid': 0, 'gazetteer': 0}
     start_time = time.time()
+    metrics.count('facilities_to_geocode', total_to_geocode)
+    metrics.count('unique_queries', len(groups))
+
+    def apply_result(members, coords):
+        """Write one query result to every facility in its group; returns cache status"""
+        status = None
+        for idx in members:
+            stats['count'] += 1
+            if coords and validate_coords(coords, data[idx].get('country')):
+                data[idx]['city_coords'] = coords
+                journal.append(idx, data[idx])
+                stats['successful'] += 1
+                status = status or 'ok'
+            elif coords:
+                stats['invalid'] += 1
+                status = status or 'invalid'
+            else:
+                stats['failed'] += 1
+                status = 'miss'
+        return status
+
+    # Resolve city-level queries offline; misses fall through to the cache/network
+    gazetteer = get_gazetteer()
+    local = set()
+    if gazetteer is None:
+        print("Gazetteer: GeoNames files not found, all queries go to Nominatim")
+    else:
+        # Members of a city-level group share city, state and country
+        city_keys = [key for key, (_, members) in groups.items() if is_city_level(data[members[0]])]
+        firsts = [data[groups[key][1][0]] for key in city_keys]
+        queries = [(dc.get('city'), dc.get('state'), dc.get('country')) for dc in firsts]
+        gazetteer_start = time.perf_counter()
+        with metrics.stage('gazetteer', records=len(city_keys)):
+            for key, coords in zip(city_keys, gazetteer.geocode_many(queries)):
+                members = groups[key][1]
+                if coords and all(validate_coords(coords, data[idx].get('country')) for idx in members):
+                    apply_result(members, coords)
+                    local.add(key)
+                    stats['gazetteer'] += len(members)
+        print(f"Gazetteer: {len(local)} of {len(city_keys)} city-level queries resolved locally "
+              f"({stats['gazetteer']} facilities) in {(time.perf_counter() - gazetteer_start)*1000:.1f}ms")
+
+    # Resolve previously seen addresses from the cache
+    cache = GeocodeCache(CACHE_FILE, ttl={status: days * 24 * 60 * 60 for status, days in CACHE_TTL_DAYS.items()})
+    jobs = []
+    with metrics.stage('cache', records=len(groups) - len(local)):
+        for key, (address, members) in groups.items():
+            if key in local:
+                continue
+            cached = cache.get(address)
+            if not cached:
+                jobs.append((key, address))
+                continue
+
+            status, coords = cached
+            apply_result(members, coords if status != 'miss' else None)
+
+    print(f"Cache: {cache.hits} hits, {cache.misses} misses")
 
-    # Geocode each facility
-    for count, idx in enumerate(facilities_to_geocode, 1):
-        dc = data[idx]
+    pending = sum(len(groups[key][1]) for key, _ in jobs)
+    estimated_time = (len(jobs) / engine.requests_per_second) / 60
+    print(f"To geocode: {len(jobs)} unique queries for {pending} facilities")
+    print(f"Estimated time: {estimated_time:.1f} minutes ({estimated_time/60:.1f} hours)")
+    print(f"\nStarting geocoding...\n")
 
-        # Build address string
-        address_parts = []
-        if dc.get('address'):
-            address_parts.append(dc['address'])
-        elif dc.get('city'):
-            address_parts.append(dc['city'])
-            if dc.get('state'):
-                address_parts.append(dc['state'])
-            if dc.get('country'):
-                address_parts.append(dc['country'])
+    total_queries = len(jobs)
+    progress = {'queries': 0}
 
-        address = ', '.join(address_parts)
+    def on_result(key, address, coords):
+        """Record one geocode result (runs as each request completes)"""
+        members = groups[key][1]
+        progress['queries'] += 1
+        query_count = progress['queries']
+        before = stats['count']
 
         # Safe printing with Unicode handling
-        facility_name = dc.get('name', 'Unknown')[:50].encode('ascii', 'replace').decode('ascii')
+        facility_name = data[members[0]].get('name', 'Unknown')[:50].encode('ascii', 'replace').decode('ascii')
         address_safe = address[:70].encode('ascii', 'replace').decode('ascii')
+        shared = f" (+{len(members) - 1} sharing this address)" if len(members) > 1 else ""
 
-        print(f"[{count}/{total_to_geocode}] {facility_name}")
+        print(f"[{query_count}/{total_queries}] {facility_name}{shared}")
         print(f"  Address: {address_safe}")
 
-        # Geocode
-        coords = geocode_address(address)
-
-        if coords:
-            # Validate coordinates
-            if validate_coords(coords, dc.get('country')):
-                data[idx]['city_coords'] = coords
-                successful += 1
-                print(f"  [OK] Success: [{coords[0]:.4f}, {coords[1]:.4f}]")
-            else:
-                invalid += 1
-                print(f"  [INVALID] Coords outside bounds: [{coords[0]:.4f}, {coords[1]:.4f}]")
+        if coords == FAILED:
+            # Not an answer from the geocoder - leave it uncached so the next run retries it
+            stats['count'] += len(members)
+            stats['failed'] += len(members)
+            print(f"  [FAILED] Geocoder error, will retry next run")
+            status = None
         else:
-            failed += 1
+            status = apply_result(members, coords)
+        if status == 'ok':
+            cache.put(address, 'ok', coords)
+            print(f"  [OK] Success: [{coords[0]:.4f}, {coords[1]:.4f}]")
+        elif status == 'invalid':
+            cache.put(address, 'invalid', coords)
+            print(f"  [INVALID] Coords outside bounds: [{coords[0]:.4f}, {coords[1]:.4f}]")
+        elif status == 'miss':
+            cache.put(address, 'miss')
             print(f"  [FAILED] Could not geocode")
 
-        # Save progress every 50 facilities
-        if count % 50 == 0:
-            with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+        # Results are already journaled - report progress every 50 facilities
+        count = stats['count']
+        if count // 50 > before // 50:
+            cache.commit()
             elapsed = (time.time() - start_time) / 60
-            remaining = (total_to_geocode - count) * RATE_LIMIT_DELAY / 60
-            print(f"\n  [PROGRESS SAVED] {count}/{total_to_geocode} | Elapsed: {elapsed:.1f}m | Remaining: ~{remaining:.1f}m\n")
+            remaining = (total_queries - query_count) / engine.requests_per_second / 60
+            print(f"\n  [PROGRESS] {count}/{total_to_geocode} | Elapsed: {elapsed:.1f}m | Remaining: ~{remaining:.1f}m\n")
 
-        # Rate limiting
-        if count < total_to_geocode:
-            time.sleep(RATE_LIMIT_DELAY)
+    # Geocode all facilities concurrently - rate limiting and retries are
+    # handled per endpoint inside the engine
+    try:
+        with metrics.stage('geocode', records=len(jobs)):
+            engine.geocode_all(jobs, on_result)
+    finally:
+        cache.close()
+        journal.close()
 
-    # Final save
+    successful = stats['successful']
+    failed = stats['failed']
+    invalid = stats['invalid']
+
+    # Final merge - the only full write of the dataset, then drop the journal
     print(f"\nSaving final results to {OUTPUT_FILE}...")
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    with metrics.stage('save', records=len(data)):
+        save_dataset(data, OUTPUT_FILE)
+        journal.remove()
+        record_geocoded(data, had_coords)
 
     # Summary
     elapsed_time = (time.time() - start_time) / 60
     print(f"\n" + "="*70)
     print("GEOCODING COMPLETE")
     print("="*70)
-    print(f"\nTotal processed: {total_to_geocode}")
+    print(f"\nTotal processed: {total_to_geocode} ({len(groups)} unique queries)")
     print(f"  [OK] Successful: {successful} ({successful/total_to_geocode*100:.1f}%)")
     print(f"  [FAILED] Failed: {failed} ({failed/total_to_geocode*100:.1f}%)")
     print(f"  [INVALID] Invalid: {invalid} ({invalid/total_to_geocode*100:.1f}%)")
+    print(f"  Gazetteer: {stats['gazetteer']} facilities resolved offline")
+    print(f"  Cache hits: {cache.hits} | Cache misses: {cache.misses}")
+    print(f"  Retries: {engine.retries} | Failed requests (not cached): {engine.failures}")
+    for ep in engine.endpoints:
+        print(f"  {ep.name}: {ep.requests} requests, {ep.errors} errors")
     print(f"\nTime elapsed: {elapsed_time:.1f} minutes ({elapsed_time/60:.1f} hours)")
+    if elapsed_time > 0:
+        print(f"Throughput: {total_to_geocode / (elapsed_time * 60):.2f} facilities/sec")
     print(f"Backup saved: {BACKUP_FILE}")
 
     # Calculate new coverage
     total_facilities = len(data)
     with_coords = len([dc for dc in data if dc.get('city_coords')])
     print(f"\nCoordinate coverage: {with_coords}/{total_facilities} ({with_coords/total_facilities*100:.1f}%)")
+
+    for outcome in ('successful', 'failed', 'invalid'):
+        metrics.count('facilities', stats[outcome], outcome=outcome)
+    metrics.count('gazetteer_resolved', stats['gazetteer'])
+    metrics.count('cache_hits', cache.hits)
+    metrics.count('cache_misses', cache.misses)
+    metrics.finish()
     print(f"\n[SUCCESS] Geocoding complete!")
 
 if __name__ == '__main__':
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bitmap filter index vs scanning records
+
+Builds a BitmapIndex over synthetic facilities and times country/company
+filters and faceted counts (companies within a country, countries for a
+company) against the list-of-dicts scans filterData() and the Counter
+passes do today.
+
+Usage:
+    python bench_bitmap_index.py [facilities] [queries]
+"""
+
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from bench_search_index import synthetic_facilities
+from bitmap_index import BitmapIndex
+
+
+def latency(label, fn, queries):
+    times = []
+    for args in queries:
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000
+    print(f"  {label:<40} mean {times.mean():8.3f}ms   p99 {np.percentile(times, 99):8.3f}ms")
+
+
+def scan_filter(data, country, company):
+    return [dc for dc in data if (not country or dc.get('country') == country) and
+            (not company or dc.get('company') == company)]
+
+
+def scan_facet(data, country):
+    return Counter(dc.get('company') for dc in data if dc.get('country') == country).most_common(20)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    data = synthetic_facilities(count)
+    print(f"Facilities: {count:,}")
+
+    start = time.perf_counter()
+    index = BitmapIndex.from_records(data, ('country', 'company', 'state'))
+    print(f"  Build: {(time.perf_counter() - start)*1000:.1f}ms")
+
+    # Filter values picked the way users pick them: by facility, so popular
+    # countries/companies come up most
+    rng = np.random.default_rng(1)
+    picks = [data[i] for i in rng.integers(0, count, n_queries)]
+    countries = [dc['country'] for dc in picks]
+    companies = [dc['company'] for dc in picks]
+
+    print(f"\nIndex ({n_queries} queries each):")
+    latency('filter country', lambda c: index.count(country=c), [(c,) for c in countries])
+    latency('filter country + company', lambda c, k: index.count(country=c, company=k),
+            list(zip(countries, companies)))
+    latency('first 100 rows, country + company', lambda c, k: index.filter(country=c, company=k).first(100),
+            list(zip(countries, companies)))
+    latency('top companies within country', lambda c: index.facets('company', index.filter(country=c)),
+            [(c,) for c in countries])
+    latency('top countries for company', lambda k: index.facets('country', index.filter(company=k)),
+            [(k,) for k in companies])
+    latency('top companies overall', lambda: index.facets('company'), [()] * n_queries)
+
+    n_scan = min(n_queries, 10)
+    print(f"\nRecord scans ({n_scan} queries each):")
+    latency('filter country + company', lambda c, k: scan_filter(data, c, k),
+            list(zip(countries, companies))[:n_scan])
+    latency('top companies within country', lambda c: scan_facet(data, c), [(c,) for c in countries][:n_scan])
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: columnar memory-mapped loading vs json.load
+
+For each dataset size, writes a synthetic datacenters_cleaned-style JSON file
+and its columnar build, then loads each in a fresh subprocess and reports
+load time, peak RSS and a bulk query (facilities per country with coords).
+
+Usage:
+    python bench_columnar.py [sizes]     # e.g. 6000,1000000,10000000 (default)
+
+Note: the 10M-row JSON file is several GB; pass smaller sizes on small machines.
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from columnar import build_columnar
+
+DEFAULT_SIZES = [6000, 1000000, 10000000]
+
+COUNTRIES = ['United States', 'Germany', 'United Kingdom', 'Brazil', 'Australia', 'Japan', 'India', 'France']
+COMPANIES = ['Equinix', 'Digital Realty', 'NTT', 'CyrusOne', 'QTS', 'Iron Mountain', 'Cologix', 'Flexential']
+CITIES = ['Ashburn', 'Frankfurt', 'London', 'Sao Paulo', 'Sydney', 'Tokyo', 'Mumbai', 'Paris']
+
+# Each loader runs in its own process so peak RSS is not shared. VmHWM is
+# used where available because ru_maxrss carries over the parent's peak
+# across fork/exec on Linux.
+PEAK_RSS = '''
+def peak_rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+'''
+
+LOAD_JSON = PEAK_RSS + '''
+import json, sys, time
+start = time.perf_counter()
+with open(sys.argv[1], 'r', encoding='utf-8') as f:
+    data = json.load(f)
+load = time.perf_counter() - start
+start = time.perf_counter()
+counts = {}
+for dc in data:
+    if dc.get('city_coords'):
+        counts[dc.get('country')] = counts.get(dc.get('country'), 0) + 1
+query = time.perf_counter() - start
+print(load, query, peak_rss_kb())
+'''
+
+LOAD_COLUMNAR = PEAK_RSS + '''
+import sys, time
+import numpy as np
+from columnar import load_columnar
+start = time.perf_counter()
+ds = load_columnar(sys.argv[1])
+load = time.perf_counter() - start
+start = time.perf_counter()
+codes = ds.codes('country')[ds.has_coords()]
+counts = np.bincount(codes[codes >= 0])
+query = time.perf_counter() - start
+print(load, query, peak_rss_kb())
+'''
+
+
+def synthetic_records(rows, seed=0):
+    rng = random.Random(seed)
+    for i in range(rows):
+        dc = {
+            'name': f"Facility {i}",
+            'company': rng.choice(COMPANIES),
+            'city': rng.choice(CITIES),
+            'country': rng.choice(COUNTRIES),
+            'address': f"{rng.randint(1, 9999)} Example Street",
+        }
+        if rng.random() < 0.9:
+            dc['city_coords'] = [round(rng.uniform(-60, 70), 4), round(rng.uniform(-180, 180), 4)]
+        yield dc
+
+
+def measure(script, path):
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, '-c', script, path], capture_output=True, text=True,
+                            check=True, cwd=here, env=dict(os.environ, PYTHONPATH=here)).stdout
+    load, query, rss_kb = output.split()
+    return float(load), float(query), int(rss_kb) / 1024
+
+
+if __name__ == '__main__':
+    sizes = [int(s) for s in sys.argv[1].split(',')] if len(sys.argv) > 1 else DEFAULT_SIZES
+
+    print(f"{'rows':>10}  {'format':<9} {'file MB':>9} {'load ms':>10} {'query ms':>10} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            json_path = os.path.join(tmp, f'bench_{rows}.json')
+            atlas_path = os.path.join(tmp, f'bench_{rows}.atlas')
+
+            data = list(synthetic_records(rows))
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            build_columnar(data, atlas_path)
+            del data
+
+            for label, script, path in (('json', LOAD_JSON, json_path), ('columnar', LOAD_COLUMNAR, atlas_path)):
+                load, query, rss = measure(script, path)
+                size = os.path.getsize(path) / (1024 * 1024)
+                print(f"{rows:>10,}  {label:<9} {size:>9.1f} {load*1000:>10.1f} {query*1000:>10.1f} {rss:>12.1f}")
+
+            os.remove(json_path)
+            os.remove(atlas_path)
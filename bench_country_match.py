@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: country extraction from addresses
+
+Compares the original per-call list rebuild + nested linear scans with the
+precompiled suffix table in clean_data.py (single and batched), and checks
+the new matcher agrees wherever the old one found a country.
+
+Usage:
+    python bench_country_match.py [count]
+"""
+
+import random
+import sys
+import time
+
+from clean_data import COUNTRY_NAMES, extract_country_from_address, extract_countries_from_addresses
+
+
+def extract_country_from_address_linear(address):
+    """Original implementation - linear scans over the last 1/2/3 words"""
+    if not address:
+        return None
+
+    countries = list(COUNTRY_NAMES)  # Rebuilt on every call, as before
+
+    address_parts = address.strip().split()
+    if len(address_parts) > 0:
+        last_word = address_parts[-1]
+        for country in countries:
+            if country.lower() == last_word.lower():
+                return country
+
+        if len(address_parts) > 1:
+            last_two = ' '.join(address_parts[-2:])
+            for country in countries:
+                if country.lower() == last_two.lower():
+                    return country
+
+        if len(address_parts) > 2:
+            last_three = ' '.join(address_parts[-3:])
+            for country in countries:
+                if country.lower() == last_three.lower():
+                    return country
+
+    return None
+
+
+def timed(label, fn, count):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed*1000:9.1f}ms  ({count/elapsed:,.0f} addresses/sec)")
+    return result, elapsed
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    random.seed(0)
+    streets = ['1 Main St', '19 Tai Seng Dr', 'Calle de Yecora, 4', '151 Front Street', 'Unit 5']
+    cities = ['Madrid', 'Toronto', 'Sydney', 'Ashburn', 'Frankfurt', 'Unknown City']
+    addresses = []
+    for i in range(count):
+        parts = [random.choice(streets), random.choice(cities)]
+        if random.random() < 0.9:
+            parts.append(random.choice(COUNTRY_NAMES))
+        addresses.append(' '.join(parts))
+
+    print(f"Extracting countries from {count:,} addresses...")
+    linear, linear_time = timed('linear scan', lambda: [extract_country_from_address_linear(a) for a in addresses], count)
+    single, single_time = timed('suffix table', lambda: [extract_country_from_address(a) for a in addresses], count)
+    batch, batch_time = timed('suffix table (batch)', lambda: extract_countries_from_addresses(addresses), count)
+
+    mismatches = sum(1 for old, new in zip(linear, single) if old is not None and old != new)
+    assert single == batch
+    print(f"\nMismatches where the linear scan matched: {mismatches}")
+    print(f"Speedup: {linear_time/single_time:.1f}x single, {linear_time/batch_time:.1f}x batch")
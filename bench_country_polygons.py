@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark: point-in-country lookup
+
+Builds CountryPolygons over synthetic countries (irregular polygons with
+many vertices, some with offshore islands and lakes) laid out like the real
+Natural Earth boundaries, and reports build/save/load time and lookup
+throughput in points per second, checked against brute-force ray casting
+over every polygon.
+
+Usage:
+    python bench_country_polygons.py [points] [countries] [vertices]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from country_polygons import CountryPolygons
+
+
+def ring(rng, lat, lon, radius, vertices):
+    """Closed irregular (star-shaped) ring as GeoJSON [lon, lat] positions"""
+    angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+    radii = radius * rng.uniform(0.6, 1.0, vertices)
+    lats = np.clip(lat + radii * np.sin(angles), -89.9, 89.9)
+    lons = np.clip(lon + radii * np.cos(angles), -179.9, 179.9)
+    positions = np.column_stack((lons, lats)).tolist()
+    return positions + positions[:1]
+
+
+def synthetic_countries(count, vertices, seed=0):
+    """GeoJSON FeatureCollection of non-overlapping synthetic countries on a grid"""
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(count)))
+    cell_lat, cell_lon = 150 / side, 360 / side
+    features = []
+    for i in range(count):
+        lat = -60 + (i // side + 0.5) * cell_lat
+        lon = -180 + (i % side + 0.5) * cell_lon
+        radius = 0.4 * min(cell_lat, cell_lon)
+        polygons = [[ring(rng, lat, lon, radius, vertices)]]
+        if i % 3 == 0:      # Lake
+            polygons[0].append(ring(rng, lat, lon, radius * 0.2, max(8, vertices // 20)))
+        if i % 4 == 0:      # Offshore island
+            polygons.append([ring(rng, lat + radius * 1.15, lon + radius * 1.15, radius * 0.1,
+                                  max(8, vertices // 10))])
+        features.append({'type': 'Feature', 'properties': {'name': f'Country {i}'},
+                         'geometry': {'type': 'MultiPolygon', 'coordinates': polygons}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def brute_force(collection, lats, lons):
+    """Country index per point by ray casting against every ring of every country"""
+    result = np.full(len(lats), -1)
+    for i, feature in enumerate(collection['features']):
+        for rings in feature['geometry']['coordinates']:
+            inside = np.zeros(len(lats), dtype=bool)
+            for r in rings:
+                r = np.asarray(r)
+                x1, y1, x2, y2 = r[:-1, 0], r[:-1, 1], r[1:, 0], r[1:, 1]
+                for j in range(len(x1)):
+                    spans = (y1[j] > lats) != (y2[j] > lats)
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        inside ^= spans & (lons < x1[j] + (lats - y1[j]) * (x2[j] - x1[j]) / (y2[j] - y1[j]))
+            result[inside & (result < 0)] = i
+    return result
+
+
+if __name__ == '__main__':
+    n_points = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    n_countries = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    n_vertices = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+
+    collection = synthetic_countries(n_countries, n_vertices)
+    rng = np.random.default_rng(1)
+    lats = rng.uniform(-60, 90, n_points)
+    lons = rng.uniform(-180, 180, n_points)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'countries.geojson')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(collection, f)
+
+        start = time.perf_counter()
+        polygons = CountryPolygons.from_geojson(path)
+        print(f"Countries: {n_countries}, polygons: {len(polygons)}, edges: {len(polygons.edges):,}")
+        print(f"  Build: {(time.perf_counter() - start)*1000:.1f}ms")
+
+        cache = os.path.join(tmp, 'countries.npz')
+        start = time.perf_counter()
+        polygons.save(cache)
+        print(f"  Save:  {(time.perf_counter() - start)*1000:.1f}ms")
+        start = time.perf_counter()
+        polygons = CountryPolygons.load(cache)
+        print(f"  Load:  {(time.perf_counter() - start)*1000:.1f}ms")
+
+    start = time.perf_counter()
+    found = polygons.country_of(lats, lons)
+    elapsed = time.perf_counter() - start
+    print(f"\nLookup {n_points:,} points: {elapsed*1000:.1f}ms ({n_points / elapsed:,.0f} points/s), "
+          f"{np.count_nonzero(found >= 0):,} inside a country")
+
+    sample = min(n_points, 2000)
+    start = time.perf_counter()
+    expected = brute_force(collection, lats[:sample], lons[:sample])
+    brute_time = time.perf_counter() - start
+    mismatches = int(np.count_nonzero(found[:sample] != expected))
+    print(f"Brute force {sample:,} points: {brute_time*1000:.1f}ms ({sample / brute_time:,.0f} points/s), "
+          f"{mismatches} mismatches")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark: nearest-populated-place reverse lookup
+
+Builds a PlaceTree over synthetic populated places clustered like real
+cities and reports build time and batch nearest-place throughput for 1M
+facility coordinates near those places, checked against a brute-force
+haversine scan.
+
+Usage:
+    python bench_reverse_geocode.py [points] [places]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from bench_spatial_index import synthetic_points
+from reverse_geocode import PlaceTree
+from spatial_index import haversine_km
+
+if __name__ == '__main__':
+    n_points = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    n_places = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+
+    # Facilities sit near populated places (10% anywhere, as the worst case)
+    place_lats, place_lons = synthetic_points(n_places, seed=2)
+    rng = np.random.default_rng(3)
+    near = int(n_points * 0.9)
+    picks = rng.integers(0, n_places, near)
+    lats = np.concatenate((place_lats[picks] + rng.normal(0, 0.1, near), rng.uniform(-60, 75, n_points - near)))
+    lons = np.concatenate((place_lons[picks] + rng.normal(0, 0.1, near), rng.uniform(-180, 180, n_points - near)))
+    lats, lons = np.clip(lats, -90, 90), (lons + 180) % 360 - 180
+    print(f"Places: {n_places:,}  Points: {n_points:,}")
+
+    start = time.perf_counter()
+    tree = PlaceTree(place_lats, place_lons)
+    print(f"  Build: {(time.perf_counter() - start)*1000:.1f}ms (depth {tree.depth})")
+
+    start = time.perf_counter()
+    nearest, km = tree.nearest(lats, lons)
+    elapsed = time.perf_counter() - start
+    print(f"  Query: {elapsed*1000:.1f}ms ({n_points / elapsed:,.0f} points/s), median distance {np.median(km):.1f}km")
+
+    sample = min(n_points, 1000)
+    start = time.perf_counter()
+    expected_km = np.array([haversine_km(lat, lon, place_lats, place_lons).min()
+                            for lat, lon in zip(lats[:sample], lons[:sample])])
+    brute_time = time.perf_counter() - start
+    wrong = int(np.count_nonzero(np.abs(km[:sample] - expected_km) > 1e-6))
+    print(f"  Brute force {sample:,} points: {brute_time*1000:.1f}ms ({sample / brute_time:,.0f} points/s), "
+          f"{wrong} mismatches")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: text search index query latency
+
+Builds a SearchIndex over synthetic facilities (company / city / country
+vocabulary shaped like the real dataset) and reports build/save/load time
+and mean/p50/p99 latency per query type, compared with the linear substring
+scan the API did before.
+
+Usage:
+    python bench_search_index.py [facilities] [queries]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from search_index import SearchIndex
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ra', 'to', 'shi', 'ber', 'lin', 'dor', 'van', 'tek', 'qua', 'zen',
+             'fra', 'sto', 'am', 'el', 'ix', 'on', 'cy', 'rus', 'nu', 'port', 'ville', 'burg', 'ton']
+FIELDS = ('name', 'company', 'address', 'city', 'state', 'country')
+
+
+def _words(rng, count, min_syllables=2, max_syllables=4):
+    words = set()
+    while len(words) < count:
+        n = rng.integers(min_syllables, max_syllables + 1)
+        words.add(''.join(rng.choice(SYLLABLES, n)))
+    return sorted(words)
+
+
+def synthetic_facilities(count, seed=0):
+    """Facilities with Zipf-distributed companies, cities and countries"""
+    rng = np.random.default_rng(seed)
+    companies = [' '.join(w.capitalize() for w in pair) for pair in
+                 zip(_words(rng, 3000), rng.choice(['Data', 'Networks', 'Cloud', 'Telecom', 'Realty', ''], 3000))]
+    cities = [w.capitalize() for w in _words(rng, 20000)]
+    countries = [w.capitalize() for w in _words(rng, 200, 2, 3)]
+
+    def zipf_pick(n, exponent):
+        weights = 1.0 / np.arange(1, n + 1) ** exponent
+        return rng.choice(n, count, p=weights / weights.sum())
+
+    # Top company ~12%, top city ~10%, top country ~40% of facilities
+    company_picks = zipf_pick(len(companies), 1.0)
+    city_picks = zipf_pick(len(cities), 1.0)
+    country_picks = zipf_pick(len(countries), 1.4)
+    numbers = rng.integers(1, 40, count)
+
+    data = []
+    for i in range(count):
+        company = companies[company_picks[i]].strip()
+        city = cities[city_picks[i]]
+        data.append({
+            'name': f"{company.split()[0]} {city} {numbers[i]}",
+            'company': company,
+            'address': f"{numbers[i]} {city} Road",
+            'city': city,
+            'state': None,
+            'country': countries[country_picks[i]],
+        })
+    return data
+
+
+def linear_search(data, query, limit=100):
+    terms = query.lower().split()
+    results = []
+    for dc in data:
+        text = ' '.join(str(dc.get(field) or '') for field in FIELDS).lower()
+        if all(term in text for term in terms):
+            results.append(dc)
+            if len(results) >= limit:
+                break
+    return results
+
+
+def latency(label, fn, queries):
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000
+    print(f"  {label:<28} mean {times.mean():7.3f}ms   p50 {np.percentile(times, 50):7.3f}ms   "
+          f"p99 {np.percentile(times, 99):7.3f}ms")
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    data = synthetic_facilities(count)
+    print(f"Facilities: {count:,}")
+
+    start = time.perf_counter()
+    index = SearchIndex.from_records(data)
+    print(f"  Build: {(time.perf_counter() - start)*1000:.1f}ms ({len(index.vocab):,} words, "
+          f"{len(index.postings):,} postings)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'index.npz')
+        start = time.perf_counter()
+        index.save(path)
+        print(f"  Save:  {(time.perf_counter() - start)*1000:.1f}ms ({os.path.getsize(path)/1024/1024:.1f}MB)")
+        start = time.perf_counter()
+        index = SearchIndex.load(path)
+        print(f"  Load:  {(time.perf_counter() - start)*1000:.1f}ms")
+
+    # Queries built from real facilities, as users type them
+    rng = np.random.default_rng(1)
+    picks = [data[i] for i in rng.integers(0, count, n_queries)]
+    company_word = [dc['company'].split()[0].lower() for dc in picks]
+    city = [dc['city'].lower() for dc in picks]
+
+    def typo(word):
+        i = len(word) // 2
+        return word[:i] + word[i + 1:]
+
+    print(f"\nQueries ({n_queries} each, limit 100):")
+    latency('single word', index.search, company_word)
+    latency('company + city', index.search, [f"{c} {t}" for c, t in zip(company_word, city)])
+    latency('prefix (as you type)', index.search, [f"{c} {t[:3]}" for c, t in zip(company_word, city)])
+    latency('common word (country)', index.search, [dc['country'] for dc in picks])
+    latency('substring', index.search, [c[1:] for c in company_word])
+    latency('typo', index.search, [typo(t) for t in city])
+    latency('suggest', index.suggest, [t[:3] for t in city])
+    latency('linear scan (before)', lambda q: linear_search(data, q), [f"{c} {t}" for c, t in
+                                                                        zip(company_word, city)][:20])
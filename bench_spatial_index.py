@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: spatial index query latency
+
+Builds a SpatialIndex over synthetic facilities clustered around metro areas
+(like the real dataset) and reports build/save/load time and mean/p99
+latency for radius, nearest-neighbor and bounding-box queries, compared with
+a brute-force haversine scan.
+
+Usage:
+    python bench_spatial_index.py [points] [queries]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from spatial_index import SpatialIndex, haversine_km
+
+
+def synthetic_points(count, seed=0):
+    """Points clustered around random metro centers plus uniform background"""
+    rng = np.random.default_rng(seed)
+    centers = np.column_stack((rng.uniform(-45, 60, 2000), rng.uniform(-180, 180, 2000)))
+    clustered = int(count * 0.9)
+    picks = rng.integers(0, len(centers), clustered)
+    lats = centers[picks, 0] + rng.normal(0, 0.3, clustered)
+    lons = centers[picks, 1] + rng.normal(0, 0.3, clustered)
+    lats = np.concatenate((lats, rng.uniform(-60, 75, count - clustered)))
+    lons = np.concatenate((lons, rng.uniform(-180, 180, count - clustered)))
+    return np.clip(lats, -90, 90), (lons + 180) % 360 - 180
+
+
+def latency(label, fn, queries):
+    times = []
+    for args in queries:
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000
+    print(f"  {label:<30} mean {times.mean():7.3f}ms   p99 {np.percentile(times, 99):7.3f}ms")
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    lats, lons = synthetic_points(count)
+    print(f"Points: {count:,}")
+
+    start = time.perf_counter()
+    index = SpatialIndex(lats, lons)
+    print(f"  Build: {(time.perf_counter() - start)*1000:.1f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'index.npz')
+        start = time.perf_counter()
+        index.save(path)
+        print(f"  Save:  {(time.perf_counter() - start)*1000:.1f}ms")
+        start = time.perf_counter()
+        index = SpatialIndex.load(path)
+        print(f"  Load:  {(time.perf_counter() - start)*1000:.1f}ms")
+
+    # Query at real facility locations, as the map does
+    rng = np.random.default_rng(1)
+    picks = rng.integers(0, count, n_queries)
+    points = list(zip(lats[picks], lons[picks]))
+
+    print(f"\nQueries ({n_queries} each):")
+    latency('within_radius 25km', index.within_radius, [(lat, lon, 25) for lat, lon in points])
+    latency('nearest k=10', index.nearest, [(lat, lon, 10) for lat, lon in points])
+    latency('bbox 1x1 degree', index.bbox, [(lat - 0.5, lon - 0.5, lat + 0.5, lon + 0.5) for lat, lon in points])
+    latency('brute force radius 25km', lambda lat, lon: np.nonzero(haversine_km(lat, lon, lats, lons) <= 25),
+            points[:50])
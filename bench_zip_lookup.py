@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: ZIP-to-state lookup
+
+Compares the original linear scan over ZIP_TO_STATE with the precompiled
+bisect index in clean_data.py (single and batched lookups), and checks both
+give identical results for every 5-digit ZIP.
+
+Usage:
+    python bench_zip_lookup.py [count]
+"""
+
+import random
+import re
+import sys
+import time
+
+from clean_data import ZIP_TO_STATE, get_state_from_zip, get_states_from_zips
+
+
+def get_state_from_zip_linear(zip_code):
+    """Original implementation - regex + linear scan over every range"""
+    if not zip_code:
+        return None
+
+    zip_match = re.search(r'(\d{5})', str(zip_code))
+    if not zip_match:
+        return None
+
+    zip_num = int(zip_match.group(1))
+
+    for zip_range, state in ZIP_TO_STATE.items():
+        if zip_num in zip_range:
+            return state
+    return None
+
+
+def timed(label, fn, count):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed*1000:9.1f}ms  ({count/elapsed:,.0f} lookups/sec)")
+    return result, elapsed
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    print("Checking index against linear scan for all 100,000 ZIPs...")
+    all_zips = [f"{z:05d}" for z in range(100000)]
+    mismatches = sum(1 for z in all_zips if get_state_from_zip(z) != get_state_from_zip_linear(z))
+    print(f"  Mismatches: {mismatches}")
+
+    random.seed(0)
+    zips = [f"{random.randint(0, 99999):05d}" for _ in range(count)]
+
+    print(f"\nLooking up {count:,} random ZIPs...")
+    linear, linear_time = timed('linear scan', lambda: [get_state_from_zip_linear(z) for z in zips], count)
+    single, single_time = timed('bisect index', lambda: [get_state_from_zip(z) for z in zips], count)
+    batch, batch_time = timed('bisect index (batch)', lambda: get_states_from_zips(zips), count)
+
+    assert linear == single == batch
+    print(f"\nSpeedup: {linear_time/single_time:.1f}x single, {linear_time/batch_time:.1f}x batch")
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Bitmap Filter Index for ATLAS Data Center Project
+
+Answers the map's country/company filters and the per-country/per-company
+counts without scanning every facility for each filter or aggregation.
+
+Built once per dataset load, one row set per distinct value of:
+- country, company, state
+- quality  coordinate quality tier from coord_validation (valid, missing,
+           out_of_range, null_island, outside_country, duplicate_sentinel)
+
+Row sets are stored like a simple roaring bitmap: values covering more than
+1/32 of the rows as packed uint64 bitmaps, rarer values as sorted int32 row
+ids (whichever is smaller). Filters AND across columns and OR within a
+column; faceted counts ("facilities per company within this country") are
+popcounts of bitmap intersections.
+
+Usage:
+    python bitmap_index.py [input.json] [--country Germany] [--company Equinix] [--facet company]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from columnar import encode_dict_column
+from coord_validation import REASONS, get_validator
+
+INPUT_FILE = 'datacenters_cleaned.json'
+
+FILTER_COLUMNS = ('country', 'company', 'state', 'quality')
+DENSE_FRACTION = 32       # Values in more than rows/32 facilities get a bitmap
+FACET_TOP = 20
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words):
+        return int(np.bitwise_count(words).sum())
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        return int(_BYTE_COUNTS[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+def _words_for(size):
+    return (size + 63) // 64
+
+
+def _bits_from_mask(mask):
+    """Pack a boolean mask into little-endian uint64 words"""
+    packed = np.packbits(mask, bitorder='little')
+    words = np.zeros(_words_for(len(mask)) * 8, dtype=np.uint8)
+    words[:len(packed)] = packed
+    return words.view(np.uint64)
+
+
+def _test_bits(words, rows):
+    """Boolean: bit set for each row id"""
+    rows = rows.astype(np.int64)
+    return ((words[rows >> 6] >> (rows & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+
+class RowSet:
+    """Set of dataset rows, as a packed bitmap or sorted row ids"""
+
+    __slots__ = ('size', 'bits', 'rows')
+
+    def __init__(self, size, bits=None, rows=None):
+        self.size = size
+        self.bits = bits
+        self.rows = rows
+
+    @classmethod
+    def from_rows(cls, size, rows):
+        rowset = cls(size, rows=np.asarray(rows, dtype=np.int32))
+        if len(rows) * DENSE_FRACTION > size:
+            return cls(size, bits=rowset.to_bits())
+        return rowset
+
+    @classmethod
+    def every(cls, size):
+        return cls(size, bits=_bits_from_mask(np.ones(size, dtype=bool)))
+
+    @classmethod
+    def empty(cls, size):
+        return cls(size, rows=np.empty(0, dtype=np.int32))
+
+    @property
+    def dense(self):
+        return self.bits is not None
+
+    def __len__(self):
+        return _popcount(self.bits) if self.dense else len(self.rows)
+
+    def __and__(self, other):
+        if self.dense and other.dense:
+            return RowSet(self.size, bits=self.bits & other.bits)
+        if self.dense:
+            return RowSet(self.size, rows=other.rows[_test_bits(self.bits, other.rows)])
+        if other.dense:
+            return RowSet(self.size, rows=self.rows[_test_bits(other.bits, self.rows)])
+        return RowSet(self.size, rows=np.intersect1d(self.rows, other.rows, assume_unique=True))
+
+    def __or__(self, other):
+        if not self.dense and not other.dense:
+            return RowSet.from_rows(self.size, np.union1d(self.rows, other.rows))
+        return RowSet(self.size, bits=self.to_bits() | other.to_bits())
+
+    def to_bits(self):
+        return self.bits if self.dense else _bits_from_mask(self.to_mask())
+
+    def to_mask(self):
+        """Boolean mask over all rows"""
+        if not self.dense:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[self.rows] = True
+            return mask
+        return np.unpackbits(self.bits.view(np.uint8), count=self.size, bitorder='little').view(bool)
+
+    def to_rows(self):
+        """Sorted int32 row ids"""
+        if not self.dense:
+            return self.rows
+        return np.flatnonzero(self.to_mask()).astype(np.int32)
+
+    def first(self, limit):
+        """Lowest limit row ids, without expanding the whole set"""
+        if not self.dense:
+            return self.rows[:limit]
+        rows = []
+        count = 0
+        chunk = max(1, _words_for(limit * 4))
+        for start in range(0, len(self.bits), chunk):
+            words = self.bits[start:start + chunk]
+            found = np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder='little')) + start * 64
+            found = found[found < self.size][:limit - count]
+            rows.append(found.astype(np.int32))
+            count += len(found)
+            if count >= limit:
+                break
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+
+
+class _Column:
+    """Codes, dictionary and per-value row sets of one filter column"""
+
+    def __init__(self, codes, dictionary, size):
+        self.codes = codes
+        self.dictionary = list(dictionary)
+        self.lookup = {value: code for code, value in enumerate(self.dictionary)}
+
+        valid = np.flatnonzero(codes >= 0)
+        order = valid[np.argsort(codes[valid], kind='stable')].astype(np.int32)
+        self.counts = np.bincount(codes[valid], minlength=len(self.dictionary))
+        bounds = np.concatenate(([0], np.cumsum(self.counts)))
+
+        self.sets = []
+        self.dense_codes = []
+        sparse_rows = []
+        sparse_codes = []
+        for code, count in enumerate(self.counts.tolist()):
+            rows = order[bounds[code]:bounds[code + 1]]
+            if count * DENSE_FRACTION > size:
+                self.sets.append(RowSet(size, bits=_bits_from_mask(codes == code)))
+                self.dense_codes.append(code)
+            else:
+                self.sets.append(RowSet(size, rows=rows))
+                sparse_rows.append(rows)
+                sparse_codes.append(np.full(len(rows), code, dtype=np.int32))
+
+        # Rows of every sparse value in one array, for one-pass faceting
+        self.sparse_rows = np.concatenate(sparse_rows) if sparse_rows else np.empty(0, dtype=np.int32)
+        self.sparse_codes = np.concatenate(sparse_codes) if sparse_codes else np.empty(0, dtype=np.int32)
+
+
+class BitmapIndex:
+    """Per-value row sets for conjunctive filters and faceted counts"""
+
+    def __init__(self, columns, size):
+        """columns: {name: (int32 codes (-1 = missing), dictionary)}"""
+        self.size = size
+        self.columns = {name: _Column(np.asarray(codes, dtype=np.int32), dictionary, size)
+                        for name, (codes, dictionary) in columns.items()}
+
+    @classmethod
+    def from_records(cls, data, columns=FILTER_COLUMNS):
+        """Build from facility dicts; rows are positions in data"""
+        encoded = {}
+        for name in columns:
+            if name == 'quality':
+                encoded[name] = cls._quality_column(get_validator().validate_records(data))
+            else:
+                encoded[name] = encode_dict_column([dc.get(name) for dc in data])
+        return cls(encoded, len(data))
+
+    @classmethod
+    def from_columnar(cls, dataset, columns=FILTER_COLUMNS):
+        """Build from a ColumnarDataset, reusing its dictionary codes"""
+        encoded = {}
+        for name in columns:
+            if name == 'quality':
+                validator = get_validator()
+                country_codes = dataset.codes('country')
+                to_bounds = np.append(validator.country_codes(dataset.dictionary('country')), -1)
+                reasons = validator.validate_arrays(dataset.lat, dataset.lon, to_bounds[country_codes])
+                encoded[name] = cls._quality_column(reasons)
+            else:
+                encoded[name] = (dataset.codes(name), dataset.dictionary(name))
+        return cls(encoded, len(dataset))
+
+    @classmethod
+    def from_json(cls, path=INPUT_FILE, columns=FILTER_COLUMNS):
+        """Build from a JSON dataset file"""
+        from dataset_io import load_dataset
+        return cls.from_records(load_dataset(path), columns)
+
+    @staticmethod
+    def _quality_column(reasons):
+        codes = sorted(REASONS)
+        return np.asarray(reasons, dtype=np.int32), [REASONS[code] for code in codes]
+
+    def __len__(self):
+        return self.size
+
+    # Row sets
+
+    def rowset(self, column, value):
+        """Rows where column == value (empty if the value never occurs)"""
+        col = self.columns[column]
+        code = col.lookup.get(value)
+        return RowSet.empty(self.size) if code is None else col.sets[code]
+
+    def filter(self, **criteria):
+        """Rows matching every column criterion
+
+        Each criterion is a value or a list of values (any of them); None
+        or an empty list means no filter on that column.
+        """
+        selected = []
+        for column, values in criteria.items():
+            if values is None:
+                continue
+            if isinstance(values, str) or not isinstance(values, (list, tuple, set)):
+                values = [values]
+            if not values:
+                continue
+            union = None
+            for value in values:
+                rows = self.rowset(column, value)
+                union = rows if union is None else union | rows
+            selected.append(union)
+
+        if not selected:
+            return RowSet.every(self.size)
+        # Cheapest first: sparse row lists shrink the result fastest
+        selected.sort(key=lambda rows: (rows.dense, 0 if rows.dense else len(rows.rows)))
+        result = selected[0]
+        for rows in selected[1:]:
+            result = result & rows
+        return result
+
+    def count(self, **criteria):
+        return len(self.filter(**criteria))
+
+    # Aggregation
+
+    def value_counts(self, column):
+        """{value: facilities} over the whole dataset"""
+        col = self.columns[column]
+        return {value: int(count) for value, count in zip(col.dictionary, col.counts.tolist()) if count}
+
+    def facet_counts(self, column, within=None):
+        """Facilities per code of column, restricted to a RowSet"""
+        col = self.columns[column]
+        if within is None:
+            return col.counts.copy()
+
+        # Small subsets: count their codes directly
+        if not within.dense or len(within) < len(col.sparse_rows):
+            codes = col.codes[within.to_rows()]
+            return np.bincount(codes[codes >= 0], minlength=len(col.dictionary))
+
+        # Popcount per bitmap value; sparse values tested in one pass
+        counts = np.zeros(len(col.dictionary), dtype=np.int64)
+        for code in col.dense_codes:
+            counts[code] = _popcount(col.sets[code].bits & within.bits)
+        if len(col.sparse_rows):
+            hit = within.to_mask()[col.sparse_rows]
+            counts += np.bincount(col.sparse_codes[hit], minlength=len(col.dictionary))
+        return counts
+
+    def facets(self, column, within=None, top=FACET_TOP):
+        """[(value, facilities)] most first, restricted to a RowSet"""
+        col = self.columns[column]
+        counts = self.facet_counts(column, within)
+        codes = np.flatnonzero(counts)
+        codes = codes[np.lexsort((codes, -counts[codes]))]
+        if top is not None:
+            codes = codes[:top]
+        return [(col.dictionary[code], int(counts[code])) for code in codes.tolist()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Filter and facet the dataset with bitmap indexes')
+    parser.add_argument('input', nargs='?', default=INPUT_FILE)
+    for column in FILTER_COLUMNS:
+        parser.add_argument(f'--{column}', action='append')
+    parser.add_argument('--facet', action='append', default=[])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = BitmapIndex.from_json(args.input)
+    print(f"Indexed {len(index)} facilities in {(time.perf_counter() - start)*1000:.1f}ms")
+
+    start = time.perf_counter()
+    rows = index.filter(**{column: getattr(args, column) for column in FILTER_COLUMNS})
+    facets = {column: index.facets(column, rows) for column in args.facet or ['country', 'company']}
+    elapsed = time.perf_counter() - start
+
+    print(f"Matching facilities: {len(rows)} ({elapsed*1000:.3f}ms)")
+    for column, values in facets.items():
+        print(f"\nTop {column}:")
+        for value, count in values:
+            print(f"  {value}: {count}")
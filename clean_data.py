@@ -2,12 +2,27 @@
 """
 ATLAS Data Cleaning & Optimization Script
 Fixes country parsing, US state extraction, and coordinate validation
+Stage timings, throughput and peak memory are written to clean_data.metrics.json
+(see run_metrics.py)
+
+Usage:
+    python clean_data.py                                  # datacenters.json -> datacenters_cleaned.json
+    python clean_data.py --stream [input] [output.ndjson] # constant-memory NDJSON mode
 """
 
 import json
 import re
+import sys
+from bisect import bisect_right
 from collections import Counter
 
+import numpy as np
+
+from coord_validation import (DUPLICATE_SENTINEL, MISSING, NULL_ISLAND, OUT_OF_RANGE, OUTSIDE_COUNTRY,
+                              duplicate_sentinel_count, get_validator)
+from dataset_io import NDJSONWriter, iter_records
+from run_metrics import RunMetrics
+
 # US State ZIP code ranges
 ZIP_TO_STATE = {
     range(35000, 36999): 'Alabama',
@@ -65,21 +80,129 @@ ZIP_TO_STATE = {
     range(82000, 83199): 'Wyoming',
 }
 
+ZIP_PATTERN = re.compile(r'(\d{5})')
+
+def build_zip_index(zip_to_state):
+    """Compile ZIP ranges into a sorted-boundary index for bisect lookup
+
+    Ranges are painted onto a dense 100k table in reverse so the first
+    matching range wins (same as scanning ZIP_TO_STATE in order), then
+    compressed into run boundaries. Returns (starts, states).
+    """
+    dense = [None] * 100000
+    for zip_range, state in reversed(list(zip_to_state.items())):
+        dense[zip_range.start:zip_range.stop] = [state] * len(zip_range)
+
+    starts = []
+    states = []
+    for zip_num, state in enumerate(dense):
+        if not states or state != states[-1]:
+            starts.append(zip_num)
+            states.append(state)
+    return starts, states
+
+ZIP_INDEX_STARTS, ZIP_INDEX_STATES = build_zip_index(ZIP_TO_STATE)
+
+def lookup_zip_number(zip_num):
+    """Get US state for a 5-digit ZIP number"""
+    if not 0 <= zip_num < 100000:
+        return None
+    return ZIP_INDEX_STATES[bisect_right(ZIP_INDEX_STARTS, zip_num) - 1]
+
 def get_state_from_zip(zip_code):
     """Get US state from ZIP code"""
     if not zip_code:
         return None
 
     # Extract first 5 digits
-    zip_match = re.search(r'(\d{5})', str(zip_code))
+    text = str(zip_code)
+    if len(text) == 5 and text.isdigit():
+        return lookup_zip_number(int(text))
+    zip_match = ZIP_PATTERN.search(text)
     if not zip_match:
         return None
 
-    zip_num = int(zip_match.group(1))
-
-    for zip_range, state in ZIP_TO_STATE.items():
-        if zip_num in zip_range:
-            return state
+    return lookup_zip_number(int(zip_match.group(1)))
+
+def get_states_from_zips(zip_codes):
+    """Get US states for a whole column of ZIP codes (None where unknown)"""
+    search = ZIP_PATTERN.search
+    starts = ZIP_INDEX_STARTS
+    states = ZIP_INDEX_STATES
+    seen = {}
+    results = []
+    for zip_code in zip_codes:
+        state = seen.get(zip_code, seen)
+        if state is seen:
+            state = None
+            if zip_code:
+                text = str(zip_code)
+                if len(text) == 5 and text.isdigit():
+                    state = states[bisect_right(starts, int(text)) - 1]
+                else:
+                    zip_match = search(text)
+                    if zip_match:
+                        state = states[bisect_right(starts, int(zip_match.group(1))) - 1]
+            seen[zip_code] = state
+        results.append(state)
+    return results
+
+# Comprehensive country list (UN members + territories)
+COUNTRY_NAMES = [
+    # North America
+    'United States', 'USA', 'Canada', 'Mexico',
+
+    # Europe
+    'United Kingdom', 'UK', 'England', 'Scotland', 'Wales', 'Netherlands', 'Nederland',
+    'France', 'Germany', 'Spain', 'Italy', 'Portugal', 'Belgium', 'Austria', 'Switzerland',
+    'Sweden', 'Norway', 'Denmark', 'Finland', 'Iceland', 'Ireland', 'Poland', 'Czech Republic',
+    'Czechia', 'Slovakia', 'Hungary', 'Romania', 'Bulgaria', 'Greece', 'Croatia', 'Slovenia',
+    'Serbia', 'Bosnia', 'Montenegro', 'Albania', 'North Macedonia', 'Macedonia', 'Lithuania',
+    'Latvia', 'Estonia', 'Belarus', 'Ukraine', 'Moldova', 'Luxembourg', 'Malta', 'Cyprus',
+
+    # Asia
+    'China', 'Japan', 'South Korea', 'Korea', 'India', 'Indonesia', 'Thailand', 'Vietnam',
+    'Malaysia', 'Singapore', 'Philippines', 'Pakistan', 'Bangladesh', 'Sri Lanka', 'Myanmar',
+    'Cambodia', 'Laos', 'Nepal', 'Afghanistan', 'Iran', 'Iraq', 'Israel', 'Jordan', 'Lebanon',
+    'Syria', 'Yemen', 'Oman', 'Kuwait', 'Bahrain', 'Qatar', 'United Arab Emirates', 'UAE',
+    'Saudi Arabia', 'Turkey', 'Azerbaijan', 'Georgia', 'Armenia', 'Kazakhstan', 'Uzbekistan',
+    'Turkmenistan', 'Kyrgyzstan', 'Tajikistan', 'Mongolia', 'Taiwan', 'Hong Kong', 'Macau',
+
+    # Africa
+    'Egypt', 'South Africa', 'Nigeria', 'Kenya', 'Ghana', 'Ethiopia', 'Tanzania', 'Uganda',
+    'Morocco', 'Algeria', 'Tunisia', 'Libya', 'Sudan', 'Angola', 'Mozambique', 'Zimbabwe',
+    'Zambia', 'Botswana', 'Namibia', 'Senegal', "Côte d'Ivoire", "Cote d'Ivoire", 'Ivory Coast',
+    'Burkina Faso', 'Mali', 'Niger', 'Chad', 'Cameroon', 'Gabon', 'Congo', 'Rwanda', 'Burundi',
+    'Somalia', 'Mauritius', 'Madagascar', 'Seychelles',
+
+    # South America
+    'Brazil', 'Argentina', 'Chile', 'Peru', 'Colombia', 'Venezuela', 'Ecuador', 'Bolivia',
+    'Paraguay', 'Uruguay', 'Guyana', 'Suriname',
+
+    # Central America & Caribbean
+    'Guatemala', 'Honduras', 'El Salvador', 'Nicaragua', 'Costa Rica', 'Panama', 'Cuba',
+    'Dominican Republic', 'Haiti', 'Jamaica', 'Trinidad', 'Barbados', 'Bahamas',
+
+    # Oceania
+    'Australia', 'New Zealand', 'Papua New Guinea', 'Fiji', 'Samoa', 'Tonga',
+
+    # Middle East
+    'Palestine', 'Russia'
+]
+
+# Precompiled matcher: lower-cased name -> canonical spelling (first listed wins)
+COUNTRY_LOOKUP = {}
+for _name in COUNTRY_NAMES:
+    COUNTRY_LOOKUP.setdefault(_name.lower(), _name)
+MAX_COUNTRY_WORDS = max(len(name.split()) for name in COUNTRY_NAMES)
+TOKEN_PUNCTUATION = ',.;:()[]'
+
+def _match_country_suffix(words):
+    """Match the last 1..MAX_COUNTRY_WORDS lower-cased words against COUNTRY_LOOKUP"""
+    for size in range(1, min(MAX_COUNTRY_WORDS, len(words)) + 1):
+        country = COUNTRY_LOOKUP.get(' '.join(words[-size:]))
+        if country:
+            return country
     return None
 
 def extract_country_from_address(address):
@@ -87,74 +210,36 @@ def extract_country_from_address(address):
     if not address:
         return None
 
-    # Comprehensive country list (UN members + territories)
-    countries = [
-        # North America
-        'United States', 'USA', 'Canada', 'Mexico',
-
-        # Europe
-        'United Kingdom', 'UK', 'England', 'Scotland', 'Wales', 'Netherlands', 'Nederland',
-        'France', 'Germany', 'Spain', 'Italy', 'Portugal', 'Belgium', 'Austria', 'Switzerland',
-        'Sweden', 'Norway', 'Denmark', 'Finland', 'Iceland', 'Ireland', 'Poland', 'Czech Republic',
-        'Czechia', 'Slovakia', 'Hungary', 'Romania', 'Bulgaria', 'Greece', 'Croatia', 'Slovenia',
-        'Serbia', 'Bosnia', 'Montenegro', 'Albania', 'North Macedonia', 'Macedonia', 'Lithuania',
-        'Latvia', 'Estonia', 'Belarus', 'Ukraine', 'Moldova', 'Luxembourg', 'Malta', 'Cyprus',
-
-        # Asia
-        'China', 'Japan', 'South Korea', 'Korea', 'India', 'Indonesia', 'Thailand', 'Vietnam',
-        'Malaysia', 'Singapore', 'Philippines', 'Pakistan', 'Bangladesh', 'Sri Lanka', 'Myanmar',
-        'Cambodia', 'Laos', 'Nepal', 'Afghanistan', 'Iran', 'Iraq', 'Israel', 'Jordan', 'Lebanon',
-        'Syria', 'Yemen', 'Oman', 'Kuwait', 'Bahrain', 'Qatar', 'United Arab Emirates', 'UAE',
-        'Saudi Arabia', 'Turkey', 'Azerbaijan', 'Georgia', 'Armenia', 'Kazakhstan', 'Uzbekistan',
-        'Turkmenistan', 'Kyrgyzstan', 'Tajikistan', 'Mongolia', 'Taiwan', 'Hong Kong', 'Macau',
-
-        # Africa
-        'Egypt', 'South Africa', 'Nigeria', 'Kenya', 'Ghana', 'Ethiopia', 'Tanzania', 'Uganda',
-        'Morocco', 'Algeria', 'Tunisia', 'Libya', 'Sudan', 'Angola', 'Mozambique', 'Zimbabwe',
-        'Zambia', 'Botswana', 'Namibia', 'Senegal', "Côte d'Ivoire", "Cote d'Ivoire", 'Ivory Coast',
-        'Burkina Faso', 'Mali', 'Niger', 'Chad', 'Cameroon', 'Gabon', 'Congo', 'Rwanda', 'Burundi',
-        'Somalia', 'Mauritius', 'Madagascar', 'Seychelles',
-
-        # South America
-        'Brazil', 'Argentina', 'Chile', 'Peru', 'Colombia', 'Venezuela', 'Ecuador', 'Bolivia',
-        'Paraguay', 'Uruguay', 'Guyana', 'Suriname',
-
-        # Central America & Caribbean
-        'Guatemala', 'Honduras', 'El Salvador', 'Nicaragua', 'Costa Rica', 'Panama', 'Cuba',
-        'Dominican Republic', 'Haiti', 'Jamaica', 'Trinidad', 'Barbados', 'Bahamas',
-
-        # Oceania
-        'Australia', 'New Zealand', 'Papua New Guinea', 'Fiji', 'Samoa', 'Tonga',
-
-        # Middle East
-        'Palestine', 'Russia'
-    ]
-
-    # Check last part of address
-    address_parts = address.strip().split()
-    if len(address_parts) > 0:
-        # Check last word
-        last_word = address_parts[-1]
-        for country in countries:
-            if country.lower() == last_word.lower():
-                return country
-
-        # Check last two words
-        if len(address_parts) > 1:
-            last_two = ' '.join(address_parts[-2:])
-            for country in countries:
-                if country.lower() == last_two.lower():
-                    return country
-
-        # Check last three words
-        if len(address_parts) > 2:
-            last_three = ' '.join(address_parts[-3:])
-            for country in countries:
-                if country.lower() == last_three.lower():
-                    return country
+    # Check last part of address (last word, then last two, then last three)
+    words = address.strip().lower().split()
+    country = _match_country_suffix(words)
+    if country:
+        return country
+
+    # Retry ignoring punctuation ("..., Germany.") and up to two trailing
+    # postal-code tokens after the country ("Singapore 535222")
+    words = [w.strip(TOKEN_PUNCTUATION) for w in words]
+    words = [w for w in words if w]
+    for _ in range(3):
+        country = _match_country_suffix(words)
+        if country:
+            return country
+        if not words or not any(c.isdigit() for c in words[-1]):
+            break
+        words = words[:-1]
 
     return None
 
+def extract_countries_from_addresses(addresses):
+    """Extract country names for a whole column of addresses"""
+    seen = {}
+    results = []
+    for address in addresses:
+        if address not in seen:
+            seen[address] = extract_country_from_address(address)
+        results.append(seen[address])
+    return results
+
 def normalize_country_name(country):
     """Normalize country names with aliases"""
     if not country:
@@ -199,62 +284,88 @@ def normalize_country_name(country):
 
     return country
 
-def clean_datacenters(input_file, output_file):
-    """Clean and optimize datacenter data"""
-    print("Loading data...")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    print(f"Total entries: {len(data)}")
+def clean_records(data, changed=None, point_counts=None):
+    """Clean datacenter records in place; returns cleaning stats
 
+    If changed is a list, the index of every record modified is appended to it.
+    If point_counts (a Counter) is given, duplicate sentinels are not counted
+    here; the records' coordinates are added to point_counts for the caller
+    to count across several batches (see duplicate_sentinel_count).
+    """
+    changed = [] if changed is None else changed
     stats = {
         'countries_fixed': 0,
         'states_added': 0,
         'coords_validated': 0,
-        'invalid_coords': 0
+        'invalid_coords': 0,
+        'coords_outside_country': 0,
+        'coords_null_island': 0,
+        'coords_duplicate_sentinel': 0
     }
 
-    for entry in data:
-        # Fix missing countries
-        if not entry.get('country'):
-            extracted = extract_country_from_address(entry.get('address', ''))
-            if extracted:
-                entry['country'] = normalize_country_name(extracted)
-                stats['countries_fixed'] += 1
-        else:
-            entry['country'] = normalize_country_name(entry.get('country'))
-
-        # Extract US states from ZIP codes
-        if entry.get('country') == 'United States' and not entry.get('state'):
-            state_from_zip = get_state_from_zip(entry.get('zip'))
-            if state_from_zip:
-                entry['state'] = state_from_zip
-                stats['states_added'] += 1
-
-        # Validate coordinates
-        if 'city_coords' in entry and entry['city_coords']:
-            lat, lon = entry['city_coords']
-            if -90 <= lat <= 90 and -180 <= lon <= 180:
-                stats['coords_validated'] += 1
-            else:
-                stats['invalid_coords'] += 1
-                entry['city_coords'] = None  # Remove invalid coords
-
+    # Fix missing countries (one batched lookup over the address column)
+    missing_country = [i for i, entry in enumerate(data) if not entry.get('country')]
+    extracted_countries = extract_countries_from_addresses([data[i].get('address', '') for i in missing_country])
+    for i, extracted in zip(missing_country, extracted_countries):
+        if extracted:
+            data[i]['country'] = extracted
+            stats['countries_fixed'] += 1
+            changed.append(i)
+
+    for i, entry in enumerate(data):
+        # Normalize country names (aliases map to canonical names, so this
+        # is also correct for countries just extracted above)
+        if entry.get('country'):
+            normalized = normalize_country_name(entry.get('country'))
+            if normalized != entry['country']:
+                entry['country'] = normalized
+                changed.append(i)
+
+    # Validate coordinates (one vectorized pass); out-of-range coords are
+    # removed, country-level problems are counted for the fix stages
+    reasons = get_validator().validate_records(data, point_counts)
+    counts = Counter(reasons.tolist())
+    stats['coords_validated'] = len(data) - counts[MISSING] - counts[OUT_OF_RANGE]
+    stats['invalid_coords'] = counts[OUT_OF_RANGE]
+    stats['coords_outside_country'] = counts[OUTSIDE_COUNTRY]
+    stats['coords_null_island'] = counts[NULL_ISLAND]
+    stats['coords_duplicate_sentinel'] = counts[DUPLICATE_SENTINEL]
+    for i in np.nonzero(reasons == OUT_OF_RANGE)[0].tolist():
+        data[i]['city_coords'] = None  # Remove invalid coords
+        changed.append(i)
+
+    # Extract US states from ZIP codes (one batched lookup)
+    missing_state = [i for i, entry in enumerate(data)
+                     if entry.get('country') == 'United States' and not entry.get('state')]
+    states_from_zip = get_states_from_zips([data[i].get('zip') for i in missing_state])
+    for i, state_from_zip in zip(missing_state, states_from_zip):
+        if state_from_zip:
+            data[i]['state'] = state_from_zip
+            stats['states_added'] += 1
+            changed.append(i)
+
+    return stats
+
+def print_cleaning_results(stats):
+    """Print the stats returned by clean_records"""
     print(f"\nCleaning Results:")
     print(f"  Countries fixed: {stats['countries_fixed']}")
     print(f"  States added: {stats['states_added']}")
     print(f"  Valid coordinates: {stats['coords_validated']}")
     print(f"  Invalid coordinates removed: {stats['invalid_coords']}")
+    print(f"  Flagged outside country bounds: {stats['coords_outside_country']}")
+    print(f"  Flagged at null island: {stats['coords_null_island']}")
+    print(f"  Flagged duplicate sentinel coords: {stats['coords_duplicate_sentinel']}")
 
-    # Save cleaned data
-    print(f"\nSaving cleaned data to {output_file}...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
-    # Generate statistics
+def print_summary(data):
+    """Print top countries/companies and remaining issues"""
     countries = Counter([d.get('country') for d in data if d.get('country')])
     companies = Counter([d.get('company') for d in data])
+    still_empty = sum(1 for d in data if not d.get('country'))
+    print_report(countries, companies, still_empty)
 
+def print_report(countries, companies, still_empty):
+    """Print top countries/companies from precomputed counters"""
     print(f"\nTop 10 Countries:")
     for country, count in countries.most_common(10):
         print(f"  {country}: {count}")
@@ -264,11 +375,108 @@ def clean_datacenters(input_file, output_file):
         print(f"  {company}: {count}")
 
     # Check remaining issues
-    still_empty = sum(1 for d in data if not d.get('country'))
     print(f"\nRemaining entries without country: {still_empty}")
 
+def check_records(data):
+    """Post-condition: no out-of-range coordinates remain"""
+    bad = np.count_nonzero(get_validator().validate_records(data) == OUT_OF_RANGE)
+    if bad:
+        print(f"  [ERROR] {bad} entries still have out-of-range coordinates")
+        return False
+    print(f"  [OK] All coordinates within valid ranges")
+    return True
+
+def record_cleaning_stats(metrics, stats):
+    """Add the stats returned by clean_records to metrics counters"""
+    for key, value in stats.items():
+        metrics.count('cleaning', value, result=key)
+
+def clean_datacenters(input_file, output_file, metrics=None):
+    """Clean and optimize datacenter data"""
+    metrics = metrics or RunMetrics('clean_data')
+    print("Loading data...")
+    with metrics.stage('load') as stage:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        stage['records'] = len(data)
+
+    print(f"Total entries: {len(data)}")
+
+    with metrics.stage('clean', records=len(data)):
+        stats = clean_records(data)
+    record_cleaning_stats(metrics, stats)
+    print_cleaning_results(stats)
+
+    # Save cleaned data
+    print(f"\nSaving cleaned data to {output_file}...")
+    with metrics.stage('save', records=len(data)):
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    # Generate statistics
+    with metrics.stage('summary', records=len(data)):
+        print_summary(data)
+
     return data
 
+def clean_datacenters_stream(input_file, output_file, chunk_size=10000, metrics=None):
+    """Clean datacenter data in constant memory, writing NDJSON
+
+    Reads NDJSON or a JSON array incrementally, cleans records in chunks of
+    chunk_size with clean_records, and keeps running aggregates for the
+    top-country/company report instead of a second pass over the data.
+    Duplicate sentinels are counted from (point, country) totals carried
+    across chunks, so the count matches a batch run; memory for these grows
+    with the number of distinct valid points, not with the records.
+    """
+    metrics = metrics or RunMetrics('clean_data')
+    print(f"Streaming {input_file} -> {output_file} (NDJSON)...")
+
+    stats = Counter()
+    countries = Counter()
+    companies = Counter()
+    still_empty = 0
+    point_counts = Counter()
+
+    with metrics.stage('clean (stream)') as stage, NDJSONWriter(output_file) as writer:
+        for chunk in iter_chunks(iter_records(input_file), chunk_size):
+            stats.update(clean_records(chunk, point_counts=point_counts))
+            for entry in chunk:
+                if entry.get('country'):
+                    countries[entry['country']] += 1
+                else:
+                    still_empty += 1
+                companies[entry.get('company')] += 1
+                writer.write(entry)
+            stage['records'] = writer.written
+        stats['coords_duplicate_sentinel'] = duplicate_sentinel_count(point_counts)
+
+    record_cleaning_stats(metrics, stats)
+    print(f"Total entries: {writer.written}")
+    print_cleaning_results(stats)
+    print_report(countries, companies, still_empty)
+
+    return stats
+
+def iter_chunks(records, chunk_size):
+    """Group an iterable of records into lists of up to chunk_size"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 if __name__ == '__main__':
-    cleaned_data = clean_datacenters('datacenters.json', 'datacenters_cleaned.json')
+    metrics = RunMetrics('clean_data')
+    if len(sys.argv) > 1 and sys.argv[1] == '--stream':
+        # python clean_data.py --stream [input.ndjson|input.json] [output.ndjson]
+        input_file = sys.argv[2] if len(sys.argv) > 2 else 'datacenters.json'
+        output_file = sys.argv[3] if len(sys.argv) > 3 else 'datacenters_cleaned.ndjson'
+        clean_datacenters_stream(input_file, output_file, metrics=metrics)
+    else:
+        cleaned_data = clean_datacenters('datacenters.json', 'datacenters_cleaned.json', metrics=metrics)
+    metrics.finish()
     print("\n[SUCCESS] Data cleaning complete!")
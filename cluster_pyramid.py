@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Cluster Pyramid for ATLAS Data Center Project
+
+Precomputes the marker clusters for every map zoom level (0-18) so the map
+does not have to run L.markerClusterGroup over every facility in the
+browser on each load and zoom.
+
+Clustering is grid based: at zoom z the Web Mercator world is split into
+cells of CELL_PX screen pixels and the facilities in a cell form one
+cluster. Cell sizes halve with each zoom, so every cluster at zoom z+1 lies
+inside exactly one cluster at zoom z and the levels form a hierarchy.
+
+Each cluster stores:
+- lat, lon    centroid of its facilities
+- count       number of facilities
+- id          cell key at its zoom (parent at zoom-1: (cx >> 1, cy >> 1))
+- expand      zoom at which it splits into several clusters (-1 for a
+              single facility)
+- row         dataset row of a single facility, -1 for clusters
+- top         top operators as [[company, facilities], ...] ([] for a
+              single facility, whose details are its dataset row)
+
+Output (in the output directory): one compact columnar JSON file per zoom,
+{zoom}.json, and index.json with the zoom range, cell size and cluster
+counts. ClusterPyramid.clusters(zoom, south, west, north, east) returns the
+clusters in a viewport (also served by api_server.py as /api/clusters).
+
+Usage:
+    python cluster_pyramid.py [input.json] [--out clusters] [--cell 64]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from columnar import encode_dict_column
+from dataset_io import replace_directory, staging_dir
+from tile_shards import locate, lonlat_to_mercator, mercator_to_lonlat
+
+INPUT_FILE = 'datacenters_cleaned.json'
+OUTPUT_DIR = 'clusters'
+INDEX_NAME = 'index.json'
+
+MIN_ZOOM = 0
+MAX_ZOOM = 18
+TILE_PX = 256
+CELL_PX = 64          # Cluster cell size in screen pixels (power of two, <= TILE_PX)
+TOP_OPERATORS = 3
+COORD_DECIMALS = 5
+
+
+def _cell_bits(cell_px):
+    bits = (TILE_PX // cell_px).bit_length() - 1
+    if cell_px <= 0 or cell_px > TILE_PX or TILE_PX % cell_px or (1 << bits) * cell_px != TILE_PX:
+        raise ValueError(f"cell size must be a power of two up to {TILE_PX}px")
+    return bits
+
+
+def _top_operators(cluster_ids, company_codes, n_clusters, dictionary, points):
+    """[[company, facilities], ...] (most first) per cluster, from the points selected by a mask"""
+    top = [[] for _ in range(n_clusters)]
+    known = points & (company_codes >= 0)
+    if not known.any():
+        return top
+    pairs = cluster_ids[known] * len(dictionary) + company_codes[known]
+    pairs, counts = np.unique(pairs, return_counts=True)
+    clusters, companies = np.divmod(pairs, len(dictionary))
+
+    # Most facilities first within each cluster; keep the first few
+    order = np.lexsort((companies, -counts, clusters))
+    clusters, companies, counts = clusters[order], companies[order], counts[order]
+    first = np.searchsorted(clusters, clusters, 'left')
+    keep = np.arange(len(clusters)) - first < TOP_OPERATORS
+    for cluster, company, count in zip(clusters[keep].tolist(), companies[keep].tolist(), counts[keep].tolist()):
+        top[cluster].append([dictionary[company], count])
+    return top
+
+
+class ClusterPyramid:
+    """Per-zoom cluster arrays"""
+
+    COLUMNS = ('lat', 'lon', 'count', 'id', 'expand', 'row', 'top')
+
+    def __init__(self, levels, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, cell_px=CELL_PX, total=0):
+        """levels: {zoom: {column: list or array}}"""
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.cell_px = cell_px
+        self.total = total
+        self.levels = {}
+        for zoom, level in levels.items():
+            level = dict(level)
+            for column in ('lat', 'lon'):
+                level[column] = np.asarray(level[column], dtype=np.float64)
+            for column in ('count', 'id', 'expand', 'row'):
+                level[column] = np.asarray(level[column], dtype=np.int64)
+            self.levels[int(zoom)] = level
+
+    @classmethod
+    def build(cls, lats, lons, rows, company_codes, companies, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM,
+              cell_px=CELL_PX):
+        """Cluster points (dataset rows with company dictionary codes, -1 = none)"""
+        bits = _cell_bits(cell_px)
+        mx, my = lonlat_to_mercator(lats, lons)
+        rows = np.asarray(rows, dtype=np.int64)
+        company_codes = np.asarray(company_codes, dtype=np.int64)
+
+        levels = {}
+        child = None    # Previous (finer) level: parent key and expand per cluster
+        for zoom in range(max_zoom, min_zoom - 1, -1):
+            n = 1 << (zoom + bits)
+            cx = np.clip(np.floor(mx * n), 0, n - 1).astype(np.int64)
+            cy = np.clip(np.floor(my * n), 0, n - 1).astype(np.int64)
+            keys, inverse, counts = np.unique(cy * n + cx, return_inverse=True, return_counts=True)
+            inverse = inverse.ravel()
+
+            # Centroid in Mercator space, as the map projects it
+            cent_lat, cent_lon = mercator_to_lonlat(np.bincount(inverse, mx) / counts,
+                                                    np.bincount(inverse, my) / counts)
+
+            single_row = np.full(len(keys), -1, dtype=np.int64)
+            single = counts == 1
+            single_row[inverse[single[inverse]]] = rows[single[inverse]]
+
+            # Zoom at which each cluster splits: the next zoom if it has
+            # several children there, else whenever its only child splits
+            if child is None:
+                expand = np.where(single, -1, max_zoom + 1)
+            else:
+                parent = np.searchsorted(keys, child['parent'])
+                children = np.bincount(parent, minlength=len(keys))
+                only_child = np.zeros(len(keys), dtype=np.int64)
+                only_child[parent] = np.arange(len(parent))
+                expand = np.where(children > 1, zoom + 1, child['expand'][only_child])
+                expand[single] = -1
+
+            levels[zoom] = {
+                'lat': np.round(cent_lat, COORD_DECIMALS),
+                'lon': np.round(cent_lon, COORD_DECIMALS),
+                'count': counts,
+                'id': keys,
+                'expand': expand,
+                'row': single_row,
+                'top': _top_operators(inverse, company_codes, len(keys), companies, ~single[inverse]),
+            }
+            child = {'parent': (keys // n >> 1) * (n >> 1) + (keys % n >> 1), 'expand': expand}
+
+        return cls(levels, min_zoom, max_zoom, cell_px, len(rows))
+
+    @classmethod
+    def from_records(cls, data, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, cell_px=CELL_PX):
+        """Build from facility dicts; rows are positions in data"""
+        lats, lons, located = locate(data)
+        rows = np.flatnonzero(located)
+        codes, companies = encode_dict_column([data[i].get('company') for i in rows.tolist()])
+        return cls.build(lats[rows], lons[rows], rows, codes, companies, min_zoom, max_zoom, cell_px)
+
+    def __len__(self):
+        return self.total
+
+    def clusters(self, zoom, south=-90.0, west=-180.0, north=90.0, east=180.0):
+        """Clusters at zoom (clamped to the built range) with centroids in a bounding box
+
+        west > east crosses the antimeridian. Returns a list of dicts.
+        """
+        zoom = min(max(int(zoom), self.min_zoom), self.max_zoom)
+        level = self.levels[zoom]
+        lat, lon = level['lat'], level['lon']
+        mask = (lat >= south) & (lat <= north)
+        if east - west < 360:
+            mask &= ((lon >= west) & (lon <= east)) if west <= east else ((lon >= west) | (lon <= east))
+        result = []
+        for i in np.flatnonzero(mask).tolist():
+            cluster = {column: level[column][i] for column in self.COLUMNS}
+            cluster['lat'] = float(cluster['lat'])
+            cluster['lon'] = float(cluster['lon'])
+            for column in ('count', 'id', 'expand', 'row'):
+                cluster[column] = int(cluster[column])
+            result.append(cluster)
+        return result
+
+    def save(self, out_dir=OUTPUT_DIR):
+        """Write {zoom}.json per level and index.json (swapped in when complete)
+
+        An existing out_dir that is not a cluster pyramid (no index.json
+        with zooms) is left alone and ValueError raised.
+        """
+        tmp_dir = staging_dir(out_dir)
+        try:
+            zooms = {}
+            for zoom, level in sorted(self.levels.items()):
+                payload = {'zoom': zoom}
+                for column in self.COLUMNS:
+                    values = level[column]
+                    payload[column] = values.tolist() if isinstance(values, np.ndarray) else values
+                body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+                with open(os.path.join(tmp_dir, f'{zoom}.json'), 'w', encoding='utf-8') as f:
+                    f.write(body)
+                zooms[str(zoom)] = {'clusters': len(level['count']), 'bytes': len(body.encode('utf-8'))}
+
+            index = {'min_zoom': self.min_zoom, 'max_zoom': self.max_zoom, 'cell_px': self.cell_px,
+                     'total': self.total, 'zooms': zooms}
+            with open(os.path.join(tmp_dir, INDEX_NAME), 'w', encoding='utf-8') as f:
+                json.dump(index, f, separators=(',', ':'))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        replace_directory(tmp_dir, out_dir, INDEX_NAME, 'zooms')
+        return index
+
+    @classmethod
+    def load(cls, out_dir=OUTPUT_DIR):
+        with open(os.path.join(out_dir, INDEX_NAME), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        levels = {}
+        for zoom in index['zooms']:
+            with open(os.path.join(out_dir, f'{zoom}.json'), 'r', encoding='utf-8') as f:
+                levels[int(zoom)] = json.load(f)
+        return cls(levels, index['min_zoom'], index['max_zoom'], index['cell_px'], index['total'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute map clusters for every zoom level')
+    parser.add_argument('input', nargs='?', default=INPUT_FILE)
+    parser.add_argument('--out', default=OUTPUT_DIR)
+    parser.add_argument('--cell', type=int, default=CELL_PX, help='cluster cell size in pixels')
+    parser.add_argument('--min-zoom', type=int, default=MIN_ZOOM)
+    parser.add_argument('--max-zoom', type=int, default=MAX_ZOOM)
+    args = parser.parse_args()
+
+    from dataset_io import load_dataset
+    data = load_dataset(args.input)
+
+    start = time.perf_counter()
+    pyramid = ClusterPyramid.from_records(data, args.min_zoom, args.max_zoom, args.cell)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    try:
+        index = pyramid.save(args.out)
+    except ValueError as e:
+        raise SystemExit(f"[ERROR] {e}")
+    save_time = time.perf_counter() - start
+
+    print(f"Clustered {pyramid.total} facilities for zooms {args.min_zoom}-{args.max_zoom} "
+          f"in {build_time*1000:.1f}ms (save {save_time*1000:.1f}ms)")
+    for zoom, level in index['zooms'].items():
+        print(f"  zoom {zoom:>2}: {level['clusters']:7} clusters  {level['bytes']/1024:8.1f}KB")
+    print(f"\n[SUCCESS] Wrote {args.out}/{INDEX_NAME}")
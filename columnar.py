@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Columnar Binary Dataset for ATLAS Data Center Project
+
+Compiles datacenters_cleaned.json into a single columnar file that loads by
+memory-mapping instead of parsing JSON and building a dict per facility.
+
+File layout (all integers little-endian):
+    b'ATLASCOL'            8-byte magic
+    uint32 version
+    uint64 header length
+    header                 UTF-8 JSON describing every column
+    column buffers         each aligned to 64 bytes
+
+Columns:
+- lat / lon            float64, NaN where city_coords is missing
+- country, company,
+  state, city          int32 codes into a per-column dictionary (-1 = missing)
+- name, address,
+  street, zip          UTF-8 strings: int64 offsets (rows + 1) + one byte blob
+- extra                every other field of the record as a JSON object
+                       string ('' if none), so record() rebuilds the full
+                       facility; empty values of the columns above are
+                       omitted and city_coords is only set when present
+
+Usage:
+    python columnar.py [input.json] [output.atlas]
+"""
+
+import json
+import mmap
+import struct
+import sys
+import time
+
+import numpy as np
+
+MAGIC = b'ATLASCOL'
+VERSION = 2
+READABLE_VERSIONS = (1, 2)   # Version 1 files have no extra column
+ALIGN = 64
+PREAMBLE = struct.Struct('<8sIQ')
+
+INPUT_FILE = 'datacenters_cleaned.json'
+OUTPUT_FILE = 'datacenters_cleaned.atlas'
+
+DICT_COLUMNS = ['country', 'company', 'state', 'city']
+STRING_COLUMNS = ['name', 'address', 'street', 'zip']
+EXTRA_COLUMN = 'extra'
+COLUMN_FIELDS = set(DICT_COLUMNS + STRING_COLUMNS + ['city_coords'])
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def encode_dict_column(values):
+    """Dictionary-encode values -> (int32 codes, [distinct values])"""
+    lookup = {}
+    dictionary = []
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None or value == '':
+            codes[i] = -1
+            continue
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(dictionary)
+            dictionary.append(value)
+        codes[i] = code
+    return codes, dictionary
+
+
+def _encode_string_column(values):
+    """Encode strings -> (int64 offsets, uint8 blob); None stored as ''"""
+    encoded = [(str(v) if v is not None else '').encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return offsets, blob
+
+
+def build_columnar(data, path):
+    """Write records (list of facility dicts) to a columnar file"""
+    rows = len(data)
+    buffers = []  # (name, ndarray)
+    columns = {}
+
+    lat = np.full(rows, np.nan, dtype=np.float64)
+    lon = np.full(rows, np.nan, dtype=np.float64)
+    for i, dc in enumerate(data):
+        coords = dc.get('city_coords')
+        if coords:
+            lat[i], lon[i] = coords
+    buffers += [('lat', lat), ('lon', lon)]
+    columns['lat'] = {'kind': 'float', 'buffers': ['lat']}
+    columns['lon'] = {'kind': 'float', 'buffers': ['lon']}
+
+    for name in DICT_COLUMNS:
+        codes, dictionary = encode_dict_column([dc.get(name) for dc in data])
+        buffers.append((name, codes))
+        columns[name] = {'kind': 'dict', 'buffers': [name], 'values': dictionary}
+
+    for name in STRING_COLUMNS:
+        offsets, blob = _encode_string_column([dc.get(name) for dc in data])
+        buffers += [(name + '.offsets', offsets), (name + '.data', blob)]
+        columns[name] = {'kind': 'string', 'buffers': [name + '.offsets', name + '.data']}
+
+    extra = []
+    for dc in data:
+        fields = {key: value for key, value in dc.items() if key not in COLUMN_FIELDS}
+        extra.append(json.dumps(fields, ensure_ascii=False, separators=(',', ':')) if fields else '')
+    offsets, blob = _encode_string_column(extra)
+    buffers += [(EXTRA_COLUMN + '.offsets', offsets), (EXTRA_COLUMN + '.data', blob)]
+    columns[EXTRA_COLUMN] = {'kind': 'string', 'buffers': [EXTRA_COLUMN + '.offsets', EXTRA_COLUMN + '.data']}
+
+    # Lay out buffers relative to the start of the data section
+    layout = {}
+    position = 0
+    for name, array in buffers:
+        layout[name] = {'offset': position, 'dtype': array.dtype.str, 'length': len(array)}
+        position = _align(position + array.nbytes)
+
+    header = json.dumps({'rows': rows, 'columns': columns, 'buffers': layout},
+                        ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    data_start = _align(PREAMBLE.size + len(header))
+
+    with open(path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for name, array in buffers:
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(data_start + position)
+
+    return rows
+
+
+class ColumnarDataset:
+    """Memory-mapped view of a columnar dataset file
+
+    Numeric and code columns are zero-copy NumPy arrays backed by the file;
+    pages are only read when touched. Arrays handed out stay valid after
+    close(): the mapping is released with its last array.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an ATLAS columnar file")
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported columnar version {version} in {path}")
+
+        header = json.loads(self._mmap[PREAMBLE.size:PREAMBLE.size + header_len].decode('utf-8'))
+        self.rows = header['rows']
+        self.columns = header['columns']
+        data_start = _align(PREAMBLE.size + header_len)
+
+        self._buffers = {}
+        for name, info in header['buffers'].items():
+            dtype = np.dtype(info['dtype'])
+            if info['length'] == 0:
+                self._buffers[name] = np.empty(0, dtype=dtype)
+                continue
+            self._buffers[name] = np.frombuffer(self._mmap, dtype=dtype,
+                                                count=info['length'], offset=data_start + info['offset'])
+        self._code_maps = {}
+
+        self.lat = self._buffers['lat']
+        self.lon = self._buffers['lon']
+
+    def __len__(self):
+        return self.rows
+
+    def close(self):
+        # Not mmap.close(): it fails while a caller still holds an array
+        # from codes()/lat/lon. The mapping is unmapped once the last view
+        # of it is garbage collected.
+        self._buffers = {}
+        self.lat = self.lon = None
+        self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Bulk access
+
+    def coords(self):
+        """(rows, 2) float64 array of [lat, lon] (NaN where missing)"""
+        return np.column_stack((self.lat, self.lon))
+
+    def has_coords(self):
+        """Boolean mask of rows with coordinates"""
+        return ~np.isnan(self.lat)
+
+    def codes(self, column):
+        """int32 code array for a dictionary column (-1 = missing)"""
+        return self._buffers[self.columns[column]['buffers'][0]]
+
+    def dictionary(self, column):
+        """Distinct values of a dictionary column, indexed by code"""
+        return self.columns[column]['values']
+
+    def code_of(self, column, value):
+        """Code for value in a dictionary column, or None if absent"""
+        if column not in self._code_maps:
+            self._code_maps[column] = {v: i for i, v in enumerate(self.dictionary(column))}
+        return self._code_maps[column].get(value)
+
+    def mask(self, column, value):
+        """Boolean mask of rows where a dictionary column equals value"""
+        code = self.code_of(column, value)
+        if code is None:
+            return np.zeros(self.rows, dtype=bool)
+        return self.codes(column) == code
+
+    def value_counts(self, column):
+        """{value: count} for a dictionary column"""
+        codes = self.codes(column)
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.dictionary(column)))
+        return {value: int(count) for value, count in zip(self.dictionary(column), counts) if count}
+
+    def strings(self, column, rows=None):
+        """Decode a string column (all rows, or the given row indices)"""
+        offsets_name, data_name = self.columns[column]['buffers']
+        offsets = self._buffers[offsets_name]
+        blob = self._buffers[data_name]
+        indices = range(self.rows) if rows is None else rows
+        return [bytes(blob[offsets[i]:offsets[i + 1]]).decode('utf-8') for i in indices]
+
+    def column(self, column, rows=None):
+        """Decode any column to Python values (all rows, or the given row indices)"""
+        kind = self.columns[column]['kind']
+        if kind == 'string':
+            return self.strings(column, rows)
+        if kind == 'dict':
+            dictionary = self.dictionary(column)
+            codes = self.codes(column) if rows is None else self.codes(column)[rows]
+            return [dictionary[c] if c >= 0 else None for c in codes.tolist()]
+        values = self._buffers[self.columns[column]['buffers'][0]]
+        return (values if rows is None else values[rows]).tolist()
+
+    def record(self, i):
+        """Rebuild one facility dict (empty column values omitted)"""
+        dc = {}
+        for column in STRING_COLUMNS + DICT_COLUMNS:
+            value = self.column(column, [i])[0]
+            if value not in (None, ''):
+                dc[column] = value
+        if not np.isnan(self.lat[i]):
+            dc['city_coords'] = [float(self.lat[i]), float(self.lon[i])]
+        if EXTRA_COLUMN in self.columns:
+            extra = self.strings(EXTRA_COLUMN, [i])[0]
+            if extra:
+                dc.update(json.loads(extra))
+        return dc
+
+
+def load_columnar(path=OUTPUT_FILE):
+    """Memory-map a columnar dataset file"""
+    return ColumnarDataset(path)
+
+
+if __name__ == '__main__':
+    input_file = sys.argv[1] if len(sys.argv) > 1 else INPUT_FILE
+    output_file = sys.argv[2] if len(sys.argv) > 2 else OUTPUT_FILE
+
+    print(f"Loading {input_file}...")
+    with open(input_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    start = time.perf_counter()
+    rows = build_columnar(data, output_file)
+    elapsed = time.perf_counter() - start
+    print(f"[SUCCESS] Wrote {rows} rows to {output_file} in {elapsed*1000:.1f}ms")
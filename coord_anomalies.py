@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Coordinate Anomaly Detector for ATLAS Data Center Project
+
+Finds bad coordinates across the whole dataset in a few vectorized passes,
+instead of spotting them on the map and hardcoding them in fix scripts
+(the old fix_southern_hemisphere.py flipped every positive latitude in a fixed list
+of countries, including northern ones like Colombia and Singapore).
+
+Flags:
+- out_of_range     latitude beyond +-90 or longitude beyond +-180
+- outside_country  outside the record's country box (coord_validation.py)
+- far_from_city    more than CITY_RADIUS_KM from the median position of the
+                   facilities in the same city and country
+- shared_point     one exact point shared by many facilities in different
+                   cities, or by several countries (leaked placeholder
+                   coordinates, like London UK for East London, ZA)
+
+City medians only use facilities that are inside their country and not on
+a shared point, so a city whose facilities are all flipped has no median
+rather than a wrong one.
+
+For each flagged record the most likely fix is proposed:
+- flip_lat / flip_lon / flip_both / swap - a sign flip or swapped lat/lon
+  that lands inside the record's country
+- city_median - the median position of the facility's city peers
+
+Confidence (0-1): a transform that lands in the country's bounds box
+scores 0.7, +0.25 if it also lands near the city median (-0.4 if it lands
+far from it), +0.25 if it lands inside the country's boundary polygon
+(country_polygons.py, when the boundary file is present), -0.2 if several
+transforms land in the country. With boundary polygons, a transform that
+lands in the box but outside the country's polygon does not count as
+landing. A sign flip of a point outside its country box scores +0.25 when
+it is the only transform that lands and the box lies entirely in the
+hemisphere it flips into (Australia, Argentina: south; Japan: north). A
+city_median proposal scores up to 0.8, by how tightly the city's
+facilities agree and how many there are.
+
+In the pipeline, flips and swaps at AUTO_APPLY_CONFIDENCE (0.95) or above -
+confirmed by a city median, a boundary polygon or a one-hemisphere box, not
+just the loose bounds box - are applied and written to the coord_corrections
+audit log; the rest are reported. The stage check fails while a record
+outside its country has exactly one sign flip landing in it and that flip
+was not applied (e.g. a flipped Brazilian city: Brazil's box spans the
+equator), so a known flip is turned into a reviewed rule instead of
+passing silently. --rules exports proposals as coord_corrections.json rules for
+review.
+
+Usage:
+    python coord_anomalies.py [input.json] [--json anomalies.json] [--rules rules.json]
+                              [--min-confidence 0.8]
+"""
+
+import argparse
+import json
+import re
+import time
+
+import numpy as np
+
+from columnar import encode_dict_column
+from coord_corrections import AuditLog
+from coord_validation import DUPLICATE_SENTINEL, OUT_OF_RANGE, OUTSIDE_COUNTRY, VALID, coords_to_arrays, get_validator
+from country_polygons import canonical_country, get_polygons
+from spatial_index import haversine_km
+
+INPUT_FILE = 'datacenters_cleaned.json'
+
+CITY_RADIUS_KM = 150.0        # Farther than this from the city median is an anomaly
+CITY_MIN_PEERS = 3            # Anchor facilities needed for a city median
+SHARED_MIN_FACILITIES = 5     # A point shared by at least this many facilities...
+SHARED_MIN_CITIES = 3         # ...in at least this many cities is a placeholder
+POINT_DECIMALS = 4
+AUTO_APPLY_CONFIDENCE = 0.95   # Bounds box (0.7) plus a city median, polygon or hemisphere confirmation
+REPORT_TOP = 20
+
+# Candidate corrections: name -> fn(lats, lons) -> (lats, lons)
+TRANSFORMS = {
+    'flip_lat': lambda lat, lon: (-lat, lon),
+    'flip_lon': lambda lat, lon: (lat, -lon),
+    'flip_both': lambda lat, lon: (-lat, -lon),
+    'swap': lambda lat, lon: (lon, lat),
+}
+FLIPS = ('flip_lat', 'flip_lon', 'flip_both')
+
+
+def _group_medians(groups, values, n_groups):
+    """Median of values per group id (NaN for empty groups)"""
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(n_groups, np.nan)
+    present = counts > 0
+    lo = starts[present] + (counts[present] - 1) // 2
+    hi = starts[present] + counts[present] // 2
+    medians[present] = (values[lo] + values[hi]) / 2
+    return medians
+
+
+class AnomalyReport:
+    """Flags and ranked fix proposals for one dataset"""
+
+    def __init__(self, size, flags=None, proposals=None):
+        self.size = size
+        self.flags = flags or {}              # row -> [flag names]
+        self.proposals = proposals or []      # dicts, most confident first
+
+    def counts(self):
+        counts = {}
+        for flags in self.flags.values():
+            for flag in flags:
+                counts[flag] = counts.get(flag, 0) + 1
+        return counts
+
+    def auto_fixes(self, min_confidence=AUTO_APPLY_CONFIDENCE):
+        """Sign flip / swap proposals confident enough to apply without review"""
+        return [p for p in self.proposals if p['kind'] in TRANSFORMS and p['confidence'] >= min_confidence]
+
+    def unapplied_flips(self, min_confidence=AUTO_APPLY_CONFIDENCE):
+        """Sign flips below min_confidence that are the only way back into the country"""
+        return [p for p in self.proposals if p['kind'] in FLIPS and p['landing'] == 1
+                and 'outside_country' in p['flags'] and p['confidence'] < min_confidence]
+
+    def to_json(self):
+        return {'total': self.size, 'flagged': len(self.flags), 'counts': self.counts(),
+                'proposals': self.proposals}
+
+
+def detect(data, validator=None, polygons=None):
+    """Flag anomalous coordinates in data and propose fixes; returns an AnomalyReport
+
+    polygons defaults to the shared CountryPolygons (none without a
+    boundary file).
+    """
+    validator = validator or get_validator()
+    polygons = polygons or get_polygons()
+    lats, lons = coords_to_arrays(data)
+    located = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+    if len(located) == 0:
+        return AnomalyReport(len(data))
+
+    rows = located.tolist()
+    countries = [data[i].get('country') for i in rows]
+    lat, lon = lats[located], lons[located]
+    code = validator.country_codes(countries)
+    reasons = validator.validate_arrays(lat, lon, code)
+    out_of_range = reasons == OUT_OF_RANGE
+    outside = (reasons == OUTSIDE_COUNTRY) | out_of_range
+
+    # Exact points shared by many facilities in different cities (or countries)
+    city, _ = encode_dict_column([f"{country}\x00{data[i].get('city')}" if data[i].get('city') else None
+                                  for i, country in zip(rows, countries)])
+    has_city = city >= 0
+    scale = 10 ** POINT_DECIMALS
+    points = (np.round(lat * scale).astype(np.int64) * (1 << 32) +
+              np.round(lon * scale).astype(np.int64))      # One int64 key per point: no axis=0 unique
+    _, point_id, point_count = np.unique(points, return_inverse=True, return_counts=True)
+    point_id = point_id.ravel()
+    city_key = np.where(has_city, city, len(city) + np.arange(len(rows)))    # No city: distinct
+    pairs = np.unique(point_id.astype(np.int64) * (2 * len(rows)) + city_key) // (2 * len(rows))
+    cities_per_point = np.bincount(pairs, minlength=len(point_count))
+    shared = ((point_count[point_id] >= SHARED_MIN_FACILITIES) &
+              (cities_per_point[point_id] >= SHARED_MIN_CITIES)) | (reasons == DUPLICATE_SENTINEL)
+
+    # City medians over anchors: in-country facilities on their own point
+    n_cities = int(city.max()) + 1 if has_city.any() else 0
+    anchor = has_city & (reasons == VALID) & ~shared
+    peers = np.bincount(city[anchor], minlength=n_cities)
+    median_lat = _group_medians(city[anchor], lat[anchor], n_cities)
+    median_lon = _group_medians(city[anchor], lon[anchor], n_cities)
+    safe_city = np.where(has_city, city, 0)
+    has_median = has_city & (peers[safe_city] >= CITY_MIN_PEERS) if n_cities else np.zeros(len(rows), dtype=bool)
+    city_lat = np.where(has_median, median_lat[safe_city] if n_cities else 0, np.nan)
+    city_lon = np.where(has_median, median_lon[safe_city] if n_cities else 0, np.nan)
+
+    city_dist = np.full(len(rows), np.inf)
+    city_dist[has_median] = haversine_km(lat[has_median], lon[has_median], city_lat[has_median], city_lon[has_median])
+    far = has_median & (city_dist > CITY_RADIUS_KM)
+
+    # Share of each city's anchors within the radius (how trustworthy its median is)
+    agree = np.zeros(n_cities)
+    if n_cities:
+        close = anchor & (city_dist <= CITY_RADIUS_KM)
+        agree = np.bincount(city[close], minlength=n_cities) / np.maximum(peers, 1)
+
+    suspect = np.flatnonzero(outside | far | shared)
+    s_lat, s_lon, s_code, s_median = lat[suspect], lon[suspect], code[suspect], has_median[suspect]
+    s_city_lat, s_city_lon = city_lat[suspect], city_lon[suspect]
+    if polygons is not None:
+        s_polygon = np.fromiter((polygons.index.get(canonical_country(countries[r]), -1) for r in suspect.tolist()),
+                                dtype=np.int64, count=len(suspect))
+
+    # Score every transform for every suspect at once
+    names = list(TRANSFORMS)
+    scores, targets = [], []
+    for transform in TRANSFORMS.values():
+        t_lat, t_lon = transform(s_lat, s_lon)
+        lands = (np.abs(t_lat) <= 90) & (np.abs(t_lon) <= 180) & (s_code >= 0)
+        lands &= validator.in_country(np.where(lands, t_lat, 0), np.where(lands, t_lon, 0), s_code)
+        near = haversine_km(t_lat, t_lon, s_city_lat, s_city_lon) <= CITY_RADIUS_KM
+        score = np.full(len(suspect), 0.7)
+        score[s_median] += np.where(near[s_median], 0.25, -0.4)
+        if polygons is not None:
+            # The bounds box is loose (the US box spans the Pacific): where the
+            # country has a polygon, landing means landing inside it
+            check = np.flatnonzero(lands & (s_polygon >= 0))
+            inside = polygons.country_of(t_lat[check], t_lon[check]) == s_polygon[check]
+            lands[check[~inside]] = False
+            score[check[inside]] += 0.25
+        scores.append(np.where(lands, score, -np.inf))
+        targets.append((t_lat, t_lon))
+    scores = np.array(scores)
+    landing = np.isfinite(scores).sum(axis=0)
+    scores[:, landing > 1] -= 0.2
+
+    # A point outside its country whose only landing is a sign flip into a
+    # box lying in one hemisphere is a sign error, median or not
+    m = validator.margin
+    safe_code = np.where(s_code >= 0, s_code, 0)
+    south, north = validator.south[safe_code] - m, validator.north[safe_code] + m
+    west, east = validator.west[safe_code] - m, validator.east[safe_code] + m
+    one_lat = (south >= 0) | (north <= 0)
+    one_lon = (validator.west[safe_code] <= validator.east[safe_code]) & ((west >= 0) | (east <= 0))
+    unique = outside[suspect] & (landing == 1)
+    for t, one_hemisphere in (('flip_lat', one_lat), ('flip_lon', one_lon), ('flip_both', one_lat & one_lon)):
+        t = names.index(t)
+        scores[t, unique & one_hemisphere & np.isfinite(scores[t])] += 0.25
+    best = np.argmax(scores, axis=0)
+    best_score = scores[best, np.arange(len(suspect))]
+    # Only records that are actually misplaced get a flip; a shared point
+    # that is otherwise in place is a placeholder, not a sign error
+    use_transform = np.isfinite(best_score) & (outside | far)[suspect]
+
+    median_lands = np.zeros(len(suspect), dtype=bool)
+    median_lands[s_median] = validator.in_country(s_city_lat[s_median], s_city_lon[s_median], s_code[s_median])
+    s_peers = peers[safe_city[suspect]] if n_cities else np.zeros(len(suspect))
+    median_score = 0.3 + 0.5 * (agree[safe_city[suspect]] if n_cities else 0) * np.minimum(1.0, s_peers / 5)
+
+    flags = {}
+    proposals = []
+    for j, r in enumerate(suspect.tolist()):
+        row = rows[r]
+        row_flags = [name for name, mask in (('out_of_range', out_of_range), ('outside_country', outside),
+                                             ('far_from_city', far), ('shared_point', shared)) if mask[r]]
+        flags[row] = row_flags
+
+        if use_transform[j]:
+            kind = names[best[j]]
+            t_lat, t_lon = targets[best[j]]
+            proposed = [float(t_lat[j]), float(t_lon[j])]
+            confidence = float(best_score[j])
+        elif median_lands[j]:
+            kind = 'city_median'
+            proposed = [round(float(s_city_lat[j]), 6), round(float(s_city_lon[j]), 6)]
+            confidence = float(median_score[j])
+        else:
+            kind, proposed, confidence = None, None, 0.0
+
+        dc = data[row]
+        proposals.append({
+            'row': row,
+            'name': dc.get('name'),
+            'city': dc.get('city'),
+            'country': dc.get('country'),
+            'flags': row_flags,
+            'coords': dc.get('city_coords'),
+            'kind': kind,
+            'proposed': proposed,
+            'confidence': round(min(1.0, max(0.0, confidence)), 3),
+            'landing': int(landing[j]),
+        })
+
+    proposals.sort(key=lambda p: (-p['confidence'], p['row']))
+    return AnomalyReport(len(data), flags, proposals)
+
+
+def apply_fixes(data, report, min_confidence=AUTO_APPLY_CONFIDENCE, changed=None, audit=None):
+    """Apply a report's auto-applicable proposals to data in place
+
+    Returns {kind: [facility names]}. If changed is a list, the index of
+    every record fixed is appended to it; audit is a coord_corrections
+    AuditLog (default: appended to its audit file, rule "anomaly:<kind>").
+    """
+    audit = audit if audit is not None else AuditLog()
+    fixes_by_kind = {}
+    for proposal in report.auto_fixes(min_confidence):
+        dc = data[proposal['row']]
+        audit.record(f"anomaly:{proposal['kind']}", dc, 'city_coords', dc.get('city_coords'), proposal['proposed'])
+        dc['city_coords'] = proposal['proposed']
+        fixes_by_kind.setdefault(proposal['kind'], []).append(dc.get('name'))
+        if changed is not None:
+            changed.append(proposal['row'])
+    audit.flush()
+    return fixes_by_kind
+
+
+def fix_records(data, changed=None):
+    """Pipeline stage: detect anomalies, apply confident flips/swaps, report the rest"""
+    report = detect(data)
+    fixes_by_kind = apply_fixes(data, report, changed=changed)
+    for kind, facilities in fixes_by_kind.items():
+        print(f"  {kind}: {len(facilities)} facilities")
+        for name in facilities[:3]:
+            print(f"    - {name}")
+        if len(facilities) > 3:
+            print(f"    ... and {len(facilities) - 3} more")
+    return sum(len(facilities) for facilities in fixes_by_kind.values())
+
+
+def check_records(data):
+    """Post-condition: no confident or only-way-back flip/swap left unapplied (other anomalies are reported)"""
+    report = detect(data)
+    pending = report.auto_fixes()
+    review = len(report.flags) - len(pending)
+    if review:
+        print(f"  [INFO] {review} coordinate anomalies for review ({_format_counts(report.counts())}); "
+              f"run coord_anomalies.py for proposals")
+    if pending:
+        print(f"  [ERROR] {len(pending)} confident coordinate fixes not applied")
+        return False
+    flips = report.unapplied_flips()
+    if flips:
+        names = ', '.join(f"{p['name']} ({p['country']})" for p in flips[:3])
+        more = f" and {len(flips) - 3} more" if len(flips) > 3 else ""
+        print(f"  [ERROR] {len(flips)} facilities outside their country with one sign flip back in, "
+              f"not auto-applied: {names}{more}; export rules with coord_anomalies.py --rules")
+        return False
+    print(f"  [OK] No sign-flipped or swapped coordinates")
+    return True
+
+
+def _format_counts(counts):
+    return ', '.join(f"{flag} {count}" for flag, count in sorted(counts.items()))
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', (text or '').lower()).strip('-')
+
+
+def proposals_to_rules(report, min_confidence):
+    """coord_corrections.json rules for proposals at min_confidence or above"""
+    rules = []
+    seen = set()
+    for proposal in report.proposals:
+        if proposal['kind'] is None or proposal['confidence'] < min_confidence:
+            continue
+        rule_id = base = f"{_slug(proposal['name'])}-{_slug(proposal['country'])}"
+        suffix = 2
+        while rule_id in seen:
+            rule_id, suffix = f"{base}-{suffix}", suffix + 1
+        seen.add(rule_id)
+        rules.append({
+            'id': rule_id,
+            'note': f"{proposal['kind']} ({', '.join(proposal['flags'])}), confidence {proposal['confidence']}",
+            'match': {'name': proposal['name'], 'country': proposal['country'], 'coords': proposal['coords']},
+            'set': {'city_coords': proposal['proposed']},
+        })
+    return rules
+
+
+def print_report(report, elapsed, top=REPORT_TOP):
+    print(f"\nScanned {report.size} facilities in {elapsed*1000:.1f}ms: {len(report.flags)} flagged")
+    for flag, count in sorted(report.counts().items()):
+        print(f"  {flag:<16} {count:6}")
+
+    kinds = {}
+    for proposal in report.proposals:
+        kinds[proposal['kind'] or 'none'] = kinds.get(proposal['kind'] or 'none', 0) + 1
+    print(f"\n  Proposals: {_format_counts(kinds) or 'none'} "
+          f"({len(report.auto_fixes())} at >= {AUTO_APPLY_CONFIDENCE} would be auto-applied)")
+
+    if report.proposals:
+        print(f"\n  Top {min(top, len(report.proposals))} by confidence:")
+    for proposal in report.proposals[:top]:
+        print(f"    {proposal['confidence']:.2f}  {proposal['kind'] or '-':<11}  {proposal['name']} "
+              f"({proposal['city']}, {proposal['country']}): {proposal['coords']} -> {proposal['proposed']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Detect coordinate anomalies and propose fixes')
+    parser.add_argument('input', nargs='?', default=INPUT_FILE)
+    parser.add_argument('--json', help='write the full report to this file')
+    parser.add_argument('--rules', help='write proposals as coord_corrections.json rules to this file')
+    parser.add_argument('--min-confidence', type=float, default=0.8, help='lowest confidence exported by --rules')
+    args = parser.parse_args()
+
+    from dataset_io import load_dataset
+    data = load_dataset(args.input)
+
+    start = time.perf_counter()
+    report = detect(data)
+    print_report(report, time.perf_counter() - start)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report.to_json(), f, indent=2, ensure_ascii=False)
+        print(f"\nWrote report to {args.json}")
+    if args.rules:
+        rules = proposals_to_rules(report, args.min_confidence)
+        with open(args.rules, 'w', encoding='utf-8') as f:
+            json.dump({'rules': rules}, f, indent=2, ensure_ascii=False)
+        print(f"\nWrote {len(rules)} rules (confidence >= {args.min_confidence}) to {args.rules}")
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Coordinate Corrections for ATLAS Data Center Project
+
+Applies the correction rules in coord_corrections.json to a dataset in one
+pass. Adding a fix is an edit to that file, not a new fix_* script.
+
+Each rule has an id, a note, a match and the fields to set:
+    {"id": "east-london-za",
+     "match": {"coords": [-51.5074, -0.1278], "country": "South Africa"},
+     "set": {"city_coords": [-33.0153, 27.9116]}}
+
+Match conditions (all given conditions must hold):
+- coords   [lat, lon] within epsilon degrees (rule "epsilon" or the table's),
+           or a list of such points (any of them)
+- name     facility name, or a list of names
+- country  country, or a list of countries
+- bbox     [south, west, north, east] the coordinates must lie in
+
+Coordinate rules are found through a spatial hash of CELL_DEGREES cells,
+so matching does not depend on how the floats are formatted and costs no
+per-row string keys. A record gets the first matching rule in file order.
+New city_coords are validated against the rule's country bounds when the
+table is loaded. Every change is appended to an audit log (JSONL: time,
+rule, facility name and country, field, old and new value).
+
+Usage:
+    python coord_corrections.py [datacenters.json datacenters_cleaned.json ...]
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+from coord_validation import VALID, coords_to_arrays, get_validator
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'coord_corrections.json')
+AUDIT_FILE = 'coord_corrections.audit.jsonl'
+INPUT_FILES = ['datacenters.json', 'datacenters_cleaned.json']
+
+DEFAULT_EPSILON = 1e-4
+CELL_DEGREES = 0.01       # Spatial hash cell; rules cover every cell their epsilon box touches
+MATCH_KEYS = ('coords', 'name', 'country', 'bbox')
+
+
+def _as_set(value):
+    return {value} if isinstance(value, str) else set(value)
+
+
+def _cell(values):
+    return np.floor(np.asarray(values, dtype=np.float64) / CELL_DEGREES).astype(np.int64)
+
+
+def _cell_keys(lat_cells, lon_cells):
+    return lat_cells * (1 << 32) + lon_cells
+
+
+class CorrectionRule:
+    """One parsed rule"""
+
+    def __init__(self, spec, default_epsilon):
+        self.id = spec.get('id')
+        match = spec.get('match') or {}
+        unknown = set(match) - set(MATCH_KEYS)
+        if not self.id or not match or unknown or not spec.get('set'):
+            raise ValueError(f"invalid correction rule {spec!r}: needs id, match ({', '.join(MATCH_KEYS)}) and set")
+
+        self.note = spec.get('note', '')
+        self.set = spec['set']
+        coords = match.get('coords')
+        if coords is not None and not isinstance(coords[0], (list, tuple)):
+            coords = [coords]
+        self.coords = coords
+        self.epsilon = float(spec.get('epsilon', default_epsilon))
+        self.names = _as_set(match['name']) if 'name' in match else None
+        self.countries = _as_set(match['country']) if 'country' in match else None
+        self.bbox = match.get('bbox')
+
+    def matches(self, dc, lat, lon):
+        if self.names is not None and dc.get('name') not in self.names:
+            return False
+        if self.countries is not None and dc.get('country') not in self.countries:
+            return False
+        if self.coords is not None:
+            if not any(abs(lat - point[0]) <= self.epsilon and abs(lon - point[1]) <= self.epsilon
+                       for point in self.coords):
+                return False
+        if self.bbox is not None:
+            south, west, north, east = self.bbox
+            in_lon = west <= lon <= east if west <= east else (lon >= west or lon <= east)
+            if not (south <= lat <= north and in_lon):
+                return False
+        return True
+
+
+class CorrectionTable:
+    """Correction rules indexed for one-pass matching"""
+
+    def __init__(self, spec):
+        epsilon = float(spec.get('epsilon', DEFAULT_EPSILON))
+        self.rules = [CorrectionRule(rule, epsilon) for rule in spec.get('rules', [])]
+        self.strict_countries = list(spec.get('strict_countries', []))
+
+        ids = [rule.id for rule in self.rules]
+        duplicates = sorted({i for i in ids if ids.count(i) > 1})
+        if duplicates:
+            raise ValueError(f"duplicate correction rule ids: {', '.join(duplicates)}")
+        self._validate_targets()
+
+        # Spatial hash: cell key -> coordinate rules whose epsilon box touches it
+        self.cells = defaultdict(list)
+        self.by_name = defaultdict(list)
+        self.bbox_rules = []
+        self.other_rules = []     # Country-only rules
+        for r, rule in enumerate(self.rules):
+            if rule.coords is not None:
+                for lat, lon in rule.coords:
+                    lat_first, lat_last = _cell([lat - rule.epsilon, lat + rule.epsilon]).tolist()
+                    lon_first, lon_last = _cell([lon - rule.epsilon, lon + rule.epsilon]).tolist()
+                    for lat_cell in range(lat_first, lat_last + 1):
+                        for lon_cell in range(lon_first, lon_last + 1):
+                            self.cells[int(_cell_keys(lat_cell, lon_cell))].append(r)
+            elif rule.bbox is not None:
+                self.bbox_rules.append(r)
+            elif rule.names is not None:
+                for name in rule.names:
+                    self.by_name[name].append(r)
+            else:
+                self.other_rules.append(r)
+        self.cell_keys = np.array(sorted(self.cells), dtype=np.int64)
+
+    @classmethod
+    def load(cls, path=RULES_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _validate_targets(self):
+        """New coordinates must be valid, and inside the rule's country if it names one"""
+        validator = get_validator()
+        for rule in self.rules:
+            coords = rule.set.get('city_coords')
+            if coords is None:
+                continue
+            countries = sorted(rule.countries) if rule.countries else [None]
+            if not all(validator.is_valid(coords, country) for country in countries):
+                raise ValueError(f"correction rule {rule.id}: {coords} is not a valid location in "
+                                 f"{', '.join(c for c in countries if c) or 'range'}")
+
+    def __len__(self):
+        return len(self.rules)
+
+    def candidates(self, data):
+        """({row: sorted candidate rule indices}, lats, lons) for records some rule may match"""
+        lats, lons = coords_to_arrays(data)
+        candidates = defaultdict(set)
+
+        located = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        if len(self.cell_keys) and len(located):
+            keys = _cell_keys(_cell(lats[located]), _cell(lons[located]))
+            hit = np.isin(keys, self.cell_keys)
+            for row, key in zip(located[hit].tolist(), keys[hit].tolist()):
+                candidates[row].update(self.cells[key])
+
+        for r in self.bbox_rules:
+            south, west, north, east = self.rules[r].bbox
+            with np.errstate(invalid='ignore'):
+                in_lon = (lons >= west) & (lons <= east) if west <= east else (lons >= west) | (lons <= east)
+                inside = (lats >= south) & (lats <= north) & in_lon
+            for row in np.flatnonzero(inside).tolist():
+                candidates[row].add(r)
+
+        if self.by_name or self.other_rules:
+            for row, dc in enumerate(data):
+                rules = self.by_name.get(dc.get('name'))
+                if rules:
+                    candidates[row].update(rules)
+                if self.other_rules:
+                    candidates[row].update(self.other_rules)
+
+        return {row: sorted(rules) for row, rules in candidates.items()}, lats, lons
+
+    def match(self, data):
+        """[(row, rule)] of the first matching rule per record"""
+        candidates, lats, lons = self.candidates(data)
+        matched = []
+        for row in sorted(candidates):
+            dc = data[row]
+            for r in candidates[row]:
+                if self.rules[r].matches(dc, lats[row], lons[row]):
+                    matched.append((row, self.rules[r]))
+                    break
+        return matched
+
+
+class AuditLog:
+    """Append-only JSONL log of applied corrections"""
+
+    def __init__(self, path=AUDIT_FILE):
+        self.path = path
+        self.entries = []
+
+    def record(self, rule_id, dc, field, old, new):
+        self.entries.append({'rule': rule_id, 'name': dc.get('name'), 'country': dc.get('country'),
+                             'field': field, 'old': old, 'new': new})
+
+    def flush(self):
+        """Write recorded entries (one timestamp per batch); returns entries written"""
+        if not self.entries or self.path is None:
+            return 0
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for entry in self.entries:
+                f.write(json.dumps({'time': now, **entry}, ensure_ascii=False) + '\n')
+        written = len(self.entries)
+        self.entries = []
+        return written
+
+
+def rules_version(path=RULES_FILE):
+    """Hash of the parsed rules (pipeline stage version: editing the rules reapplies them)
+
+    Formatting-only edits (whitespace, key order) keep the same version.
+    Geocoded coordinates do not depend on it (see process_manifest.py).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+    canonical = json.dumps(rules, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=8).hexdigest()
+
+
+_default_table = None
+
+
+def get_table():
+    """Shared correction table (rules file loaded once per process)"""
+    global _default_table
+    if _default_table is None:
+        _default_table = CorrectionTable.load()
+    return _default_table
+
+
+def apply_corrections(data, table=None, changed=None, audit=None):
+    """Apply correction rules to data in place
+
+    Returns (fixed_count, {rule id: [facility names]}). If changed is a
+    list, the index of every record corrected is appended to it; audit is
+    an AuditLog (default: appended to AUDIT_FILE).
+    """
+    table = table or get_table()
+    audit = audit if audit is not None else AuditLog()
+    fixed_count = 0
+    fixes_by_rule = {}
+
+    for row, rule in table.match(data):
+        dc = data[row]
+        updates = {field: value for field, value in rule.set.items() if dc.get(field) != value}
+        if not updates:
+            continue
+        for field, value in updates.items():
+            audit.record(rule.id, dc, field, dc.get(field), value)
+            dc[field] = value
+        fixed_count += 1
+        fixes_by_rule.setdefault(rule.id, []).append(dc.get('name'))
+        if changed is not None:
+            changed.append(row)
+
+    audit.flush()
+    return fixed_count, fixes_by_rule
+
+
+def print_corrections(fixes_by_rule, table=None):
+    """Show what was corrected"""
+    notes = {rule.id: rule.note for rule in (table or get_table()).rules}
+    for rule_id, facilities in fixes_by_rule.items():
+        print(f"\n  {rule_id} - {notes.get(rule_id, '')}: {len(facilities)} facilities")
+        for name in facilities[:3]:  # Show first 3
+            print(f"    - {name}")
+        if len(facilities) > 3:
+            print(f"    ... and {len(facilities) - 3} more")
+
+
+def check_records(data, table=None):
+    """Post-condition: no rule still changes a record, strict countries are in bounds"""
+    table = table or get_table()
+    pending = [(row, rule) for row, rule in table.match(data)
+               if any(data[row].get(field) != value for field, value in rule.set.items())]
+
+    validator = get_validator()
+    outside = []
+    for country in table.strict_countries:
+        located = [dc for dc in data if dc.get('country') == country and dc.get('city_coords')]
+        reasons = validator.validate_records(located)
+        outside += [dc for dc, reason in zip(located, reasons.tolist()) if reason != VALID]
+
+    if pending:
+        print(f"  [ERROR] {len(pending)} records still match a correction rule:")
+        for row, rule in pending[:10]:
+            print(f"    {data[row].get('name')} ({data[row].get('country')}): {rule.id}")
+    if outside:
+        print(f"  [ERROR] {len(outside)} facilities outside {', '.join(table.strict_countries)} bounds:")
+        for dc in outside[:10]:
+            print(f"    {dc.get('name')} ({dc.get('city')}): {dc['city_coords']}")
+    if pending or outside:
+        return False
+
+    print(f"  [OK] No records match a correction rule ({len(table)} rules)")
+    return True
+
+
+if __name__ == '__main__':
+    from dataset_io import load_dataset, save_dataset
+    from run_metrics import RunMetrics
+
+    metrics = RunMetrics('coord_corrections')
+    files = sys.argv[1:] or INPUT_FILES
+    with metrics.stage('load rules') as stage:
+        table = get_table()
+        stage['records'] = len(table)
+    print(f"Loaded {len(table)} correction rules from {RULES_FILE}")
+
+    all_ok = True
+    for path in files:
+        with metrics.stage(f'load {path}') as stage:
+            data = load_dataset(path)
+            stage['records'] = len(data)
+        with metrics.stage(f'correct {path}', records=len(data)):
+            fixed_count, fixes_by_rule = apply_corrections(data, table)
+        metrics.count('corrected', fixed_count, file=path)
+        print(f"\n{path}: corrected {fixed_count} facilities")
+        print_corrections(fixes_by_rule, table)
+        if fixed_count:
+            with metrics.stage(f'save {path}', records=len(data)):
+                save_dataset(data, path)
+        with metrics.stage(f'check {path}', records=len(data)):
+            all_ok = check_records(data, table) and all_ok
+
+    print(f"\nAudit log: {AUDIT_FILE}")
+    metrics.finish()
+    if all_ok:
+        print(f"\n[SUCCESS] All corrections applied!")
+    else:
+        print(f"\n[ERROR] Verification failed!")
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Coordinate Validation Engine for ATLAS Data Center Project
+
+Checks whole coordinate columns in one NumPy pass against the country
+bounding boxes in country_bounds.json (loaded once), returning a reason code
+per row instead of a yes/no per record.
+
+Reason codes (first matching reason wins, in this order):
+- VALID              - passed every check
+- MISSING            - no city_coords
+- OUT_OF_RANGE       - latitude outside [-90, 90] or longitude outside [-180, 180]
+- NULL_ISLAND        - at (0, 0), the usual failed-geocode placeholder
+- OUTSIDE_COUNTRY    - outside the record's country box (+ margin)
+- DUPLICATE_SENTINEL - exact coordinate shared with facilities of another
+                       country, and this record is not in that coordinate's
+                       majority country (e.g. London coords leaked into
+                       South Africa)
+
+Countries missing from the bounds table are only range/null-island checked.
+
+Usage:
+    python coord_validation.py [input.json]
+"""
+
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+BOUNDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'country_bounds.json')
+
+VALID = 0
+MISSING = 1
+OUT_OF_RANGE = 2
+NULL_ISLAND = 3
+OUTSIDE_COUNTRY = 4
+DUPLICATE_SENTINEL = 5
+
+REASONS = {
+    VALID: 'valid',
+    MISSING: 'missing',
+    OUT_OF_RANGE: 'out_of_range',
+    NULL_ISLAND: 'null_island',
+    OUTSIDE_COUNTRY: 'outside_country',
+    DUPLICATE_SENTINEL: 'duplicate_sentinel',
+}
+
+NULL_ISLAND_TOLERANCE = 0.01   # Degrees around (0, 0)
+DUPLICATE_DECIMALS = 4         # Coordinates equal at this precision are "the same point"
+
+
+def coords_to_arrays(data):
+    """Split city_coords of facility dicts into lat/lon arrays (NaN = missing)"""
+    lats = np.full(len(data), np.nan)
+    lons = np.full(len(data), np.nan)
+    for i, dc in enumerate(data):
+        coords = dc.get('city_coords')
+        if coords:
+            lats[i], lons[i] = coords
+    return lats, lons
+
+
+class CoordValidator:
+    """Vectorized coordinate validator over a country bounds table"""
+
+    def __init__(self, bounds_file=BOUNDS_FILE, margin=None):
+        with open(bounds_file, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+
+        self.margin = table.get('margin_degrees', 0.5) if margin is None else margin
+        self.countries = list(table['countries'])
+        self.country_index = {name: i for i, name in enumerate(self.countries)}
+        bounds = np.array([table['countries'][name] for name in self.countries], dtype=np.float64).reshape(-1, 4)
+        self.south, self.west, self.north, self.east = bounds.T
+
+    def country_codes(self, countries):
+        """Map country names to bounds-table indexes (-1 = not in table)"""
+        index = self.country_index
+        return np.fromiter((index.get(c, -1) for c in countries), dtype=np.int64, count=len(countries))
+
+    def in_country(self, lats, lons, codes):
+        """Boolean mask: point inside its country's box (True where country unknown)"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        codes = np.asarray(codes)
+        known = codes >= 0
+        safe = np.where(known, codes, 0)
+        m = self.margin
+
+        south, north = self.south[safe] - m, self.north[safe] + m
+        west, east = self.west[safe] - m, self.east[safe] + m
+        in_lat = (lats >= south) & (lats <= north)
+        crosses = self.west[safe] > self.east[safe]
+        in_lon = np.where(crosses, (lons >= west) | (lons <= east), (lons >= west) & (lons <= east))
+        return ~known | (in_lat & in_lon)
+
+    def validate_arrays(self, lats, lons, codes, duplicates=True):
+        """Reason code per row for lat/lon arrays and bounds-table country codes
+
+        duplicates=False skips the cross-row duplicate-sentinel check, so each
+        row's reason depends only on that row.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        codes = np.asarray(codes)
+        reasons = np.full(len(lats), VALID, dtype=np.int8)
+
+        def flag(mask, reason):
+            reasons[(reasons == VALID) & mask] = reason
+
+        present = np.isfinite(lats) & np.isfinite(lons)
+        flag(~present, MISSING)
+        with np.errstate(invalid='ignore'):
+            flag((np.abs(lats) > 90) | (np.abs(lons) > 180), OUT_OF_RANGE)
+            flag((np.abs(lats) <= NULL_ISLAND_TOLERANCE) & (np.abs(lons) <= NULL_ISLAND_TOLERANCE), NULL_ISLAND)
+        flag(~self.in_country(np.where(present, lats, 0), np.where(present, lons, 0), codes), OUTSIDE_COUNTRY)
+        if duplicates:
+            flag(self._duplicate_sentinels(lats, lons, codes, reasons == VALID), DUPLICATE_SENTINEL)
+        return reasons
+
+    def _duplicate_sentinels(self, lats, lons, codes, candidates):
+        """Rows sharing an exact point with other countries, outside its majority country"""
+        mask = np.zeros(len(lats), dtype=bool)
+        rows = np.nonzero(candidates & (codes >= 0))[0]
+        if len(rows) == 0:
+            return mask
+
+        points = np.round(np.column_stack((lats[rows], lons[rows])), DUPLICATE_DECIMALS)
+        _, point_ids = np.unique(points, axis=0, return_inverse=True)
+        point_ids = point_ids.ravel()
+
+        # Count (point, country) pairs, then pick each point's majority country
+        pairs, pair_counts = np.unique(np.column_stack((point_ids, codes[rows])), axis=0, return_counts=True)
+        countries_per_point = np.bincount(pairs[:, 0])
+        order = np.lexsort((-pair_counts, pairs[:, 0]))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = pairs[order[1:], 0] != pairs[order[:-1], 0]
+        majority = np.empty(len(countries_per_point), dtype=np.int64)
+        majority[pairs[order[first], 0]] = pairs[order[first], 1]
+
+        shared = countries_per_point[point_ids] > 1
+        mask[rows] = shared & (codes[rows] != majority[point_ids])
+        return mask
+
+    def validate_records(self, data, point_counts=None):
+        """Reason code per facility dict
+
+        If point_counts (a Counter) is given, the duplicate-sentinel check is
+        left to the caller: the (point, country) pairs of this batch are
+        added to point_counts instead, for duplicate_sentinel_count once all
+        batches are in.
+        """
+        lats, lons = coords_to_arrays(data)
+        codes = self.country_codes([dc.get('country') for dc in data])
+        if point_counts is None:
+            return self.validate_arrays(lats, lons, codes)
+
+        reasons = self.validate_arrays(lats, lons, codes, duplicates=False)
+        rows = np.nonzero((reasons == VALID) & (codes >= 0))[0]
+        points = np.round(np.column_stack((lats[rows], lons[rows])), DUPLICATE_DECIMALS)
+        point_counts.update(zip(map(tuple, points.tolist()), codes[rows].tolist()))
+        return reasons
+
+    def is_valid(self, coords, country):
+        """Single-record check (range, null island, country box)"""
+        if not coords or len(coords) != 2:
+            return False
+        lat, lon = coords
+        if lat < -90 or lat > 90 or lon < -180 or lon > 180:
+            return False
+        if abs(lat) <= NULL_ISLAND_TOLERANCE and abs(lon) <= NULL_ISLAND_TOLERANCE:
+            return False
+
+        code = self.country_index.get(country)
+        if code is None:
+            return True
+        m = self.margin
+        if lat < self.south[code] - m or lat > self.north[code] + m:
+            return False
+        west, east = self.west[code] - m, self.east[code] + m
+        if self.west[code] > self.east[code]:
+            return bool(lon >= west or lon <= east)
+        return bool(west <= lon <= east)
+
+
+_default_validator = None
+
+
+def get_validator():
+    """Shared validator (bounds table loaded once per process)"""
+    global _default_validator
+    if _default_validator is None:
+        _default_validator = CoordValidator()
+    return _default_validator
+
+
+def duplicate_sentinel_count(point_counts):
+    """Duplicate-sentinel rows in {(point, country code): rows} counts
+
+    Matches the number validate_arrays flags over the same rows in one call:
+    at every point shared by several countries, the rows outside the
+    majority country.
+    """
+    totals = Counter()
+    majority = Counter()
+    countries = Counter()
+    for (point, _), count in point_counts.items():
+        totals[point] += count
+        countries[point] += 1
+        majority[point] = max(majority[point], count)
+    return sum(totals[point] - majority[point] for point in totals if countries[point] > 1)
+
+
+def summarize(reasons):
+    """{reason name: count} for an array of reason codes"""
+    counts = Counter(np.asarray(reasons).tolist())
+    return {REASONS[code]: counts.get(code, 0) for code in REASONS}
+
+
+if __name__ == '__main__':
+    input_file = sys.argv[1] if len(sys.argv) > 1 else 'datacenters_cleaned.json'
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    validator = get_validator()
+    start = time.perf_counter()
+    reasons = validator.validate_records(data)
+    elapsed = time.perf_counter() - start
+
+    print(f"Validated {len(data)} facilities in {elapsed*1000:.1f}ms")
+    for reason, count in summarize(reasons).items():
+        print(f"  {reason:<20} {count}")
+
+    flagged = np.nonzero(reasons > MISSING)[0].tolist()
+    for i in flagged[:20]:
+        dc = data[i]
+        print(f"  [{REASONS[int(reasons[i])].upper()}] {dc.get('name')} ({dc.get('country')}): {dc.get('city_coords')}")
+    if len(flagged) > 20:
+        print(f"  ... and {len(flagged) - 20} more")
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Country Polygons for ATLAS Data Center Project
+
+Offline reverse geocoding to country: which country's boundary polygon
+contains each point. Cross-checks every facility's city_coords against its
+country field with real borders instead of the bounding boxes in
+country_bounds.json, so a facility geocoded to the wrong side of a border
+(or into the sea) is found before it shows up on the map.
+
+Boundaries are read from a local GeoJSON FeatureCollection of Polygon /
+MultiPolygon features (e.g. Natural Earth "Admin 0 - Countries" exported
+as country_polygons.geojson); the country name comes from the first
+property in NAME_PROPERTIES. The file is not bundled - without it the
+pipeline stage is skipped. The prepared structure is cached in
+country_polygons.npz and rebuilt when the GeoJSON is newer.
+
+- Every polygon part (one outer ring plus its holes) goes into a packed
+  R-tree (STR bulk load) over its bounding box; a batch of points walks the
+  tree level by level with array operations
+- Each part is prepared by bucketing its edges into horizontal latitude
+  slabs, so a point's ray-casting test only visits the edges of its slab
+- country_of(lats, lons) returns country indexes for whole batches (-1 =
+  no country, e.g. at sea)
+
+Cross-check results per facility: MATCH, NO_COORDS, UNKNOWN_COUNTRY (no
+polygon for the record's country), OFFSHORE (in no polygon) and MISMATCH
+(inside another country's polygon).
+
+Usage:
+    python country_polygons.py [input.json] [--polygons country_polygons.geojson]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from clean_data import normalize_country_name
+from coord_validation import coords_to_arrays
+from spatial_index import _ranges_to_indices
+
+INPUT_FILE = 'datacenters_cleaned.json'
+POLYGONS_FILE = 'country_polygons.geojson'
+CACHE_FILE = 'country_polygons.npz'
+
+NAME_PROPERTIES = ('name', 'NAME', 'ADMIN', 'NAME_LONG')
+NODE_SIZE = 16            # R-tree fan-out
+SLAB_EDGES = 8            # Target edges per latitude slab
+MAX_SLABS = 4096          # Per polygon part
+BATCH_POINTS = 65536      # Points per batch (bounds temporary array sizes)
+
+MATCH = 0
+NO_COORDS = 1
+UNKNOWN_COUNTRY = 2
+OFFSHORE = 3
+MISMATCH = 4
+
+RESULTS = {
+    MATCH: 'match',
+    NO_COORDS: 'no coordinates',
+    UNKNOWN_COUNTRY: 'no polygon for country',
+    OFFSHORE: 'in no country',
+    MISMATCH: 'in another country',
+}
+
+# Boundary-file and dataset spellings -> one name per country
+COUNTRY_ALIASES = {
+    'United States of America': 'United States',
+    'Republic of Serbia': 'Serbia',
+    'United Republic of Tanzania': 'Tanzania',
+    'The Bahamas': 'Bahamas',
+    'Guinea Bissau': 'Guinea-Bissau',
+    'Hong Kong S.A.R.': 'Hong Kong',
+    'Macao S.A.R': 'Macau',
+    'Macao': 'Macau',
+    'Cabo Verde': 'Cape Verde',
+    'eSwatini': 'Eswatini',
+    'Swaziland': 'Eswatini',
+    'Timor-Leste': 'East Timor',
+    'Congo': 'Republic of the Congo',
+    'Trinidad': 'Trinidad and Tobago',
+    'Bosnia': 'Bosnia and Herzegovina',
+    'United States Virgin Islands': 'US Virgin Islands',
+    'Republic of Korea': 'South Korea',
+    'Russian Federation': 'Russia',
+    'Türkiye': 'Turkey',
+}
+
+
+def canonical_country(name):
+    """One spelling per country for comparing boundary names with record countries"""
+    name = normalize_country_name(name)
+    return COUNTRY_ALIASES.get(name, name)
+
+
+class PackedRTree:
+    """Static R-tree over boxes (south, west, north, east), bulk loaded with STR"""
+
+    def __init__(self, boxes, node_size=NODE_SIZE):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.node_size = node_size
+
+        # Sort-tile-recursive: slice by x center, sort each slice by y center
+        count = len(boxes)
+        leaves = max(1, -(-count // node_size))
+        slices = max(1, int(np.ceil(np.sqrt(leaves))))
+        x_center = (boxes[:, 1] + boxes[:, 3]) / 2
+        y_center = (boxes[:, 0] + boxes[:, 2]) / 2
+        slice_id = np.argsort(np.argsort(x_center, kind='stable'), kind='stable') // (slices * node_size)
+        self.order = np.lexsort((y_center, slice_id))
+
+        # levels[0] = entries in packed order; each level above groups
+        # node_size consecutive nodes of the level below
+        self.levels = [{'boxes': boxes[self.order]}]
+        while len(self.levels[-1]['boxes']) > 1:
+            below = self.levels[-1]['boxes']
+            first = np.arange(0, len(below), node_size)
+            self.levels.append({
+                'boxes': np.column_stack((np.minimum.reduceat(below[:, 0], first),
+                                          np.minimum.reduceat(below[:, 1], first),
+                                          np.maximum.reduceat(below[:, 2], first),
+                                          np.maximum.reduceat(below[:, 3], first))),
+                'first': first,
+                'count': np.diff(np.r_[first, len(below)]),
+            })
+
+    def query_points(self, lats, lons):
+        """(point indices, entry indices) of every box containing a point"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        top = len(self.levels) - 1
+        points = np.arange(len(lats))
+        nodes = np.zeros(len(lats), dtype=np.int64)
+        if len(self.levels[0]['boxes']) == 0:
+            return points[:0], nodes[:0]
+
+        for level in range(top, -1, -1):
+            boxes = self.levels[level]['boxes'][nodes]
+            lat, lon = lats[points], lons[points]
+            hit = (lat >= boxes[:, 0]) & (lon >= boxes[:, 1]) & (lat <= boxes[:, 2]) & (lon <= boxes[:, 3])
+            points, nodes = points[hit], nodes[hit]
+            if level == 0:
+                break
+            # Expand each surviving node into its children on the level below
+            first = self.levels[level]['first'][nodes]
+            count = self.levels[level]['count'][nodes]
+            points = np.repeat(points, count)
+            nodes = _ranges_to_indices(first, first + count)
+
+        return points, self.order[nodes]
+
+
+def _parts(geometry):
+    """Lists of rings (outer first) for each polygon of a GeoJSON geometry"""
+    if not geometry:
+        return []
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+class CountryPolygons:
+    """Prepared country polygons with an R-tree over polygon parts"""
+
+    ARRAYS = ('part_country', 'part_boxes', 'edges', 'slab_part_offset', 'slab_count', 'slab_south',
+              'slab_height', 'slab_start', 'slab_edges')
+
+    def __init__(self, names, arrays):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        for key in self.ARRAYS:
+            setattr(self, key, arrays[key])
+        self.tree = PackedRTree(self.part_boxes)
+
+    @classmethod
+    def from_geojson(cls, path=POLYGONS_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            collection = json.load(f)
+
+        names, index = [], {}
+        part_country, part_boxes, part_edges = [], [], []
+        for feature in collection.get('features', []):
+            properties = feature.get('properties') or {}
+            name = next((properties[key] for key in NAME_PROPERTIES if properties.get(key)), None)
+            parts = _parts(feature.get('geometry'))
+            if not name or not parts:
+                continue
+            name = canonical_country(name)
+            if name not in index:
+                index[name] = len(names)
+                names.append(name)
+
+            for rings in parts:
+                edges = []
+                for ring in rings:
+                    ring = np.asarray(ring, dtype=np.float64)[:, :2]
+                    if len(ring) < 3:
+                        continue
+                    closed = np.vstack((ring, ring[:1])) if (ring[0] != ring[-1]).any() else ring
+                    # Edge = (lat1, lon1, lat2, lon2); GeoJSON positions are [lon, lat]
+                    edges.append(np.column_stack((closed[:-1, 1], closed[:-1, 0], closed[1:, 1], closed[1:, 0])))
+                if not edges:
+                    continue
+                edges = np.vstack(edges)
+                outer = np.asarray(rings[0], dtype=np.float64)
+                part_country.append(index[name])
+                part_boxes.append((outer[:, 1].min(), outer[:, 0].min(), outer[:, 1].max(), outer[:, 0].max()))
+                part_edges.append(edges)
+
+        return cls(names, cls._prepare(part_country, part_boxes, part_edges))
+
+    @staticmethod
+    def _prepare(part_country, part_boxes, part_edges):
+        """Bucket each part's edges into latitude slabs (CSR: slab -> edge ids)"""
+        slab_part_offset, slab_count, slab_south, slab_height = [], [], [], []
+        slab_lists = []
+        edge_offset = 0
+        total_slabs = 0
+        for box, edges in zip(part_boxes, part_edges):
+            south, north = box[0], box[2]
+            n_slabs = int(min(MAX_SLABS, max(1, len(edges) // SLAB_EDGES)))
+            height = max((north - south) / n_slabs, 1e-12)
+            lo = np.clip(((np.minimum(edges[:, 0], edges[:, 2]) - south) // height).astype(np.int64), 0, n_slabs - 1)
+            hi = np.clip(((np.maximum(edges[:, 0], edges[:, 2]) - south) // height).astype(np.int64), 0, n_slabs - 1)
+            # One (slab, edge) pair per slab an edge spans
+            spans = hi - lo + 1
+            edge_ids = np.repeat(np.arange(len(edges)), spans)
+            slabs = _ranges_to_indices(lo, hi + 1)
+            order = np.argsort(slabs, kind='stable')
+            slab_lists.append((total_slabs + slabs[order], edge_offset + edge_ids[order]))
+
+            slab_part_offset.append(total_slabs)
+            slab_count.append(n_slabs)
+            slab_south.append(south)
+            slab_height.append(height)
+            total_slabs += n_slabs
+            edge_offset += len(edges)
+
+        slab_ids = np.concatenate([s for s, _ in slab_lists]) if slab_lists else np.empty(0, dtype=np.int64)
+        return {
+            'part_country': np.asarray(part_country, dtype=np.int64),
+            'part_boxes': np.asarray(part_boxes, dtype=np.float64).reshape(-1, 4),
+            'edges': np.vstack(part_edges) if part_edges else np.empty((0, 4)),
+            'slab_part_offset': np.asarray(slab_part_offset, dtype=np.int64),
+            'slab_count': np.asarray(slab_count, dtype=np.int64),
+            'slab_south': np.asarray(slab_south, dtype=np.float64),
+            'slab_height': np.asarray(slab_height, dtype=np.float64),
+            'slab_start': np.searchsorted(slab_ids, np.arange(total_slabs + 1)).astype(np.int64),
+            'slab_edges': np.concatenate([e for _, e in slab_lists]) if slab_lists else np.empty(0, dtype=np.int64),
+        }
+
+    def __len__(self):
+        return len(self.part_country)
+
+    def _contains(self, lats, lons, points, parts):
+        """Mask: point points[i] inside polygon part parts[i] (even-odd ray casting)"""
+        lat, lon = lats[points], lons[points]
+        slab = np.clip(((lat - self.slab_south[parts]) // self.slab_height[parts]).astype(np.int64),
+                       0, self.slab_count[parts] - 1) + self.slab_part_offset[parts]
+        lo, hi = self.slab_start[slab], self.slab_start[slab + 1]
+        pair = np.repeat(np.arange(len(points)), hi - lo)
+        edges = self.edges[self.slab_edges[_ranges_to_indices(lo, hi)]]
+        lat1, lon1, lat2, lon2 = edges.T
+        y, x = lat[pair], lon[pair]
+        spans = (lat1 > y) != (lat2 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crosses = spans & (x < lon1 + (y - lat1) * (lon2 - lon1) / (lat2 - lat1))
+        return np.bincount(pair, weights=crosses, minlength=len(points)).astype(np.int64) % 2 == 1
+
+    def country_of(self, lats, lons):
+        """Index into names of the country containing each point (-1 = none)"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        result = np.full(len(lats), -1, dtype=np.int64)
+        for start in range(0, len(lats), BATCH_POINTS):
+            batch_lats, batch_lons = lats[start:start + BATCH_POINTS], lons[start:start + BATCH_POINTS]
+            valid = np.flatnonzero(np.isfinite(batch_lats) & np.isfinite(batch_lons))
+            points, parts = self.tree.query_points(batch_lats[valid], batch_lons[valid])
+            points = valid[points]
+            inside = self._contains(batch_lats, batch_lons, points, parts)
+            # First containing part wins where polygons overlap
+            points, parts = points[inside][::-1], parts[inside][::-1]
+            result[start + points] = self.part_country[parts]
+        return result
+
+    def lookup(self, lats, lons):
+        """Country name (or None) containing each point"""
+        return [self.names[i] if i >= 0 else None for i in self.country_of(lats, lons).tolist()]
+
+    def cross_check(self, data):
+        """(result code per record, index of the containing country per record)"""
+        lats, lons = coords_to_arrays(data)
+        found = self.country_of(lats, lons)
+        expected = np.fromiter((self.index.get(canonical_country(dc.get('country')), -1) for dc in data),
+                               dtype=np.int64, count=len(data))
+        results = np.full(len(data), MATCH, dtype=np.int8)
+        results[found != expected] = MISMATCH
+        results[found < 0] = OFFSHORE
+        results[expected < 0] = UNKNOWN_COUNTRY
+        results[~(np.isfinite(lats) & np.isfinite(lons))] = NO_COORDS
+        return results, found
+
+    # Serialization
+
+    def save(self, path=CACHE_FILE):
+        np.savez(path, names=np.array(self.names), **{key: getattr(self, key) for key in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path=CACHE_FILE):
+        with np.load(path) as saved:
+            return cls(saved['names'].tolist(), {key: saved[key] for key in cls.ARRAYS})
+
+
+_default_polygons = None
+
+
+def get_polygons(path=POLYGONS_FILE, cache=CACHE_FILE):
+    """Shared CountryPolygons (cache rebuilt when the GeoJSON is newer); None without a boundary file"""
+    global _default_polygons
+    if _default_polygons is None:
+        has_source = os.path.exists(path)
+        if os.path.exists(cache) and (not has_source or os.path.getmtime(cache) >= os.path.getmtime(path)):
+            _default_polygons = CountryPolygons.load(cache)
+        elif has_source:
+            _default_polygons = CountryPolygons.from_geojson(path)
+            _default_polygons.save(cache)
+    return _default_polygons
+
+
+def summarize(results):
+    """{result name: count} for a result-code array"""
+    counts = np.bincount(results, minlength=len(RESULTS))
+    return {RESULTS[code]: int(counts[code]) for code in RESULTS if counts[code]}
+
+
+def print_cross_check(data, results, found, polygons, limit=10):
+    for name, count in summarize(results).items():
+        print(f"  {name:<24} {count:6}")
+    mismatched = np.flatnonzero(results == MISMATCH).tolist()
+    for row in mismatched[:limit]:
+        dc = data[row]
+        print(f"    {dc.get('name')} ({dc.get('city')}, {dc.get('country')}): {dc.get('city_coords')} "
+              f"is in {polygons.names[found[row]]}")
+    if len(mismatched) > limit:
+        print(f"    ... and {len(mismatched) - limit} more")
+
+
+def cross_check_records(data, changed=None):
+    """Pipeline stage: report facilities whose coordinates lie in another country (changes nothing)"""
+    polygons = get_polygons()
+    if polygons is None:
+        print(f"  [SKIP] {POLYGONS_FILE} not found")
+        return 0
+    results, found = polygons.cross_check(data)
+    print_cross_check(data, results, found, polygons)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cross-check facility coordinates against country polygons')
+    parser.add_argument('input', nargs='?', default=INPUT_FILE)
+    parser.add_argument('--polygons', default=POLYGONS_FILE, help='GeoJSON country boundaries')
+    parser.add_argument('--cache', default=CACHE_FILE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    polygons = get_polygons(args.polygons, args.cache)
+    if polygons is None:
+        raise SystemExit(f"[ERROR] {args.polygons} not found (country boundaries GeoJSON, e.g. Natural Earth Admin 0)")
+    print(f"Loaded {len(polygons.names)} countries, {len(polygons)} polygons, {len(polygons.edges)} edges "
+          f"in {(time.perf_counter() - start)*1000:.1f}ms")
+
+    from dataset_io import load_dataset
+    data = load_dataset(args.input)
+    start = time.perf_counter()
+    results, found = polygons.cross_check(data)
+    elapsed = time.perf_counter() - start
+    print(f"\nChecked {len(data)} facilities in {elapsed*1000:.1f}ms "
+          f"({len(data) / max(elapsed, 1e-9):,.0f} points/s)")
+    print_cross_check(data, results, found, polygons, limit=25)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Dataset I/O helpers for ATLAS Data Center Project
+
+- load_dataset / save_dataset for the JSON data files
+- save_dataset writes to a temp file and atomically renames it over the
+  target, so an interrupted save never leaves a truncated file behind
+- GeocodeJournal: append-only JSONL log of geocode results that is flushed
+  as each result arrives and replayed onto the dataset on resume
+- iter_records / NDJSONWriter: constant-memory streaming of NDJSON or JSON
+  array inputs to NDJSON output
+- staging_dir / replace_directory: build an output directory (tile shards,
+  cluster pyramid) next to its target and swap it in when complete,
+  refusing to replace a directory the tool did not write
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+
+def load_dataset(path):
+    """Load a JSON dataset (list of facility dicts)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def copy_mode(tmp_path, path):
+    """Give tmp_path the permissions path has (or a new file would get)
+
+    mkstemp creates files as 0600; without this, renaming the temp file
+    over path would make it owner-only.
+    """
+    if os.path.exists(path):
+        shutil.copymode(path, tmp_path)
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+
+
+def save_dataset(data, path, indent=2):
+    """Write a JSON dataset via temp file + atomic rename"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        copy_mode(tmp_path, path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class GeocodeJournal:
+    """Append-only JSONL journal of per-facility geocode results
+
+    Each line is {"index": i, "name": ..., "city_coords": [lat, lon]}.
+    Checkpoint cost is one short line per result regardless of dataset size.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.written = 0
+
+    def replay(self, data):
+        """Apply journaled results onto loaded data; returns entries applied"""
+        if not os.path.exists(self.path):
+            return 0
+
+        applied = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn final line from an interrupted run
+                    continue
+                idx = entry.get('index')
+                if not isinstance(idx, int) or not 0 <= idx < len(data):
+                    continue
+                # Only replay onto the same facility (dataset may have changed)
+                if data[idx].get('name') != entry.get('name'):
+                    continue
+                data[idx]['city_coords'] = entry['city_coords']
+                applied += 1
+        return applied
+
+    def append(self, idx, dc):
+        """Append and flush one facility's result"""
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        entry = {'index': idx, 'name': dc.get('name'), 'city_coords': dc.get('city_coords')}
+        self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.file.flush()
+        self.written += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove(self):
+        """Delete the journal once its results are merged into the dataset"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def iter_records(path, chunk_size=1 << 16):
+    """Yield records one at a time from an NDJSON file or a JSON array file
+
+    JSON arrays are parsed incrementally with JSONDecoder.raw_decode over
+    fixed-size chunks, so memory stays bounded by the largest single record.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size)
+        buffer = buffer.lstrip()
+        while not buffer:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buffer = chunk.lstrip()
+
+        if buffer[0] != '[':
+            # NDJSON - one record per line
+            pending = buffer
+            for chunk in iter(lambda: f.read(chunk_size), ''):
+                pending += chunk
+                *lines, pending = pending.split('\n')
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+            if pending.strip():
+                yield json.loads(pending)
+            return
+
+        # JSON array - decode one element at a time
+        pos = 1
+        eof = False
+        while True:
+            # Skip whitespace and separators between elements
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+
+            if pos >= len(buffer):
+                raise ValueError(f"Unterminated JSON array in {path}")
+            if buffer[pos] == ']':
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Record spans the chunk boundary - read more and retry
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+
+            yield record
+            pos = end
+
+
+class NDJSONWriter:
+    """Write records as NDJSON (one compact JSON object per line) atomically"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, self.tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+        self.file = os.fdopen(fd, 'w', encoding='utf-8')
+        self.written = 0
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.written += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is None:
+            copy_mode(self.tmp_path, self.path)
+            os.replace(self.tmp_path, self.path)
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def staging_dir(out_dir):
+    """New empty directory next to out_dir to build its replacement in"""
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(prefix='.' + os.path.basename(os.path.abspath(out_dir)) + '.', suffix='.tmp', dir=parent)
+
+
+def replace_directory(new_dir, out_dir, index_name, index_key):
+    """Swap new_dir in as out_dir
+
+    An existing out_dir is only replaced if it holds index_name, a JSON
+    object with index_key (the index the same tool writes), and does not
+    contain the working directory - otherwise ValueError, and new_dir is
+    removed. The old directory is renamed aside, new_dir renamed into
+    place, then the old one deleted, so out_dir is only missing between
+    two renames.
+    """
+    target = os.path.abspath(out_dir)
+    if os.path.lexists(target):
+        problem = None
+        if not os.path.isdir(target) or os.path.islink(target):
+            problem = "is not a directory"
+        elif os.path.commonpath([os.path.realpath(target), os.getcwd()]) == os.path.realpath(target):
+            problem = "contains the working directory"
+        else:
+            try:
+                with open(os.path.join(target, index_name), 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = None
+            if not isinstance(index, dict) or index_key not in index:
+                problem = f"has no {index_name} written by this tool"
+        if problem:
+            shutil.rmtree(new_dir, ignore_errors=True)
+            raise ValueError(f"Refusing to replace {out_dir}: it {problem}")
+
+        old_dir = tempfile.mkdtemp(prefix='.' + os.path.basename(target) + '.', suffix='.old',
+                                   dir=os.path.dirname(target))
+        os.rmdir(old_dir)
+        os.replace(target, old_dir)
+        os.replace(new_dir, target)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(new_dir, target)
@@ -9,6 +9,8 @@ Issues found:
 
 import re
 
+from run_metrics import RunMetrics
+
 # Coordinate fixes needed
 FIXES = {
     # US States
@@ -81,14 +83,21 @@ if __name__ == '__main__':
     print("- Iceland: 2.92° longitude error (MAJOR!)")
     print()
 
+    metrics = RunMetrics('fix_coordinates')
+
     # Fix coordinates
-    fixes_applied = fix_coordinates('index.html')
+    with metrics.stage('fix index.html', records=len(FIXES)):
+        fixes_applied = fix_coordinates('index.html')
+    metrics.count('fixes_applied', fixes_applied)
 
     # Verify
     if fixes_applied > 0:
-        if verify_fixes('index.html'):
+        with metrics.stage('verify index.html', records=len(FIXES)):
+            verified = verify_fixes('index.html')
+        if verified:
             print(f"\n[SUCCESS] All coordinate fixes verified!")
         else:
             print(f"\n[ERROR] Verification failed!")
+    metrics.finish()
 
     print("\n" + "="*60)
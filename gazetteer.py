@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Offline Gazetteer Geocoder for ATLAS Data Center Project
+
+Resolves city-level queries (city, state, country) from a local GeoNames
+cities file instead of the rate-limited Nominatim service. Most facilities
+without coordinates have no street address and fall back to a city-level
+query, and city centroids are static data.
+
+Input files (GeoNames exports, not bundled - without them every query goes
+to Nominatim as before):
+- cities15000.txt        cities (or cities500/cities1000/cities5000.txt,
+                         see CITIES_FILES), tab-separated GeoNames format
+- countryInfo.txt        ISO country codes -> country names
+- admin1CodesASCII.txt   first-level divisions (states, provinces), optional
+
+The prepared lookup is cached in gazetteer.npz and rebuilt when an input
+file is newer.
+
+- Columnar arrays: lat, lon, population, country and admin1 index per place
+- Every place name and alternate name is normalized (accents, case,
+  punctuation, St./Mt./Ft. abbreviations) and hashed to 64 bits; the sorted
+  hash array is the index, so a lookup is a binary search
+- Candidates are filtered by country (dataset names resolved through the
+  same aliases as country_polygons.py) and state (admin1 name or code);
+  the most populous remaining place wins
+- A query whose state matches none of the candidates is not resolved, so
+  "Springfield, Oregon" is never answered with Springfield, Missouri
+
+Usage:
+    python gazetteer.py [input.json]                  # how much of the backlog resolves locally
+    python gazetteer.py --query "Ashburn" "Virginia" "United States"
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import time
+import unicodedata
+
+import numpy as np
+
+from country_polygons import canonical_country
+
+INPUT_FILE = 'datacenters_cleaned.json'
+CITIES_FILES = ('cities15000.txt', 'cities5000.txt', 'cities1000.txt', 'cities500.txt')
+COUNTRY_FILE = 'countryInfo.txt'
+ADMIN1_FILE = 'admin1CodesASCII.txt'
+CACHE_FILE = 'gazetteer.npz'
+
+# Token abbreviations expanded before hashing
+TOKEN_ALIASES = {'st': 'saint', 'ste': 'sainte', 'mt': 'mount', 'ft': 'fort', 'pt': 'port'}
+
+# GeoNames cities file columns
+COL_NAME, COL_ASCII, COL_ALTERNATE, COL_LAT, COL_LON, COL_CLASS = 1, 2, 3, 4, 5, 6
+COL_COUNTRY, COL_ADMIN1, COL_POPULATION = 8, 10, 14
+
+
+def normalize_place(name):
+    """Comparable form of a place name: 'St. Louis' and 'Saint-Louis' -> 'saint louis'"""
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(ch for ch in name if not unicodedata.combining(ch)).lower().replace('&', ' and ')
+    name = re.sub(r"['\u2019]", '', name)
+    tokens = re.sub(r'[^\w]+', ' ', name).split()
+    return ' '.join(TOKEN_ALIASES.get(token, token) for token in tokens)
+
+
+def place_key(name):
+    """64-bit hash of a normalized place name (stable across processes, unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(normalize_place(name).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _find_cities_file(directory='.'):
+    for name in CITIES_FILES:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class Gazetteer:
+    """Indexed GeoNames places"""
+
+    ARRAYS = ('lat', 'lon', 'population', 'country', 'admin1', 'key_hashes', 'key_rows')
+    LISTS = ('names', 'country_codes', 'country_names', 'admin1_codes', 'admin1_names')
+
+    def __init__(self, arrays, lists):
+        for key in self.ARRAYS:
+            setattr(self, key, arrays[key])
+        for key in self.LISTS:
+            setattr(self, key, list(lists[key]))
+
+        # Dataset country name -> country index; admin1 index -> comparable name and code
+        self.country_index = {}
+        for i, name in enumerate(self.country_names):
+            self.country_index[canonical_country(name)] = i
+        self.admin1_keys = [(normalize_place(name), normalize_place(code.split('.', 1)[-1]))
+                            for code, name in zip(self.admin1_codes, self.admin1_names)]
+
+    @classmethod
+    def from_geonames(cls, cities_file, country_file=COUNTRY_FILE, admin1_file=ADMIN1_FILE):
+        country_codes, country_names = [], []
+        with open(country_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#') or not line.strip():
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                country_codes.append(fields[0])
+                country_names.append(fields[4])
+        country_lookup = {code: i for i, code in enumerate(country_codes)}
+
+        admin1_codes, admin1_names = [], []
+        if admin1_file and os.path.exists(admin1_file):
+            with open(admin1_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) >= 2:
+                        admin1_codes.append(fields[0])
+                        admin1_names.append(fields[1])
+        admin1_lookup = {code: i for i, code in enumerate(admin1_codes)}
+
+        names, lats, lons, populations, countries, admin1s = [], [], [], [], [], []
+        key_hashes, key_rows = [], []
+        with open(cities_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) <= COL_POPULATION or fields[COL_CLASS] != 'P':
+                    continue
+                country = country_lookup.get(fields[COL_COUNTRY])
+                if country is None:
+                    continue
+                row = len(names)
+                names.append(fields[COL_NAME])
+                lats.append(float(fields[COL_LAT]))
+                lons.append(float(fields[COL_LON]))
+                populations.append(int(fields[COL_POPULATION] or 0))
+                countries.append(country)
+                admin1s.append(admin1_lookup.get(f"{fields[COL_COUNTRY]}.{fields[COL_ADMIN1]}", -1))
+
+                aliases = {fields[COL_NAME], fields[COL_ASCII]}
+                aliases.update(name for name in fields[COL_ALTERNATE].split(',') if name)
+                for key in {place_key(name) for name in aliases if normalize_place(name)}:
+                    key_hashes.append(key)
+                    key_rows.append(row)
+
+        key_hashes = np.array(key_hashes, dtype=np.uint64)
+        key_rows = np.array(key_rows, dtype=np.int32)
+        order = np.argsort(key_hashes, kind='stable')
+        arrays = {
+            'lat': np.array(lats, dtype=np.float64),
+            'lon': np.array(lons, dtype=np.float64),
+            'population': np.array(populations, dtype=np.int64),
+            'country': np.array(countries, dtype=np.int16),
+            'admin1': np.array(admin1s, dtype=np.int32),
+            'key_hashes': key_hashes[order],
+            'key_rows': key_rows[order],
+        }
+        lists = {'names': names, 'country_codes': country_codes, 'country_names': country_names,
+                 'admin1_codes': admin1_codes, 'admin1_names': admin1_names}
+        return cls(arrays, lists)
+
+    def __len__(self):
+        return len(self.names)
+
+    def candidates(self, city):
+        """Rows of every place named city (by name or alternate name)"""
+        key = np.uint64(place_key(city))
+        lo = np.searchsorted(self.key_hashes, key, 'left')
+        hi = np.searchsorted(self.key_hashes, key, 'right')
+        return self.key_rows[lo:hi]
+
+    def _state_matches(self, row, state_key):
+        admin1 = int(self.admin1[row])
+        return admin1 >= 0 and state_key in self.admin1_keys[admin1]
+
+    def find(self, city, state=None, country=None):
+        """Row of the best matching place, or None
+
+        country is required (a dataset country name); state, if given, must
+        match the place's admin1 name or code (when admin1 data is loaded).
+        """
+        country_index = self.country_index.get(canonical_country(country)) if country else None
+        if not city or country_index is None:
+            return None
+        rows = self.candidates(city)
+        rows = rows[self.country[rows] == country_index]
+        if state and self.admin1_codes and len(rows):
+            state_key = normalize_place(state)
+            rows = rows[[self._state_matches(row, state_key) for row in rows.tolist()]]
+        if len(rows) == 0:
+            return None
+        return int(rows[np.argmax(self.population[rows])])
+
+    def geocode(self, city, state=None, country=None):
+        """[lat, lon] of the best matching place, or None"""
+        row = self.find(city, state, country)
+        return None if row is None else [float(self.lat[row]), float(self.lon[row])]
+
+    def geocode_many(self, queries):
+        """[lat, lon] or None for each (city, state, country) query; repeated queries are looked up once"""
+        results = {}
+        return [results[query] if query in results else results.setdefault(query, self.geocode(*query))
+                for query in queries]
+
+    # Serialization
+
+    def save(self, path=CACHE_FILE):
+        np.savez(path, **{key: getattr(self, key) for key in self.ARRAYS},
+                 **{key: np.array(getattr(self, key), dtype=str) for key in self.LISTS})
+
+    @classmethod
+    def load(cls, path=CACHE_FILE):
+        with np.load(path) as saved:
+            return cls({key: saved[key] for key in cls.ARRAYS}, {key: saved[key].tolist() for key in cls.LISTS})
+
+
+def _file_digest(path):
+    """blake2b of a file's content (memoized per size and mtime, so a run hashes it once)"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_digests:
+        digest = hashlib.blake2b(digest_size=8)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _file_digests[key] = digest.hexdigest()
+    return _file_digests[key]
+
+
+_file_digests = {}
+
+
+def _source_files(directory='.'):
+    """GeoNames input files present in directory; [] unless both cities and countries are there"""
+    cities = _find_cities_file(directory)
+    countries = os.path.join(directory, COUNTRY_FILE)
+    if not cities or not os.path.exists(countries):
+        return []
+    admin1 = os.path.join(directory, ADMIN1_FILE)
+    return [cities, countries] + ([admin1] if os.path.exists(admin1) else [])
+
+
+def source_version(directory='.'):
+    """Content hash of the GeoNames input files ('none' without them), for pipeline stage versions
+
+    Re-downloading or touching unchanged files keeps the same version.
+    'none' exactly when get_gazetteer returns None.
+    """
+    paths = _source_files(directory)
+    if not paths:
+        return 'none'
+    stamp = ';'.join(f"{os.path.basename(path)}:{_file_digest(path)}" for path in paths)
+    return hashlib.blake2b(stamp.encode('utf-8'), digest_size=8).hexdigest()
+
+
+_default_gazetteer = None
+
+
+def get_gazetteer(directory='.', cache=CACHE_FILE):
+    """Shared Gazetteer (cache rebuilt when an input file is newer); None without GeoNames files
+
+    The cache is only used alongside the files it was built from, so a
+    stale cache is never loaded under source_version() 'none'.
+    """
+    global _default_gazetteer
+    if _default_gazetteer is None:
+        sources = _source_files(directory)
+        if not sources:
+            return None
+        if os.path.exists(cache) and all(os.path.getmtime(cache) >= os.path.getmtime(path) for path in sources):
+            _default_gazetteer = Gazetteer.load(cache)
+        else:
+            cities, countries = sources[:2]
+            _default_gazetteer = Gazetteer.from_geonames(cities, countries, os.path.join(directory, ADMIN1_FILE))
+            _default_gazetteer.save(cache)
+    return _default_gazetteer
+
+
+def is_city_level(dc):
+    """True if the facility's geocoder query is city-level (no street address)"""
+    return not dc.get('address') and bool(dc.get('city'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline city-level geocoding from a GeoNames gazetteer')
+    parser.add_argument('input', nargs='?', default=INPUT_FILE)
+    parser.add_argument('--query', nargs='+', metavar='CITY [STATE] COUNTRY',
+                        help='geocode one city (city country, or city state country)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        raise SystemExit(f"[ERROR] GeoNames files not found (one of {', '.join(CITIES_FILES)} and {COUNTRY_FILE})")
+    print(f"Loaded {len(gazetteer)} places, {len(gazetteer.key_hashes)} names "
+          f"in {(time.perf_counter() - start)*1000:.1f}ms")
+
+    if args.query:
+        city, *rest = args.query
+        state, country = (rest[0], rest[1]) if len(rest) > 1 else (None, rest[0] if rest else None)
+        row = gazetteer.find(city, state, country)
+        if row is None:
+            print(f"\n[MISS] {', '.join(args.query)}")
+        else:
+            admin1 = gazetteer.admin1[row]
+            print(f"\n{gazetteer.names[row]}, {gazetteer.admin1_names[admin1] if admin1 >= 0 else '-'}, "
+                  f"{gazetteer.country_names[gazetteer.country[row]]}: "
+                  f"[{gazetteer.lat[row]:.4f}, {gazetteer.lon[row]:.4f}] (population {gazetteer.population[row]:,})")
+        raise SystemExit(0)
+
+    from dataset_io import load_dataset
+    data = load_dataset(args.input)
+    pending = [dc for dc in data if not dc.get('city_coords')]
+    city_level = [dc for dc in pending if is_city_level(dc)]
+
+    start = time.perf_counter()
+    results = gazetteer.geocode_many([(dc.get('city'), dc.get('state'), dc.get('country')) for dc in city_level])
+    elapsed = time.perf_counter() - start
+    resolved = sum(1 for coords in results if coords)
+
+    print(f"\nFacilities without coordinates: {len(pending)}")
+    print(f"  City-level queries:  {len(city_level)}")
+    print(f"  Resolved locally:    {resolved} in {elapsed*1000:.1f}ms")
+    print(f"  Left for Nominatim:  {len(pending) - resolved} "
+          f"({len(pending) - len(city_level)} street addresses, {len(city_level) - resolved} unresolved cities)")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Persistent Geocode Cache for ATLAS Data Center Project
+
+SQLite cache of geocoder results keyed by the normalized address string,
+so reruns of batch_geocode.py only query addresses never seen before.
+
+Each entry stores one of three outcomes with a timestamp:
+- 'ok'      - geocoded and passed validate_coords (coords stored)
+- 'invalid' - geocoded but outside the country bounds (coords stored)
+- 'miss'    - the geocoder returned nothing
+
+Entries older than their TTL are treated as absent and re-queried.
+"""
+
+import re
+import sqlite3
+import time
+
+CACHE_FILE = 'geocode_cache.sqlite'
+
+DAY = 24 * 60 * 60
+DEFAULT_TTL = {
+    'ok': 365 * DAY,       # Good coordinates rarely change
+    'invalid': 90 * DAY,   # Retry rejected results occasionally
+    'miss': 30 * DAY,      # Geocoder data improves over time
+}
+
+STATUSES = ('ok', 'invalid', 'miss')
+
+
+def normalize_address(address):
+    """Normalize an address string for use as a cache key"""
+    if not address:
+        return ''
+    key = address.strip().lower()
+    key = re.sub(r'\s*,\s*', ', ', key)
+    key = re.sub(r'\s+', ' ', key)
+    return key.strip(' ,')
+
+
+class GeocodeCache:
+    """SQLite-backed address -> geocode result cache with per-status TTLs"""
+
+    def __init__(self, path=CACHE_FILE, ttl=None):
+        self.path = path
+        self.ttl = dict(DEFAULT_TTL)
+        if ttl:
+            self.ttl.update(ttl)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocode (
+                address TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                lat REAL,
+                lon REAL,
+                updated REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, address):
+        """Return (status, coords) for a fresh cache entry, or None"""
+        key = normalize_address(address)
+        row = self.conn.execute(
+            "SELECT status, lat, lon, updated FROM geocode WHERE address = ?", (key,)).fetchone()
+        if row:
+            status, lat, lon, updated = row
+            if time.time() - updated <= self.ttl.get(status, 0):
+                self.hits += 1
+                coords = [lat, lon] if lat is not None else None
+                return status, coords
+        self.misses += 1
+        return None
+
+    def put(self, address, status, coords=None):
+        """Store a geocode outcome ('ok', 'invalid' or 'miss')"""
+        if status not in STATUSES:
+            raise ValueError(f"Unknown cache status: {status}")
+        lat, lon = coords if coords else (None, None)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO geocode (address, status, lat, lon, updated) VALUES (?, ?, ?, ?, ?)",
+            (normalize_address(address), status, lat, lon, time.time()))
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Concurrent Geocoding Engine for ATLAS Data Center Project
+
+Keeps several geocoding requests in flight across one or more Nominatim
+endpoints instead of geocoding one facility at a time.
+
+Features:
+- asyncio scheduler with geopy calls running on a thread pool
+- Token-bucket rate limiter per endpoint (public Nominatim: 1 req/sec)
+- Work spread across every configured endpoint
+- Exponential backoff with jitter for timeouts/service errors - a request
+  waiting to retry does not hold a worker, so other requests keep flowing
+- Request latency histogram and timeout/retry/error counters per endpoint,
+  recorded into a run_metrics.RunMetrics (engine.metrics)
+- An address the geocoder answered with nothing gets None; one that could
+  not be geocoded (retries used up, query rejected) gets FAILED, so callers
+  can retry it later instead of recording it as a miss
+"""
+
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from geopy.geocoders import Nominatim
+from geopy.exc import GeocoderQueryError, GeocoderTimedOut, GeocoderServiceError, GeocoderRateLimited
+
+from run_metrics import RunMetrics
+
+USER_AGENT = "atlas_datacenter_project_v2"
+
+# Default endpoint list. Add self-hosted instances here (or pass your own
+# list to GeocodeEngine) - throughput is the sum of the endpoint rates.
+#   domain      - host[:port] of the Nominatim instance
+#   scheme      - 'https' or 'http'
+#   rate        - sustained requests per second allowed on this endpoint
+#   burst       - requests that may be sent back-to-back after idling
+#   concurrency - maximum requests in flight on this endpoint
+DEFAULT_ENDPOINTS = [
+    {'domain': 'nominatim.openstreetmap.org', 'scheme': 'https', 'rate': 0.9, 'burst': 1, 'concurrency': 1},
+]
+
+REQUEST_TIMEOUT = 10   # Seconds per geocoder request
+MAX_RETRIES = 3        # Attempts per address
+BACKOFF_BASE = 2.0     # First retry waits ~2s, then ~4s, ~8s...
+BACKOFF_MAX = 60.0     # Upper bound for a single backoff
+
+# Result for an address that could not be geocoded (distinct from None,
+# which means the geocoder answered and found nothing)
+FAILED = 'failed'
+
+
+class TokenBucket:
+    """Token bucket rate limiter (rate tokens/sec, up to burst tokens)"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """Wait for and consume one token"""
+        while True:
+            delay = self.wait_time()
+            if delay <= 0:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(delay)
+
+
+class Endpoint:
+    """One Nominatim instance with its own rate limit and concurrency cap"""
+
+    def __init__(self, domain, scheme='https', rate=1.0, burst=1, concurrency=1, user_agent=USER_AGENT):
+        self.name = f"{scheme}://{domain}"
+        self.rate = float(rate)
+        self.concurrency = max(1, int(concurrency))
+        self.bucket = TokenBucket(rate, burst)
+        self.geolocator = Nominatim(user_agent=user_agent, domain=domain, scheme=scheme)
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    def wait_time(self):
+        """Seconds until this endpoint can take another request"""
+        if self.in_flight >= self.concurrency:
+            return float('inf')
+        return self.bucket.wait_time()
+
+
+class GeocodeEngine:
+    """Geocode many addresses concurrently across rate-limited endpoints"""
+
+    def __init__(self, endpoints=None, max_retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, metrics=None):
+        self.endpoints = [Endpoint(**config) for config in (endpoints or DEFAULT_ENDPOINTS)]
+        if not self.endpoints:
+            raise ValueError("GeocodeEngine needs at least one endpoint")
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.workers = sum(ep.concurrency for ep in self.endpoints)
+        self.retries = 0
+        self.failures = 0
+        self.metrics = metrics or RunMetrics('geocode_engine')
+
+    @property
+    def requests_per_second(self):
+        """Combined request budget of all endpoints"""
+        return sum(ep.rate for ep in self.endpoints)
+
+    def describe(self):
+        """Human-readable endpoint summary"""
+        return ', '.join(f"{ep.name} ({ep.rate:g} req/s x{ep.concurrency})" for ep in self.endpoints)
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after:
+            return min(self.backoff_max, float(retry_after))
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _checkout(self, changed):
+        """Wait until some endpoint can take a request and reserve a slot on it"""
+        while True:
+            endpoint = min(self.endpoints, key=lambda ep: ep.wait_time())
+            delay = endpoint.wait_time()
+            if delay == float('inf'):
+                # Every endpoint is at its concurrency cap - wait for a release
+                changed.clear()
+                await changed.wait()
+                continue
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            await endpoint.bucket.acquire()
+            endpoint.in_flight += 1
+            return endpoint
+
+    async def _geocode_one(self, loop, executor, changed, address, max_retries):
+        """Geocode one address, retrying on a fresh endpoint slot after backoff
+
+        Returns [lat, lon], None (no result) or FAILED. Errors outside
+        geopy's exception types are not caught.
+        """
+        outcome = 'error'
+        for attempt in range(max_retries):
+            endpoint = await self._checkout(changed)
+            retry_after = None
+            outcome = 'error'
+            start = time.perf_counter()
+            try:
+                endpoint.requests += 1
+                location = await loop.run_in_executor(
+                    executor, lambda: endpoint.geolocator.geocode(address, timeout=self.timeout))
+                outcome = 'ok' if location else 'miss'
+                if location:
+                    return [location.latitude, location.longitude]
+                return None
+            except GeocoderRateLimited as e:
+                endpoint.errors += 1
+                outcome = 'rate_limited'
+                retry_after = e.retry_after
+            except GeocoderTimedOut:
+                endpoint.errors += 1
+                outcome = 'timeout'
+            except GeocoderQueryError:
+                # The endpoint rejected this query - retrying will not help
+                endpoint.errors += 1
+                outcome = 'query_error'
+                break
+            except GeocoderServiceError:
+                endpoint.errors += 1
+                outcome = 'service_error'
+            finally:
+                endpoint.in_flight -= 1
+                changed.set()
+                self.metrics.observe('geocode_request_seconds', time.perf_counter() - start, endpoint=endpoint.name)
+                self.metrics.count('geocode_requests', endpoint=endpoint.name, outcome=outcome)
+
+            if attempt < max_retries - 1:
+                self.retries += 1
+                self.metrics.count('geocode_retries', endpoint=endpoint.name)
+                # Sleeping here only parks this coroutine; its endpoint slot
+                # was released above so other addresses keep being served.
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        self.failures += 1
+        self.metrics.count('geocode_failures', outcome=outcome)
+        return FAILED
+
+    async def _run(self, jobs, callback, max_retries):
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Cap outstanding coroutines so a huge backlog does not create
+            # thousands of waiting tasks up front.
+            limit = asyncio.Semaphore(self.workers * 4)
+
+            async def worker(key, address):
+                try:
+                    coords = await self._geocode_one(loop, executor, changed, address, max_retries)
+                    callback(key, address, coords)
+                finally:
+                    limit.release()
+
+            tasks = []
+            for key, address in jobs:
+                await limit.acquire()
+                tasks.append(asyncio.ensure_future(worker(key, address)))
+            if tasks:
+                await asyncio.gather(*tasks)
+
+    def geocode_all(self, jobs, callback, max_retries=None):
+        """Geocode (key, address) jobs; callback(key, address, coords) runs as each finishes.
+
+        coords is [lat, lon], None (no result) or FAILED (not geocoded - do
+        not cache it as a miss). Results arrive in completion order, not
+        submission order. Callbacks run on the scheduler thread, one at a time.
+        max_retries overrides the engine's attempts per address for this call.
+        """
+        max_retries = self.max_retries if max_retries is None else max_retries
+        asyncio.run(self._run(jobs, callback, max_retries))
+
+    def geocode(self, address, max_retries=None):
+        """Geocode a single address (blocking); [lat, lon], None or FAILED"""
+        result = {}
+        self.geocode_all([(None, address)], lambda key, addr, coords: result.setdefault('coords', coords),
+                         max_retries)
+        return result.get('coords')
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Nearest-Neighbor Table for ATLAS Data Center Project
+
+Precomputes the K nearest facilities (and distances) for every facility so
+Proximity Analysis and offline capacity planning become O(1) lookups instead
+of ranking every facility by haversine distance on each request.
+
+- Uses the grid SpatialIndex (exact haversine, never an n x n matrix)
+- Work is split into chunks across a process pool; each worker loads the
+  saved index once
+- Output is a compact .npz table indexed by dataset row:
+    neighbors  int32   (rows, K)  dataset row of each neighbor, -1 = none
+    distances  float32 (rows, K)  km, NaN = none
+  A facility without coordinates has an all -1 row.
+- Optional minified JSON for the map: {"k": K, "neighbors": [[[row, km], ...], ...]}
+
+Usage:
+    python knn_table.py [input.json] [output.npz] [--k 50] [--workers N] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dataset_io import load_dataset
+from spatial_index import SpatialIndex
+
+INPUT_FILE = 'datacenters_cleaned.json'
+OUTPUT_FILE = 'datacenters_cleaned.knn.npz'
+DEFAULT_K = 50
+CHUNK_SIZE = 5000
+
+_worker_index = None
+
+
+def _init_worker(index_path):
+    global _worker_index
+    _worker_index = SpatialIndex.load(index_path)
+
+
+def _knn_chunk(args):
+    """Compute K neighbors for one chunk of query points (runs in a worker)"""
+    rows, lats, lons, k = args
+    neighbors = np.full((len(rows), k), -1, dtype=np.int32)
+    distances = np.full((len(rows), k), np.nan, dtype=np.float32)
+    for i, (row, lat, lon) in enumerate(zip(rows, lats, lons)):
+        # Ask for one extra so the facility itself can be dropped
+        ids, dist = _worker_index.nearest(lat, lon, k + 1)
+        keep = ids != row
+        ids, dist = ids[keep][:k], dist[keep][:k]
+        neighbors[i, :len(ids)] = ids
+        distances[i, :len(ids)] = dist
+    return rows, neighbors, distances
+
+
+def build_knn_table(index, total_rows, k=DEFAULT_K, workers=None, chunk_size=CHUNK_SIZE):
+    """Compute the neighbor table for every indexed facility
+
+    Returns (neighbors, distances) arrays with one row per dataset row.
+    """
+    neighbors = np.full((total_rows, k), -1, dtype=np.int32)
+    distances = np.full((total_rows, k), np.nan, dtype=np.float32)
+
+    chunks = [(index.ids[i:i + chunk_size], index.lats[i:i + chunk_size], index.lons[i:i + chunk_size], k)
+              for i in range(0, len(index), chunk_size)]
+    if not chunks:
+        return neighbors, distances
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = os.path.join(tmp, 'index.npz')
+        index.save(index_path)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(index_path,)) as executor:
+            for done, (rows, chunk_neighbors, chunk_distances) in enumerate(executor.map(_knn_chunk, chunks), 1):
+                neighbors[rows] = chunk_neighbors
+                distances[rows] = chunk_distances
+                if done % 20 == 0 or done == len(chunks):
+                    print(f"  [{done}/{len(chunks)}] chunks complete")
+
+    return neighbors, distances
+
+
+def save_knn_table(path, neighbors, distances):
+    np.savez(path, neighbors=neighbors, distances=distances)
+
+
+def load_knn_table(path=OUTPUT_FILE):
+    """Load (neighbors, distances); row i holds facility i's neighbors"""
+    with np.load(path) as saved:
+        return saved['neighbors'], saved['distances']
+
+
+def save_knn_json(path, neighbors, distances):
+    """Write a minified JSON table for the map (distances rounded to 0.1 km)"""
+    table = []
+    for row_neighbors, row_distances in zip(neighbors.tolist(), np.round(distances, 1).tolist()):
+        table.append([[n, d] for n, d in zip(row_neighbors, row_distances) if n >= 0])
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'k': neighbors.shape[1], 'neighbors': table}, f, separators=(',', ':'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute K nearest facilities for every facility')
+    parser.add_argument('input', nargs='?', default=INPUT_FILE)
+    parser.add_argument('output', nargs='?', default=OUTPUT_FILE)
+    parser.add_argument('--k', type=int, default=DEFAULT_K)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--json', dest='json_output')
+    args = parser.parse_args()
+
+    print(f"Loading {args.input}...")
+    data = load_dataset(args.input)
+    index = SpatialIndex.from_records(data)
+    print(f"Facilities: {len(data)} ({len(index)} with coordinates)")
+
+    start = time.perf_counter()
+    neighbors, distances = build_knn_table(index, len(data), args.k, args.workers)
+    elapsed = time.perf_counter() - start
+
+    save_knn_table(args.output, neighbors, distances)
+    print(f"\nSaved {args.output}")
+    if args.json_output:
+        save_knn_json(args.json_output, neighbors, distances)
+        print(f"Saved {args.json_output}")
+
+    rate = len(index) / elapsed if elapsed > 0 else 0
+    print(f"\n[SUCCESS] {args.k}-nearest table for {len(index)} facilities in {elapsed:.1f}s ({rate:,.0f} facilities/sec)")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Load Test for the ATLAS API
+
+Drives an API server (api_server.py, or the Worker) with concurrent
+keep-alive clients for a fixed duration and reports requests/sec and
+p50/p90/p99 latency per endpoint.
+
+Usage:
+    python loadtest_api.py [--url http://127.0.0.1:8787] [--concurrency 32] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from urllib.parse import quote, urlsplit
+
+DEFAULT_URL = 'http://127.0.0.1:8787'
+
+# Weighted request mix, roughly what the map generates
+REQUEST_MIX = [
+    ('/api/all', 1),
+    ('/api/stats', 2),
+    ('/api/search?q={term}', 5),
+    ('/api/suggest?q={prefix}', 3),
+    ('/api/country?name={country}', 3),
+    ('/api/filter?country={country}&limit=50', 2),
+    ('/api/clusters?zoom={zoom}&bbox={bbox}', 4),
+]
+SEARCH_TERMS = ['equinix', 'ashburn', 'london', 'frankfurt', 'digital realty', 'tokyo', 'miami', 'singapore']
+COUNTRIES = ['United States', 'Germany', 'United Kingdom', 'Netherlands', 'Japan', 'Brazil', 'Australia']
+VIEWPORTS = ['-60,-180,80,180', '24,-125,50,-66', '35,-10,60,30', '-45,110,-10,155', '20,100,46,146']
+
+
+def pick_path(rng):
+    template = rng.choices([p for p, _ in REQUEST_MIX], weights=[w for _, w in REQUEST_MIX])[0]
+    term = rng.choice(SEARCH_TERMS)
+    return template.format(term=quote(term), prefix=quote(term[:rng.randint(2, 4)]),
+                           country=quote(rng.choice(COUNTRIES)), zoom=rng.randint(2, 10),
+                           bbox=rng.choice(VIEWPORTS))
+
+
+async def read_response(reader):
+    """Read one HTTP response; returns status code"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    if length:
+        await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, deadline, results, seed, gzip_enabled):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    accept = 'Accept-Encoding: gzip\r\n' if gzip_enabled else ''
+    try:
+        while time.perf_counter() < deadline:
+            path = pick_path(rng)
+            request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{accept}\r\n".encode('latin-1')
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await read_response(reader)
+            results.append((path.split('?')[0], status, time.perf_counter() - start))
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def report(results, elapsed):
+    print(f"\nTotal: {len(results)} requests in {elapsed:.1f}s ({len(results)/elapsed:,.0f} req/sec)")
+    errors = sum(1 for _, status, _ in results if status >= 400)
+    print(f"Errors: {errors}")
+
+    print(f"\n{'endpoint':<16} {'requests':>9} {'req/sec':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    endpoints = sorted({endpoint for endpoint, _, _ in results})
+    for endpoint in endpoints + ['all']:
+        latencies = sorted(lat for ep, _, lat in results if endpoint in (ep, 'all'))
+        print(f"{endpoint:<16} {len(latencies):>9} {len(latencies)/elapsed:>9,.0f} "
+              f"{percentile(latencies, 50)*1000:>8.2f} {percentile(latencies, 90)*1000:>8.2f} "
+              f"{percentile(latencies, 99)*1000:>8.2f}")
+
+
+async def run(url, concurrency, duration, gzip_enabled):
+    parts = urlsplit(url)
+    host = parts.hostname
+    port = parts.port or 80
+
+    print(f"Load testing {url} with {concurrency} clients for {duration}s...")
+    results = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(client(host, port, deadline, results, seed, gzip_enabled) for seed in range(concurrency)))
+    report(results, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the ATLAS API')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--no-gzip', action='store_true')
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url, args.concurrency, args.duration, not args.no_gzip))
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+ATLAS Data Pipeline Runner
+
+Runs clean_data, the coordinate anomaly detector (coord_anomalies.py) and
+the coordinate correction rules (coord_corrections.py) in a single pass
+instead of running each script separately (each of which loads, re-saves
+and re-verifies both JSON files).
+
+- datacenters.json is loaded once
+- Stages run as in-memory transforms, each followed by its post-condition check
+- datacenters.json gets the fix stages, datacenters_cleaned.json gets
+  cleaning + fix stages (same result as running the scripts in order)
+- Each output file is written once (atomically)
+- Per-stage wall/CPU time, records/sec and peak RSS go to a run report
+  (pipeline.metrics.json, optionally Prometheus - see run_metrics.py),
+  compared against the previous run's report
+- The correction rules' stage version is a hash of the rules in
+  coord_corrections.json, so editing the rules reapplies them to every record
+- Empty city/state/country fields of the cleaned output are filled from the
+  nearest populated place (reverse_geocode.py, skipped without GeoNames
+  files; its stage version includes a content hash of those files)
+- The cleaned output's coordinates are cross-checked against country
+  boundary polygons (country_polygons.py, skipped without a boundary file)
+- Dataset statistics are built once and updated with each stage's changed
+  rows, then written as STATISTICS.md and the stats JSON (no rescan)
+- Incremental: records whose content hash is in the processing manifest
+  (process_manifest.py) get their stored result instead of running the
+  stages again, so a rerun after a new scrape only processes new or changed
+  records (--full processes everything)
+- Coordinates found by batch_geocode.py are kept in the manifest apart from
+  the stage results and applied after the stages on every run (including
+  --full and after a stage version change)
+- Stage checks always run over the whole output. On an incremental run the
+  dataset-wide detections inside the transforms (clean_data's duplicate
+  sentinel coordinates, coord_anomalies' shared points and city medians)
+  only see the records being processed; --full recomputes them over
+  every record
+
+Usage:
+    python pipeline.py [--full]
+"""
+
+import argparse
+import copy
+import time
+
+import clean_data
+import coord_anomalies
+import coord_corrections
+import country_polygons
+import reverse_geocode
+from dataset_io import load_dataset, save_dataset
+from process_manifest import MANIFEST_FILE, ProcessManifest, record_hash, record_patch
+from run_metrics import RunMetrics
+from stats_engine import MARKDOWN_FILE, STATS_FILE, DatasetStats
+
+RAW_FILE = 'datacenters.json'
+CLEANED_FILE = 'datacenters_cleaned.json'
+
+# Stage registry - run in order.
+#   name      - label used in the report
+#   transform - fn(data, changed) -> count of records changed (or stats), mutates
+#               in place and appends the index of each modified record to changed
+#   check     - fn(data) -> bool post-condition over the whole output, run right
+#               after the transform
+#   raw       - also applied to datacenters.json (False = cleaned output only)
+#   version   - bump when the stage's logic changes, so results stored in the
+#               processing manifest are recomputed (a callable is evaluated
+#               when the versions are compared, e.g. to hash input files)
+STAGES = []
+
+
+def register_stage(name, transform, check=None, raw=True, version=1):
+    """Add a stage to the pipeline registry"""
+    STAGES.append({'name': name, 'transform': transform, 'check': check, 'raw': raw, 'version': version})
+
+
+def _correct_coords(data, changed):
+    fixed_count, fixes_by_rule = coord_corrections.apply_corrections(data, changed=changed)
+    coord_corrections.print_corrections(fixes_by_rule)
+    return fixed_count
+
+
+def _clean(data, changed):
+    stats = clean_data.clean_records(data, changed)
+    clean_data.print_cleaning_results(stats)
+    return stats
+
+
+register_stage('clean_data', _clean, clean_data.check_records, raw=False)
+register_stage('coord_anomalies', coord_anomalies.fix_records, coord_anomalies.check_records, version=3)
+register_stage('coord_corrections', _correct_coords, coord_corrections.check_records,
+               version=coord_corrections.rules_version())
+register_stage('reverse_geocode', reverse_geocode.backfill_stage, raw=False, version=reverse_geocode.stage_version)
+register_stage('country_polygons', country_polygons.cross_check_records, raw=False)
+
+
+def stage_versions(raw=False):
+    """{stage name: version} of the stages run for an output"""
+    return {stage['name']: stage['version']() if callable(stage['version']) else stage['version']
+            for stage in STAGES if stage['raw'] or not raw}
+
+
+def run_stages(data, label, raw=False, stats=None, rows=None, metrics=None):
+    """Run registered stages over data in place; returns per-stage results
+
+    rows restricts the stage transforms to those indices of data; checks
+    always run over all of data. stats (a DatasetStats built from data) is
+    updated with each stage's
+    changed rows. Each stage is recorded in metrics (a RunMetrics) if given.
+    """
+    subset = data if rows is None else [data[i] for i in rows]
+    results = []
+    for stage in STAGES:
+        if raw and not stage['raw']:
+            continue
+
+        print(f"\n[{label}] {stage['name']}")
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        changed_rows = []
+        changed = stage['transform'](subset, changed_rows)
+        transform_time = time.perf_counter() - start
+
+        if stats is not None:
+            start = time.perf_counter()
+            stats.update_rows(data, changed_rows if rows is None else [rows[j] for j in changed_rows])
+            transform_time += time.perf_counter() - start
+
+        ok = True
+        check_time = 0.0
+        if stage['check']:
+            start = time.perf_counter()
+            ok = stage['check'](data)
+            check_time = time.perf_counter() - start
+
+        if metrics is not None:
+            metrics.add_stage(f"{label}: {stage['name']}", transform_time + check_time,
+                              time.process_time() - cpu_start, len(subset))
+        results.append({
+            'label': label,
+            'stage': stage['name'],
+            'changed': changed,
+            'ok': ok,
+            'transform_time': transform_time,
+            'check_time': check_time,
+        })
+    return results
+
+
+def run_incremental(data, hashes, label, manifest, raw=False, stats=None, metrics=None, reuse=True):
+    """Apply stored results to unchanged records and run the stages over the rest
+
+    reuse=False runs the stages over every record. Stored geocoded
+    coordinates are applied afterwards either way. Returns (per-stage
+    results, records processed); the manifest entry for label is replaced
+    with the results for the current records.
+    """
+    versions = stage_versions(raw)
+    stored = manifest.results(label, versions) if reuse else {}
+
+    pending = []
+    reused = []
+    for i, h in enumerate(hashes):
+        patch = stored.get(h)
+        if patch is None:
+            pending.append(i)
+        elif patch:
+            data[i].update(patch)
+            reused.append(i)
+    if stats is not None:
+        stats.update_rows(data, reused)
+    print(f"\n[{label}] {len(data) - len(pending)} unchanged records reused, {len(pending)} to process")
+
+    results = []
+    inputs = [copy.deepcopy(data[i]) for i in pending]
+    if pending:
+        results = run_stages(data, label, raw, stats, rows=pending, metrics=metrics)
+
+    new_results = {h: stored[h] for h in hashes if h in stored}
+    for i, before in zip(pending, inputs):
+        new_results[hashes[i]] = record_patch(before, data[i])
+    manifest.set_results(label, versions, hashes, new_results)
+
+    geocoded = manifest.apply_geocoded(label, data, hashes)
+    if geocoded:
+        if stats is not None:
+            stats.update_rows(data, geocoded)
+        print(f"\n[{label}] {len(geocoded)} geocoded coordinates applied from the manifest")
+    return results, len(pending)
+
+
+def run_pipeline(raw_file=RAW_FILE, cleaned_file=CLEANED_FILE, markdown_file=MARKDOWN_FILE,
+                 stats_file=STATS_FILE, manifest_file=MANIFEST_FILE, incremental=True, metrics_file=None):
+    """Load once, run every stage in memory, write each output once"""
+    metrics = RunMetrics('pipeline')
+
+    with metrics.stage('load') as stage:
+        raw = load_dataset(raw_file)
+        stage['records'] = len(raw)
+    print(f"Loaded {len(raw)} entries from {raw_file}")
+
+    # Cleaned output starts from the unfixed raw data, as clean_data.py does
+    cleaned = copy.deepcopy(raw)
+
+    with metrics.stage('build stats', records=len(cleaned)):
+        stats = DatasetStats.from_records(cleaned)
+
+    with metrics.stage('hash records', records=len(raw)):
+        hashes = [record_hash(dc) for dc in raw]
+        manifest = ProcessManifest.load(manifest_file)
+
+    results, raw_processed = run_incremental(raw, hashes, raw_file, manifest, raw=True, metrics=metrics,
+                                             reuse=incremental)
+    cleaned_results, cleaned_processed = run_incremental(cleaned, hashes, cleaned_file, manifest, stats=stats,
+                                                         metrics=metrics, reuse=incremental)
+    results += cleaned_results
+    metrics.count('records_processed', raw_processed, output=raw_file)
+    metrics.count('records_processed', cleaned_processed, output=cleaned_file)
+    metrics.count('records_reused', len(raw) - raw_processed, output=raw_file)
+    metrics.count('records_reused', len(cleaned) - cleaned_processed, output=cleaned_file)
+
+    with metrics.stage(f'save {raw_file}', records=len(raw)):
+        save_dataset(raw, raw_file)
+
+    with metrics.stage(f'save {cleaned_file}', records=len(cleaned)):
+        save_dataset(cleaned, cleaned_file)
+
+    with metrics.stage(f'save {markdown_file}, {stats_file}'):
+        stats.save_markdown(markdown_file)
+        stats.save_json(stats_file)
+
+    with metrics.stage(f'save {manifest_file}'):
+        manifest.save()
+
+    clean_data.print_summary(cleaned)
+
+    # Report
+    print(f"\n" + "="*70)
+    print("PIPELINE REPORT")
+    print("="*70)
+    reused = f" (rest reused from {manifest_file})" if raw_processed < len(raw) or cleaned_processed < len(cleaned) else ""
+    print(f"  Records processed: {raw_file} {raw_processed}/{len(raw)}, "
+          f"{cleaned_file} {cleaned_processed}/{len(cleaned)}{reused}")
+    for result in results:
+        changed = result['changed']
+        if isinstance(changed, dict):
+            changed = changed['countries_fixed'] + changed['states_added'] + changed['invalid_coords']
+        status = 'OK' if result['ok'] else 'FAILED'
+        print(f"  [{status}] {result['label']:<26} {result['stage']:<20} "
+              f"changed: {changed:<5} transform: {result['transform_time']*1000:8.1f}ms "
+              f"check: {result['check_time']*1000:7.1f}ms")
+        metrics.count('stage_changed', changed, stage=f"{result['label']}: {result['stage']}")
+    metrics.finish(metrics_file)
+
+    all_ok = all(r['ok'] for r in results)
+    return all_ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the ATLAS data pipeline')
+    parser.add_argument('--full', action='store_true',
+                        help='process every record (geocoded coordinates in the manifest are still applied)')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("ATLAS DATA PIPELINE")
+    print("="*70)
+
+    if run_pipeline(incremental=not args.full):
+        print(f"\n[SUCCESS] Pipeline complete - all stage checks passed!")
+    else:
+        print(f"\n[ERROR] One or more stage checks failed!")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Processing Manifest for ATLAS Data Center Project
+
+Remembers what each pipeline output made of every input record, so a rerun
+after a new scrape only cleans, fixes and geocodes records that are new or
+changed.
+
+- Each record is identified by a content hash of its source fields (the
+  fields the stages and the geocoder read)
+- Per output file the manifest stores the stage versions it was built with
+  and, per record hash, the result: the fields the stages changed
+- Unchanged records get their stored result applied instead of running the
+  stages again; bumping a stage's version (pipeline.register_stage)
+  invalidates every stored result for that output
+- batch_geocode.py records the coordinates it finds, with its
+  GEOCODE_VERSION, in a separate geocoded section per output. It does not
+  depend on stage versions: changing a stage, or a --full run, recomputes
+  the stage results but keeps every geocoded coordinate, and the pipeline
+  applies them to records still without coordinates after the stages ran
+
+Usage:
+    python process_manifest.py [datacenters.manifest.json]
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+MANIFEST_FILE = 'datacenters.manifest.json'
+FORMAT = 2
+
+# Fields a record's processing depends on - a change to any of them means
+# the record is processed again
+SOURCE_FIELDS = ('name', 'company', 'address', 'city', 'state', 'zip', 'country', 'city_coords')
+
+
+def record_hash(dc):
+    """Content hash of a record's source fields"""
+    source = json.dumps([dc.get(field) for field in SOURCE_FIELDS], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(source.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def record_patch(before, after):
+    """Fields of after that differ from before (what processing changed)"""
+    return {key: value for key, value in after.items() if before.get(key) != value}
+
+
+class ProcessManifest:
+    """Per-output stage versions and per-record-hash results"""
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self.outputs = {}
+
+    @classmethod
+    def load(cls, path=MANIFEST_FILE):
+        """Saved manifest, or an empty one if missing, unreadable or from another format"""
+        manifest = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+        if saved.get('fields') != list(SOURCE_FIELDS):
+            return manifest
+        if saved.get('format') == FORMAT:
+            manifest.outputs = saved.get('outputs', {})
+        elif saved.get('format') == 1:
+            manifest.outputs = _from_format_1(saved.get('outputs', {}))
+        return manifest
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': FORMAT, 'fields': list(SOURCE_FIELDS), 'outputs': self.outputs},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def results(self, output, stages):
+        """{hash: patch} stored for output, if built with the same stage versions"""
+        entry = self.outputs.get(output)
+        if not entry or entry.get('stages') != stages:
+            return {}
+        return entry['results']
+
+    def set_results(self, output, stages, hashes, results):
+        """Replace output's entry: row hashes in dataset order and their results
+
+        Geocoded coordinates are kept for every hash still in the output,
+        whatever the stage versions.
+        """
+        previous = self.outputs.get(output) or {}
+        current = set(hashes)
+        self.outputs[output] = {
+            'stages': stages,
+            'rows': list(hashes),
+            'results': {h: results[h] for h in hashes},
+            'geocoded': {h: found for h, found in previous.get('geocoded', {}).items() if h in current},
+        }
+
+    def record_geocoded(self, output, data, rows, version):
+        """Store the geocoded coordinates of data[rows] for output
+
+        data must be the output as the pipeline wrote it (same rows in the
+        same order); returns the number of coordinates stored.
+        """
+        entry = self.outputs.get(output)
+        if not entry or len(entry['rows']) != len(data):
+            return 0
+        for i in rows:
+            entry['geocoded'][entry['rows'][i]] = {'coords': data[i].get('city_coords'), 'version': version}
+        return len(rows)
+
+    def apply_geocoded(self, output, data, hashes):
+        """Set stored geocoded coordinates on records of data without coordinates
+
+        hashes are the records' hashes in data order; returns the indices
+        of the records updated.
+        """
+        geocoded = (self.outputs.get(output) or {}).get('geocoded', {})
+        rows = []
+        for i, h in enumerate(hashes):
+            found = geocoded.get(h)
+            if found and found['coords'] and not data[i].get('city_coords'):
+                data[i]['city_coords'] = found['coords']
+                rows.append(i)
+        return rows
+
+
+def _from_format_1(outputs):
+    """Format 1 outputs with geocoded coordinates moved out of the stage results"""
+    for entry in outputs.values():
+        geocoded = {}
+        for h, version in entry.get('geocoded', {}).items():
+            patch = entry['results'].get(h, {})
+            if 'city_coords' in patch:
+                geocoded[h] = {'coords': patch.pop('city_coords'), 'version': version}
+        entry['geocoded'] = geocoded
+    return outputs
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else MANIFEST_FILE
+    manifest = ProcessManifest.load(path)
+    if not manifest.outputs:
+        print(f"No manifest at {path}")
+        sys.exit(0)
+
+    for output, entry in manifest.outputs.items():
+        changed = sum(1 for patch in entry['results'].values() if patch)
+        print(f"{output}: {len(entry['rows'])} rows, {len(entry['results'])} unique records "
+              f"({changed} changed by processing, {len(entry['geocoded'])} geocoded)")
+        print("  stages: " + ', '.join(f"{name} v{version}" for name, version in entry['stages'].items()))
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Reverse Geocoding for ATLAS Data Center Project
+
+Fills empty city, state and country fields from the nearest populated place
+in the local GeoNames gazetteer (see gazetteer.py), with no network calls.
+clean_data.py can only derive state for US records with a zip code; this
+fills the gaps worldwide so the map's country/state filters and the
+statistics are complete.
+
+- Places are stored as 3D unit vectors in a static k-d tree (median splits,
+  leaves of LEAF_SIZE), so distances have no antimeridian or pole seams
+- Queries run as one vectorized batch: every point descends to its own leaf
+  for an initial nearest distance, then the tree is walked level by level
+  keeping only (point, node) pairs whose box is closer than that distance -
+  results are exact nearest neighbors
+- A field is only filled if the place is close enough (CITY_MAX_KM for
+  city, STATE_MAX_KM for state and country) and, for city and state, lies
+  in the record's country
+- Countries are written in the dataset's own spelling (its most common
+  name for that country, e.g. 'Turkey' rather than GeoNames' 'Türkiye');
+  a country the dataset does not name yet is left empty
+
+Usage:
+    python reverse_geocode.py [input.json] [--write]
+"""
+
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+
+from coord_validation import coords_to_arrays
+from country_polygons import canonical_country
+from gazetteer import get_gazetteer, source_version
+from spatial_index import EARTH_RADIUS_KM
+
+INPUT_FILE = 'datacenters_cleaned.json'
+
+LEAF_SIZE = 32
+BATCH_POINTS = 65536      # Points per query batch (bounds temporary array sizes)
+CITY_MAX_KM = 30.0        # Farther than this from any place: leave city empty
+STATE_MAX_KM = 100.0      # ...leave state and country empty
+
+FIELDS = ('city', 'state', 'country')
+BACKFILL_VERSION = 2      # Bump when the backfill logic changes
+
+
+def to_unit_vectors(lats, lons):
+    """(n, 3) points on the unit sphere"""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord_sq):
+    """Great-circle km from squared chord length between unit vectors"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.sqrt(chord_sq) / 2, 0.0, 1.0))
+
+
+class PlaceTree:
+    """Static k-d tree over lat/lon points for batch nearest-neighbor queries
+
+    Implicit complete binary tree: node i has children 2i+1 and 2i+2; the
+    leaves (depth `depth`) own contiguous runs of the sorted points.
+    """
+
+    def __init__(self, lats, lons, leaf_size=LEAF_SIZE):
+        points = to_unit_vectors(lats, lons)
+        count = len(points)
+        self.depth = max(0, int(np.ceil(np.log2(max(count, 1) / leaf_size))))
+        n_leaves = 1 << self.depth
+        n_internal = n_leaves - 1
+
+        order = np.arange(count)
+        bounds = [(0, count)]
+        self.split_dim = np.zeros(n_internal, dtype=np.int8)
+        self.split_value = np.zeros(n_internal)
+        for node in range(n_internal):
+            start, end = bounds[node]
+            mid = (start + end) // 2
+            run = order[start:end]
+            if len(run) > 1:
+                spread = points[run].max(axis=0) - points[run].min(axis=0)
+                dim = int(np.argmax(spread))
+                part = np.argpartition(points[run, dim], mid - start)
+                order[start:end] = run[part]
+                self.split_dim[node] = dim
+                self.split_value[node] = points[order[mid], dim]
+            bounds += [(start, mid), (mid, end)]
+
+        self.order = order
+        self.points = points[order]
+        leaf_bounds = np.array(bounds[n_internal:], dtype=np.int64).reshape(-1, 2)
+        self.leaf_start, self.leaf_end = leaf_bounds[:, 0], leaf_bounds[:, 1]
+        self.max_leaf = int((self.leaf_end - self.leaf_start).max()) if count else 0
+
+        # Node boxes: leaves (never empty - median splits of at least
+        # LEAF_SIZE / 2 points each), then each parent from its children
+        lo = np.full((2 * n_leaves - 1, 3), np.inf)
+        hi = np.full((2 * n_leaves - 1, 3), -np.inf)
+        if count:
+            lo[n_internal:] = np.minimum.reduceat(self.points, self.leaf_start, axis=0)
+            hi[n_internal:] = np.maximum.reduceat(self.points, self.leaf_start, axis=0)
+        for node in range(n_internal - 1, -1, -1):
+            lo[node] = np.minimum(lo[2 * node + 1], lo[2 * node + 2])
+            hi[node] = np.maximum(hi[2 * node + 1], hi[2 * node + 2])
+        self.lo, self.hi = lo, hi
+        self.n_internal = n_internal
+
+    def __len__(self):
+        return len(self.order)
+
+    def _leaf_distances(self, queries, points, leaves):
+        """Nearest point of leaves[i] to queries[points[i]] -> (sorted position, squared chord)"""
+        offsets = np.arange(self.max_leaf)
+        members = self.leaf_start[leaves][:, None] + offsets
+        valid = members < self.leaf_end[leaves][:, None]
+        members = np.where(valid, members, 0)
+        diff = self.points[members] - queries[points][:, None, :]
+        d2 = np.where(valid, np.einsum('ijk,ijk->ij', diff, diff), np.inf)
+        best = np.argmin(d2, axis=1)
+        return members[np.arange(len(leaves)), best], d2[np.arange(len(leaves)), best]
+
+    def _query_batch(self, queries):
+        count = len(queries)
+        # Descend to each point's own leaf for an initial (upper bound) distance
+        node = np.zeros(count, dtype=np.int64)
+        for _ in range(self.depth):
+            right = queries[np.arange(count), self.split_dim[node]] >= self.split_value[node]
+            node = 2 * node + 1 + right
+        home = node - self.n_internal
+        has_points = self.leaf_end[home] > self.leaf_start[home]
+        best_pos = np.zeros(count, dtype=np.int64)
+        best_d2 = np.full(count, np.inf)
+        if has_points.any():
+            rows = np.flatnonzero(has_points)
+            best_pos[rows], best_d2[rows] = self._leaf_distances(queries, rows, home[rows])
+
+        # Walk the tree keeping (point, node) pairs whose box may hold something closer
+        points = np.arange(count)
+        nodes = np.zeros(count, dtype=np.int64)
+        for _ in range(self.depth):
+            points = np.repeat(points, 2)
+            nodes = 2 * np.repeat(nodes, 2) + 1 + np.tile([0, 1], len(nodes))
+            q = queries[points]
+            gap = np.maximum(self.lo[nodes] - q, 0) + np.maximum(q - self.hi[nodes], 0)
+            keep = np.einsum('ij,ij->i', gap, gap) < best_d2[points]
+            points, nodes = points[keep], nodes[keep]
+
+        leaves = nodes - self.n_internal
+        other = leaves != home[points]
+        points, leaves = points[other], leaves[other]
+        if len(points):
+            pos, d2 = self._leaf_distances(queries, points, leaves)
+            order = np.lexsort((d2, points))
+            first = np.r_[True, points[order][1:] != points[order][:-1]]
+            points, pos, d2 = points[order][first], pos[order][first], d2[order][first]
+            closer = d2 < best_d2[points]
+            best_pos[points[closer]] = pos[closer]
+            best_d2[points[closer]] = d2[closer]
+        return best_pos, best_d2
+
+    def nearest(self, lats, lons):
+        """(index of the nearest point, distance in km) for each query point (-1, inf if none)"""
+        queries = to_unit_vectors(lats, lons)
+        index = np.full(len(queries), -1, dtype=np.int64)
+        km = np.full(len(queries), np.inf)
+        if len(self) == 0:
+            return index, km
+        valid = np.flatnonzero(np.isfinite(queries).all(axis=1))
+        for start in range(0, len(valid), BATCH_POINTS):
+            rows = valid[start:start + BATCH_POINTS]
+            pos, d2 = self._query_batch(queries[rows])
+            index[rows] = self.order[pos]
+            km[rows] = chord_to_km(d2)
+        return index, km
+
+
+_default_tree = None
+
+
+def get_place_tree(gazetteer):
+    """PlaceTree over the gazetteer's places (built once per process)"""
+    global _default_tree
+    if _default_tree is None or len(_default_tree) != len(gazetteer):
+        _default_tree = PlaceTree(gazetteer.lat, gazetteer.lon)
+    return _default_tree
+
+
+def dataset_spellings(data):
+    """{canonical country: the dataset's most common spelling of it}"""
+    spellings = {}
+    for name, _ in Counter(dc.get('country') for dc in data if dc.get('country')).most_common():
+        spellings.setdefault(canonical_country(name), name)
+    return spellings
+
+
+def backfill_records(data, gazetteer=None, changed=None):
+    """Fill empty city/state/country fields from the nearest place, in place
+
+    Returns {field: records filled}. If changed is a list, the index of
+    every record modified is appended to it.
+    """
+    gazetteer = gazetteer or get_gazetteer()
+    filled = {field: 0 for field in FIELDS}
+    rows = [i for i, dc in enumerate(data) if dc.get('city_coords') and not all(dc.get(field) for field in FIELDS)]
+    if gazetteer is None or not rows:
+        return filled
+
+    spellings = dataset_spellings(data)
+    lats, lons = coords_to_arrays([data[i] for i in rows])
+    places, km = get_place_tree(gazetteer).nearest(lats, lons)
+    for i, place, distance in zip(rows, places.tolist(), km.tolist()):
+        if place < 0 or distance > STATE_MAX_KM:
+            continue
+        dc = data[i]
+        place_country = canonical_country(gazetteer.country_names[gazetteer.country[place]])
+        updates = {}
+        if not dc.get('country'):
+            if place_country in spellings:
+                updates['country'] = spellings[place_country]
+        elif canonical_country(dc['country']) != place_country:
+            continue      # Nearest place is across a border
+        if not dc.get('state') and gazetteer.admin1[place] >= 0:
+            updates['state'] = gazetteer.admin1_names[gazetteer.admin1[place]]
+        if not dc.get('city') and distance <= CITY_MAX_KM:
+            updates['city'] = gazetteer.names[place]
+        if not updates:
+            continue
+        dc.update(updates)
+        for field in updates:
+            filled[field] += 1
+        if changed is not None:
+            changed.append(i)
+    return filled
+
+
+def stage_version():
+    """Pipeline stage version: backfill logic plus the GeoNames content hash"""
+    return f"{BACKFILL_VERSION}:{source_version()}"
+
+
+def backfill_stage(data, changed):
+    """Pipeline stage: backfill location fields (skipped without gazetteer files)"""
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        print("  [SKIP] GeoNames gazetteer files not found")
+        return 0
+    rows = []
+    filled = backfill_records(data, gazetteer, rows)
+    if changed is not None:
+        changed.extend(rows)
+    print("  Filled: " + ', '.join(f"{field} {count}" for field, count in filled.items()))
+    return len(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fill missing city/state/country from the nearest populated place')
+    parser.add_argument('input', nargs='?', default=INPUT_FILE)
+    parser.add_argument('--write', action='store_true', help='save the filled dataset back to the input file')
+    args = parser.parse_args()
+
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        raise SystemExit("[ERROR] GeoNames gazetteer files not found (see gazetteer.py)")
+
+    from dataset_io import load_dataset, save_dataset
+    data = load_dataset(args.input)
+    start = time.perf_counter()
+    get_place_tree(gazetteer)
+    build_time = time.perf_counter() - start
+
+    missing = {field: sum(1 for dc in data if dc.get('city_coords') and not dc.get(field)) for field in FIELDS}
+    start = time.perf_counter()
+    changed = []
+    filled = backfill_records(data, gazetteer, changed)
+    elapsed = time.perf_counter() - start
+
+    print(f"Place tree: {len(gazetteer)} places in {build_time*1000:.1f}ms")
+    print(f"Backfilled {len(changed)} facilities in {elapsed*1000:.1f}ms")
+    for field in FIELDS:
+        print(f"  {field:<8} {filled[field]:6} of {missing[field]} missing")
+    if args.write and changed:
+        save_dataset(data, args.input)
+        print(f"\n[SUCCESS] Saved {args.input}")
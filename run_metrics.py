@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Run Metrics for ATLAS Data Center Project
+
+Collects performance numbers for one run of a script (pipeline.py,
+clean_data.py, batch_geocode.py, the fix scripts) and writes them as a
+machine-readable report, so runs can be compared instead of reading print
+output.
+
+Features:
+- Per-stage wall and CPU time, records processed and records/sec
+- Peak RSS (process high-water mark) after each stage and for the run
+- Counters (requests, retries, timeouts, cache hits...) with optional labels
+- Histograms with fixed buckets (geocoder request latency), with p50/p90/p99
+  estimated from the buckets
+- JSON run report (REPORT_FILE, one per script, replaced each run); the
+  previous report is compared against before it is replaced and stages
+  that got slower or used more memory are reported as regressions
+- Optional Prometheus text-format file (set ATLAS_PROMETHEUS_FILE, e.g. to a
+  node_exporter textfile collector path)
+
+Usage:
+    python run_metrics.py report.json [previous_report.json]
+"""
+
+import argparse
+import os
+import platform
+import sys
+import tempfile
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:      # Not available on Windows - peak RSS is reported as null
+    resource = None
+
+from dataset_io import copy_mode, load_dataset, save_dataset
+
+REPORT_FILE = '{run}.metrics.json'
+PROMETHEUS_FILE = os.environ.get('ATLAS_PROMETHEUS_FILE')
+METRIC_PREFIX = 'atlas_'
+
+# Request latency buckets in seconds (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGRESSION_THRESHOLD = 0.2   # Flag a stage 20% slower (or using 20% more memory) than last run
+REGRESSION_MIN_SECONDS = 0.05  # ...and at least this much slower (ignores timer noise)
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes (None if unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024    # Linux reports KiB
+
+
+def metric_key(name, labels=None):
+    """Report key for a metric: name, or name{label="value",...}"""
+    if not labels:
+        return name
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return name + '{' + ','.join(f'{label}="{value}"' for label, value in zip(labels, escaped)) + '}'
+
+
+def _sample(key, suffix='', **labels):
+    """Sample name for a report key: suffix added to the name, labels merged in"""
+    name, _, existing = key.partition('{')
+    extra = metric_key('', labels)[1:-1]
+    merged = ','.join(part for part in (existing.rstrip('}'), extra) if part)
+    return name + suffix + ('{' + merged + '}' if merged else '')
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative counts, as Prometheus exposes them)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)    # Last slot: above every bucket
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self):
+        """[(upper bound, observations <= bound)] including +Inf"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Estimate of the q-quantile, interpolating within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower = 0.0
+        below = 0
+        for bound, total in self.cumulative():
+            if total >= rank:
+                upper = min(bound, self.max)
+                if total == below:
+                    return upper
+                return lower + (upper - lower) * (rank - below) / (total - below)
+            lower, below = bound, total
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'max': round(self.max, 6),
+            'p50': self._rounded(0.5),
+            'p90': self._rounded(0.9),
+            'p99': self._rounded(0.99),
+            'buckets': [['+Inf' if bound == float('inf') else bound, total] for bound, total in self.cumulative()],
+        }
+
+    def _rounded(self, q):
+        value = self.quantile(q)
+        return None if value is None else round(value, 6)
+
+
+class RunMetrics:
+    """Stage timings, counters and histograms for one run of a script"""
+
+    def __init__(self, run):
+        self.run = run
+        self.started = datetime.now(timezone.utc)
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self.stages = []
+        self.counters = {}
+        self.histograms = {}
+
+    @contextmanager
+    def stage(self, name, records=None):
+        """Time a block as a stage; the yielded dict's 'records' may be set inside it"""
+        entry = {'name': name, 'records': records}
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield entry
+        finally:
+            self.add_stage(name, time.perf_counter() - wall, time.process_time() - cpu, entry['records'])
+
+    def add_stage(self, name, wall_s, cpu_s=None, records=None):
+        """Record a stage timed by the caller"""
+        entry = {
+            'name': name,
+            'wall_s': round(wall_s, 6),
+            'cpu_s': None if cpu_s is None else round(cpu_s, 6),
+            'records': records,
+            'records_per_s': round(records / wall_s, 1) if records and wall_s > 0 else None,
+            'peak_rss_bytes': peak_rss_bytes(),
+        }
+        self.stages.append(entry)
+        return entry
+
+    def count(self, name, value=1, **labels):
+        """Add value to a counter"""
+        key = metric_key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        """Add one observation to a histogram"""
+        key = metric_key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def report(self):
+        """JSON-serializable run report"""
+        return {
+            'run': self.run,
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'wall_s': round(time.perf_counter() - self._wall_start, 6),
+            'cpu_s': round(time.process_time() - self._cpu_start, 6),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'stages': self.stages,
+            'counters': dict(sorted(self.counters.items())),
+            'histograms': {key: h.to_dict() for key, h in sorted(self.histograms.items())},
+        }
+
+    def finish(self, path=None, prometheus_path=PROMETHEUS_FILE):
+        """Write the run report (and Prometheus file), print a summary; returns the report
+
+        The report previously at path is compared against before it is
+        replaced, and any regressions are printed.
+        """
+        path = path or REPORT_FILE.format(run=self.run)
+        previous = None
+        if os.path.exists(path):
+            try:
+                previous = load_dataset(path)
+            except (OSError, ValueError):
+                previous = None
+        report = self.report()
+        save_dataset(report, path)
+        if prometheus_path:
+            save_prometheus(report, prometheus_path)
+        print_summary(report, previous)
+        print(f"\nRun report: {path}" + (f", {prometheus_path}" if prometheus_path else ""))
+        return report
+
+
+def compare(previous, current, threshold=REGRESSION_THRESHOLD, min_seconds=REGRESSION_MIN_SECONDS):
+    """Stages of current slower or bigger than in previous: [(stage, metric, old, new)]
+
+    Stages are matched by name. Time is compared as records/sec when both
+    runs processed records (so a bigger input is not a regression), else as
+    wall time.
+    """
+    before = {stage['name']: stage for stage in previous.get('stages', [])}
+    regressions = []
+    for stage in current.get('stages', []):
+        old = before.get(stage['name'])
+        if old is None:
+            continue
+        slower = stage['wall_s'] - old['wall_s'] >= min_seconds
+        if old.get('records_per_s') and stage.get('records_per_s'):
+            if slower and stage['records_per_s'] < old['records_per_s'] / (1 + threshold):
+                regressions.append((stage['name'], 'records_per_s', old['records_per_s'], stage['records_per_s']))
+        elif slower and stage['wall_s'] > old['wall_s'] * (1 + threshold):
+            regressions.append((stage['name'], 'wall_s', old['wall_s'], stage['wall_s']))
+    old_rss, new_rss = previous.get('peak_rss_bytes'), current.get('peak_rss_bytes')
+    if old_rss and new_rss and new_rss > old_rss * (1 + threshold):
+        regressions.append(('run', 'peak_rss_bytes', old_rss, new_rss))
+    return regressions
+
+
+def prometheus_text(report):
+    """Report in the Prometheus text exposition format"""
+    run = {'run': report['run']}
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+        for key, value in samples:
+            lines.append(f"{METRIC_PREFIX}{key} {value}")
+
+    finished = datetime.fromisoformat(report['finished']).timestamp()
+    family('run_finished_timestamp_seconds', 'gauge', 'Unix time the run finished',
+           [(metric_key('run_finished_timestamp_seconds', run), finished)])
+    family('run_wall_seconds', 'gauge', 'Wall time of the run', [(metric_key('run_wall_seconds', run), report['wall_s'])])
+    family('run_cpu_seconds', 'gauge', 'CPU time of the run', [(metric_key('run_cpu_seconds', run), report['cpu_s'])])
+    if report['peak_rss_bytes'] is not None:
+        family('run_peak_rss_bytes', 'gauge', 'Peak resident set size of the run',
+               [(metric_key('run_peak_rss_bytes', run), report['peak_rss_bytes'])])
+
+    for field, name, help_text in (('wall_s', 'stage_wall_seconds', 'Wall time per stage'),
+                                   ('cpu_s', 'stage_cpu_seconds', 'CPU time per stage'),
+                                   ('records', 'stage_records', 'Records processed per stage'),
+                                   ('records_per_s', 'stage_records_per_second', 'Records processed per second'),
+                                   ('peak_rss_bytes', 'stage_peak_rss_bytes', 'Peak resident set size after the stage')):
+        samples = [(metric_key(name, {**run, 'stage': stage['name']}), stage[field])
+                   for stage in report['stages'] if stage.get(field) is not None]
+        if samples:
+            family(name, 'gauge', help_text, samples)
+
+    counters = {}
+    for key, value in report['counters'].items():
+        counters.setdefault(key.partition('{')[0], []).append((_sample(key, '_total', **run), value))
+    for name, samples in counters.items():
+        family(f"{name}_total", 'counter', name.replace('_', ' '), samples)
+
+    histograms = {}
+    for key, data in report['histograms'].items():
+        samples = histograms.setdefault(key.partition('{')[0], [])
+        for bound, total in data['buckets']:
+            samples.append((_sample(key, '_bucket', **run, le=bound), total))
+        samples.append((_sample(key, '_sum', **run), data['sum']))
+        samples.append((_sample(key, '_count', **run), data['count']))
+    for name, samples in histograms.items():
+        family(name, 'histogram', name.replace('_', ' '), samples)
+    return '\n'.join(lines) + '\n'
+
+
+def save_prometheus(report, path):
+    """Write the report as a Prometheus text file via temp file + atomic rename"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(prometheus_text(report))
+        copy_mode(tmp_path, path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _megabytes(value):
+    return f"{value / 1e6:.1f}MB" if value is not None else '-'
+
+
+def print_summary(report, previous=None):
+    """Print stage timings, counters, histograms and regressions against previous"""
+    print(f"\n" + "="*70)
+    print(f"RUN METRICS: {report['run']}")
+    print("="*70)
+    print(f"  {'stage':<48} {'wall':>10} {'cpu':>10} {'records':>9} {'rec/s':>11} {'peak RSS':>9}")
+    for stage in report['stages']:
+        cpu = f"{stage['cpu_s']*1000:8.1f}ms" if stage['cpu_s'] is not None else f"{'-':>10}"
+        records = stage['records'] if stage['records'] is not None else '-'
+        rate = f"{stage['records_per_s']:,.0f}" if stage['records_per_s'] else '-'
+        print(f"  {stage['name'][:48]:<48} {stage['wall_s']*1000:8.1f}ms {cpu} {records:>9} {rate:>11} "
+              f"{_megabytes(stage['peak_rss_bytes']):>9}")
+    print(f"  {'total':<48} {report['wall_s']*1000:8.1f}ms {report['cpu_s']*1000:8.1f}ms "
+          f"{'':>9} {'':>11} {_megabytes(report['peak_rss_bytes']):>9}")
+
+    if report['counters']:
+        print(f"\n  Counters:")
+        for key, value in report['counters'].items():
+            print(f"    {key}: {value}")
+    for key, data in report['histograms'].items():
+        if data['count']:
+            print(f"\n  {key}: {data['count']} observations, mean {data['sum'] / data['count']*1000:.1f}ms, "
+                  f"p50 {data['p50']*1000:.1f}ms, p90 {data['p90']*1000:.1f}ms, p99 {data['p99']*1000:.1f}ms, "
+                  f"max {data['max']*1000:.1f}ms")
+
+    if previous is not None:
+        regressions = compare(previous, report)
+        if regressions:
+            print(f"\n  [WARNING] {len(regressions)} regressions since the run of {previous.get('started')}:")
+            for stage, metric, old, new in regressions:
+                print(f"    {stage}: {metric} {old:,} -> {new:,}")
+        else:
+            print(f"\n  [OK] No regressions since the run of {previous.get('started')}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print a run report, optionally compared to an earlier one')
+    parser.add_argument('report')
+    parser.add_argument('previous', nargs='?')
+    parser.add_argument('--prometheus', metavar='PATH', help='also write the report as a Prometheus text file')
+    args = parser.parse_args()
+
+    report = load_dataset(args.report)
+    print_summary(report, load_dataset(args.previous) if args.previous else None)
+    if args.prometheus:
+        save_prometheus(report, args.prometheus)
+        print(f"\nWrote {args.prometheus}")
@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+Text Search Index for ATLAS Data Center Project
+
+Indexes name, company, address, city, state and country so /api/search and
+the map's search bar can answer a query without scanning every facility.
+
+- Token inverted index: every word maps to the facilities containing it.
+  Postings are grouped by field score (name > company > city/state >
+  address/country) and kept sorted by row inside each group, so the best results
+  for a common word come straight off the front of its lists
+- Prefix autocomplete: the last word of a query also matches words it is a
+  prefix of ("fra" -> frankfurt, france, ...), ranked by facility count
+- Trigram index over the vocabulary for substring matches ("quinix" ->
+  equinix) and typo tolerance ("equnix" -> equinix, edit distance 1-2)
+- Every query word must match; results rank by summed score, ties to the
+  lower dataset row. A rare word's facilities are scored against the other
+  words directly; otherwise score-level combinations are intersected best
+  first, in row windows, until the limit is filled
+- Accents and case are folded ("Sao Paulo" matches "São Paulo")
+- The index saves to a .npz file and loads without a rebuild; a file saved
+  with a different field list is rejected on load
+
+Usage:
+    python search_index.py [input.json] [output.npz]
+    python search_index.py --query "equinix frankfurt" [index.npz]
+"""
+
+import bisect
+import itertools
+import math
+import os
+import re
+import sys
+import time
+import unicodedata
+
+import numpy as np
+
+from spatial_index import _ranges_to_indices
+
+INPUT_FILE = 'datacenters_cleaned.json'
+INDEX_FILE = 'datacenters_cleaned.search.npz'
+
+# Indexed fields and their weights; a word's score for a facility is the sum
+# of the weights of the fields it appears in
+FIELDS = ('name', 'company', 'address', 'city', 'state', 'country')
+FIELD_WEIGHTS = (8, 4, 1, 2, 2, 1)
+MASK_SCORES = np.array([sum(w for bit, w in enumerate(FIELD_WEIGHTS) if mask >> bit & 1)
+                        for mask in range(1 << len(FIELDS))], dtype=np.uint8)
+
+# Multipliers for how a query word matched an indexed word
+EXACT = 4
+PREFIX = 3
+SUBSTRING = 2
+FUZZY = 1
+
+MAX_EXPANSIONS = 16          # Indexed words a prefix/substring/typo term can expand to
+MAX_FUZZY_CANDIDATES = 32    # Words edit-distance checked per typo term (most shared trigrams first)
+MIN_SUBSTRING = 3            # Shortest term tried as a substring
+FIRST_WINDOW = 1 << 15       # Smallest first window of a multi-word intersection walk
+RARE_TERM_ROWS = 20000       # Multi-word queries with a term this rare score all its rows directly
+MAX_COMBOS = 256             # Score-level combinations walked for a multi-word query
+SEARCH_LIMIT = 100
+SUGGEST_LIMIT = 10
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+_LAST_CHAR = '\U0010ffff'
+
+
+def fold(text):
+    """Lower-case and strip accents"""
+    text = str(text).casefold()
+    if text.isascii():
+        return text
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """Folded words of a string"""
+    return TOKEN_PATTERN.findall(fold(text))
+
+
+def _trigram_keys(text):
+    """Distinct trigrams of text packed into int64 (3 x 21-bit code points)"""
+    codes = [ord(c) for c in text]
+    return {(codes[i] << 42) | (codes[i + 1] << 21) | codes[i + 2] for i in range(len(codes) - 2)}
+
+
+def _max_edits(term):
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SearchIndex:
+    """Inverted word index + vocabulary trigram index over facility text"""
+
+    def __init__(self, vocab, token_offsets, group_offsets, group_scores, postings,
+                 tri_keys, tri_offsets, tri_tokens, rows):
+        self.vocab = vocab                    # sorted list of words
+        self.token_offsets = token_offsets    # word -> range of groups
+        self.group_offsets = group_offsets    # group -> range of postings
+        self.group_scores = group_scores      # field score of each group
+        self.postings = postings              # dataset rows, sorted within each group
+        self.tri_keys = tri_keys              # sorted trigram keys
+        self.tri_offsets = tri_offsets        # trigram -> range of tri_tokens
+        self.tri_tokens = tri_tokens          # word ids containing each trigram
+        self.rows = rows
+
+        # Facilities per word (a row appears in at most one group per word)
+        self.df = group_offsets[token_offsets[1:]] - group_offsets[token_offsets[:-1]]
+        self.lengths = np.fromiter(map(len, vocab), dtype=np.int64, count=len(vocab))
+
+    @classmethod
+    def from_records(cls, data):
+        """Build from facility dicts; results are positions in data"""
+        token_ids = {}
+        pair_tokens = []
+        pair_rows = []
+        pair_masks = []
+        for row, dc in enumerate(data):
+            masks = {}
+            for bit, field in enumerate(FIELDS):
+                value = dc.get(field)
+                if value:
+                    for token in tokenize(value):
+                        masks[token] = masks.get(token, 0) | (1 << bit)
+            for token, mask in masks.items():
+                token_id = token_ids.get(token)
+                if token_id is None:
+                    token_id = token_ids[token] = len(token_ids)
+                pair_tokens.append(token_id)
+                pair_rows.append(row)
+                pair_masks.append(mask)
+
+        # Renumber words in sorted order so prefixes are contiguous id ranges
+        vocab = sorted(token_ids)
+        remap = np.empty(len(vocab), dtype=np.int64)
+        remap[[token_ids[token] for token in vocab]] = np.arange(len(vocab))
+
+        tokens = remap[np.array(pair_tokens, dtype=np.int64)]
+        rows = np.array(pair_rows, dtype=np.int32)
+        scores = MASK_SCORES[np.array(pair_masks, dtype=np.int64)]
+
+        # Order postings by word, then score (best first), then row
+        order = np.lexsort((rows, -scores.astype(np.int16), tokens))
+        tokens, rows, scores = tokens[order], rows[order], scores[order]
+
+        starts = np.ones(len(tokens), dtype=bool)
+        starts[1:] = (tokens[1:] != tokens[:-1]) | (scores[1:] != scores[:-1])
+        group_starts = np.nonzero(starts)[0]
+        group_offsets = np.append(group_starts, len(tokens)).astype(np.int64)
+        token_offsets = np.searchsorted(tokens[group_starts], np.arange(len(vocab) + 1)).astype(np.int64)
+
+        tri_keys, tri_offsets, tri_tokens = cls._build_trigrams(vocab)
+        return cls(vocab, token_offsets, group_offsets, scores[group_starts], rows,
+                   tri_keys, tri_offsets, tri_tokens, len(data))
+
+    @classmethod
+    def from_json(cls, path=INPUT_FILE):
+        """Build from a JSON dataset file"""
+        from dataset_io import load_dataset
+        return cls.from_records(load_dataset(path))
+
+    @staticmethod
+    def _build_trigrams(vocab):
+        keys = []
+        token_ids = []
+        for token_id, token in enumerate(vocab):
+            for key in _trigram_keys('$' + token + '$'):
+                keys.append(key)
+                token_ids.append(token_id)
+        keys = np.array(keys, dtype=np.int64)
+        token_ids = np.array(token_ids, dtype=np.int32)
+        order = np.lexsort((token_ids, keys))
+        keys, token_ids = keys[order], token_ids[order]
+
+        starts = np.ones(len(keys), dtype=bool)
+        starts[1:] = keys[1:] != keys[:-1]
+        tri_starts = np.nonzero(starts)[0]
+        return keys[tri_starts], np.append(tri_starts, len(keys)).astype(np.int64), token_ids
+
+    def __len__(self):
+        return self.rows
+
+    def save(self, path=INDEX_FILE):
+        vocab = np.frombuffer('\n'.join(self.vocab).encode('utf-8'), dtype=np.uint8)
+        np.savez(path, vocab=vocab, token_offsets=self.token_offsets, group_offsets=self.group_offsets,
+                 group_scores=self.group_scores, postings=self.postings, tri_keys=self.tri_keys,
+                 tri_offsets=self.tri_offsets, tri_tokens=self.tri_tokens, rows=np.array(self.rows),
+                 fields=np.array(FIELDS), weights=np.array(FIELD_WEIGHTS))
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        """Load a saved index without re-tokenizing the dataset"""
+        with np.load(path) as saved:
+            if (tuple(saved['fields'].tolist()) != FIELDS
+                    or tuple(saved['weights'].tolist()) != FIELD_WEIGHTS):
+                raise ValueError(f"{path} was built for different search fields")
+            vocab = saved['vocab'].tobytes().decode('utf-8')
+            return cls(vocab.split('\n') if vocab else [], saved['token_offsets'], saved['group_offsets'],
+                       saved['group_scores'], saved['postings'], saved['tri_keys'], saved['tri_offsets'],
+                       saved['tri_tokens'], int(saved['rows']))
+
+    # Vocabulary lookups
+
+    def token_id(self, token):
+        """Id of an indexed word, or None"""
+        i = bisect.bisect_left(self.vocab, token)
+        if i < len(self.vocab) and self.vocab[i] == token:
+            return i
+        return None
+
+    def prefix_range(self, prefix):
+        """[lo, hi) word ids starting with prefix"""
+        return (bisect.bisect_left(self.vocab, prefix),
+                bisect.bisect_left(self.vocab, prefix + _LAST_CHAR))
+
+    def _most_frequent(self, token_ids, limit=MAX_EXPANSIONS):
+        """Up to limit word ids, most facilities first"""
+        token_ids = np.asarray(token_ids, dtype=np.int64)
+        if len(token_ids) > limit:
+            token_ids = token_ids[np.argpartition(-self.df[token_ids], limit - 1)[:limit]]
+        return token_ids[np.lexsort((token_ids, -self.df[token_ids]))]
+
+    def _trigram_tokens(self, key):
+        i = np.searchsorted(self.tri_keys, key)
+        if i < len(self.tri_keys) and self.tri_keys[i] == key:
+            return self.tri_tokens[self.tri_offsets[i]:self.tri_offsets[i + 1]]
+        return self.tri_tokens[:0]
+
+    def substring_matches(self, term):
+        """Word ids containing term (len >= MIN_SUBSTRING)"""
+        if len(term) < MIN_SUBSTRING:
+            return np.empty(0, dtype=np.int64)
+        lists = sorted((self._trigram_tokens(key) for key in _trigram_keys(term)), key=len)
+        candidates = lists[0]
+        for tokens in lists[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, tokens, assume_unique=True)
+        return np.array([t for t in candidates.tolist() if term in self.vocab[t]], dtype=np.int64)
+
+    def fuzzy_matches(self, term):
+        """Word ids within a small edit distance of term"""
+        max_edits = _max_edits(term)
+        if not max_edits:
+            return np.empty(0, dtype=np.int64)
+        keys = _trigram_keys('$' + term + '$')
+        lists = [self._trigram_tokens(key) for key in keys]
+        if not any(len(tokens) for tokens in lists):
+            return np.empty(0, dtype=np.int64)
+
+        # Each edit changes at most 3 padded trigrams and the length by 1
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.vocab))
+        candidates = np.nonzero((shared >= max(1, len(keys) - 3 * max_edits)) &
+                                (np.abs(self.lengths - len(term)) <= max_edits))[0]
+        if len(candidates) > MAX_FUZZY_CANDIDATES:
+            candidates = candidates[np.argsort(-shared[candidates], kind='stable')[:MAX_FUZZY_CANDIDATES]]
+        return np.array([t for t in candidates.tolist()
+                         if edit_distance(term, self.vocab[t], max_edits) <= max_edits], dtype=np.int64)
+
+    def expand(self, term, prefix=False):
+        """(word ids, match multipliers) an indexed query term matches
+
+        Exact word first; with prefix, words starting with the term; only
+        when neither exists, substring and then typo matches.
+        """
+        exact = self.token_id(term)
+        token_ids = [] if exact is None else [exact]
+        qualities = [EXACT] * len(token_ids)
+
+        if prefix:
+            lo, hi = self.prefix_range(term)
+            others = np.arange(lo, hi)
+            others = self._most_frequent(others[others != exact]).tolist()
+            token_ids += others
+            qualities += [PREFIX] * len(others)
+
+        if not token_ids:
+            for matches, quality in ((self.substring_matches, SUBSTRING), (self.fuzzy_matches, FUZZY)):
+                found = self._most_frequent(matches(term)).tolist()
+                if found:
+                    token_ids, qualities = found, [quality] * len(found)
+                    break
+
+        return np.array(token_ids, dtype=np.int64), np.array(qualities, dtype=np.int32)
+
+    # Query evaluation
+
+    def _term_groups(self, token_ids, qualities):
+        """(group ids, scores) for an expanded term"""
+        first = self.token_offsets[token_ids]
+        counts = self.token_offsets[token_ids + 1] - first
+        groups = _ranges_to_indices(first, first + counts)
+        scores = self.group_scores[groups].astype(np.int32) * np.repeat(qualities, counts)
+        return groups, scores
+
+    def _window_parts(self, groups, lo_row, hi_row):
+        """Slices of each group's rows falling in [lo_row, hi_row)"""
+        parts = []
+        for group in groups.tolist():
+            group_rows = self.postings[self.group_offsets[group]:self.group_offsets[group + 1]]
+            lo, hi = np.searchsorted(group_rows, (lo_row, hi_row))
+            if hi > lo:
+                parts.append(group_rows[lo:hi])
+        return parts
+
+    def _window_mask(self, parts, lo_row, hi_row):
+        """Boolean mask over [lo_row, hi_row) of rows in any of parts"""
+        mask = np.zeros(hi_row - lo_row, dtype=bool)
+        for part in parts:
+            mask[part - lo_row] = True
+        return mask
+
+    def _rows_between(self, groups, lo_row, hi_row):
+        """Sorted distinct rows in [lo_row, hi_row) from any of groups"""
+        parts = self._window_parts(groups, lo_row, hi_row)
+        if not parts:
+            return self.postings[:0]
+        if len(parts) == 1:
+            return parts[0]
+        return np.flatnonzero(self._window_mask(parts, lo_row, hi_row)) + lo_row
+
+    def _contains(self, groups, rows):
+        """Mask of sorted rows present in any of groups"""
+        mask = np.zeros(len(rows), dtype=bool)
+        for group in groups.tolist():
+            group_rows = self.postings[self.group_offsets[group]:self.group_offsets[group + 1]]
+            pos = np.searchsorted(group_rows, rows)
+            pos[pos == len(group_rows)] = 0
+            mask |= group_rows[pos] == rows
+        return mask
+
+    def _first_common(self, levels, need, seen):
+        """Lowest need rows present in every level (each a set of groups), minus seen
+
+        levels are (groups, facility count) pairs, smallest first; rows of
+        the first level are checked against the others. Walks the row space
+        in doubling windows so dense intersections stop after the first one.
+        """
+        found = []
+        count = 0
+        lo_row = 0
+        # Size the first window to hold ~2x need matches if the levels were
+        # independent, so sparse intersections do not crawl
+        density = math.prod(size / self.rows for _, size in levels)
+        window = int(min(max(FIRST_WINDOW, 2 * need / max(density, 1e-12)), self.rows))
+        while lo_row < self.rows and count < need:
+            hi_row = min(lo_row + window, self.rows)
+            common = self._rows_between(levels[0][0], lo_row, hi_row)
+            for groups, size in levels[1:]:
+                if not len(common):
+                    break
+                # Probe each group for the candidates, or read the level's
+                # rows in the window when that is the smaller job
+                if len(common) * len(groups) <= size * (hi_row - lo_row) / self.rows:
+                    common = common[self._contains(groups, common)]
+                else:
+                    parts = self._window_parts(groups, lo_row, hi_row)
+                    common = common[self._window_mask(parts, lo_row, hi_row)[common - lo_row]]
+            if len(seen) and len(common):
+                common = common[~np.isin(common, seen, assume_unique=True)]
+            found.append(common[:need - count])
+            count += len(found[-1])
+            lo_row = hi_row
+            window *= 2
+        return np.concatenate(found) if found else self.postings[:0]
+
+    def _materialize(self, groups, scores):
+        """(rows, best score per row) of a term, sorted by row"""
+        lo = self.group_offsets[groups]
+        hi = self.group_offsets[groups + 1]
+        rows = self.postings[_ranges_to_indices(lo, hi)]
+        row_scores = np.repeat(scores, hi - lo)
+        order = np.lexsort((-row_scores, rows))
+        rows, row_scores = rows[order], row_scores[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        return rows[first], row_scores[first]
+
+    def _best_scores(self, groups, scores, rows):
+        """Best score of a term for each of sorted rows (0 = absent)"""
+        best = np.zeros(len(rows), dtype=np.int32)
+        for group, score in zip(groups.tolist(), scores.tolist()):
+            group_rows = self.postings[self.group_offsets[group]:self.group_offsets[group + 1]]
+            pos = np.searchsorted(group_rows, rows)
+            pos[pos == len(group_rows)] = 0
+            hit = group_rows[pos] == rows
+            best[hit] = np.maximum(best[hit], score)
+        return best
+
+    def _top_rare(self, expanded, limit):
+        """Top rows when one term is rare: score its rows against the rest"""
+        expanded = sorted(expanded, key=lambda term: self._term_size(term[0]))
+        rows, row_scores = self._materialize(*expanded[0])
+        for groups, scores in expanded[1:]:
+            best = self._best_scores(groups, scores, rows)
+            keep = best > 0
+            rows, row_scores = rows[keep], row_scores[keep] + best[keep]
+
+        # Highest score first, then lowest row
+        keys = (row_scores.astype(np.int64) << 32) | (0xFFFFFFFF - rows.astype(np.int64))
+        if len(keys) > limit:
+            top = np.argpartition(-keys, limit - 1)[:limit]
+            rows, row_scores, keys = rows[top], row_scores[top], keys[top]
+        order = np.argsort(-keys)
+        return rows[order], row_scores[order]
+
+    def _term_size(self, groups):
+        return int((self.group_offsets[groups + 1] - self.group_offsets[groups]).sum())
+
+    def _top_single(self, groups, scores, limit):
+        """Top rows for one term, reading only the front of each group"""
+        result_rows = []
+        result_scores = []
+        seen = np.empty(0, dtype=np.int32)
+        for score in np.unique(scores)[::-1].tolist():
+            level = groups[scores == score]
+            lo = self.group_offsets[level]
+            hi = np.minimum(self.group_offsets[level + 1], lo + limit)
+            rows = np.unique(self.postings[_ranges_to_indices(lo, hi)])
+            if len(seen):
+                rows = rows[~np.isin(rows, seen, assume_unique=True)]
+            rows = rows[:limit - len(seen)]
+            result_rows.append(rows)
+            result_scores.append(np.full(len(rows), score, dtype=np.int32))
+            seen = np.concatenate((seen, rows))
+            if len(seen) >= limit:
+                break
+        if not result_rows:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+        return np.concatenate(result_rows), np.concatenate(result_scores)
+
+    def search_scored(self, query, limit=SEARCH_LIMIT, prefix=True):
+        """(rows, scores) best first for a free-text query
+
+        Every word must match. With prefix, the last word may also match as
+        a prefix (search-as-you-type); a trailing space turns that off.
+        """
+        terms = tokenize(query)
+        if not terms or limit <= 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+        prefix = prefix and not query[-1:].isspace()
+
+        expanded = []
+        for term in dict.fromkeys(terms):
+            token_ids, qualities = self.expand(term, prefix and term == terms[-1])
+            if not len(token_ids):
+                return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+            expanded.append(self._term_groups(token_ids, qualities))
+
+        if len(expanded) == 1:
+            return self._top_single(*expanded[0], limit)
+        if min(self._term_size(groups) for groups, _ in expanded) <= RARE_TERM_ROWS:
+            return self._top_rare(expanded, limit)
+
+        # Each term's groups split into score levels, best first. A row's
+        # score is the sum of its best level per term, so walking level
+        # combinations by total score yields results best first; stop once
+        # limit rows are found.
+        levels = []
+        for groups, scores in expanded:
+            group_sizes = self.group_offsets[groups + 1] - self.group_offsets[groups]
+            levels.append([(score, groups[scores == score], int(group_sizes[scores == score].sum()))
+                           for score in np.unique(scores)[::-1].tolist()])
+
+        # Long queries: fold the term with most levels' two lowest levels into
+        # one (scored as the lower) until the combinations stay bounded
+        while math.prod(len(term_levels) for term_levels in levels) > MAX_COMBOS:
+            term_levels = max(levels, key=len)
+            (_, groups_a, size_a), (score, groups_b, size_b) = term_levels[-2:]
+            term_levels[-2:] = [(score, np.concatenate((groups_a, groups_b)), size_a + size_b)]
+
+        combos = {}
+        for combo in itertools.product(*levels):
+            combos.setdefault(sum(level[0] for level in combo), []).append(
+                [level[1:] for level in sorted(combo, key=lambda level: level[2])])
+
+        result_rows = []
+        result_scores = []
+        seen = np.empty(0, dtype=np.int32)
+        for total in sorted(combos, reverse=True):
+            need = limit - len(seen)
+            rows = np.unique(np.concatenate([self._first_common(combo, need, seen) for combo in combos[total]]))
+            rows = rows[:need]
+            result_rows.append(rows)
+            result_scores.append(np.full(len(rows), total, dtype=np.int32))
+            seen = np.concatenate((seen, rows))
+            if len(seen) >= limit:
+                break
+        return np.concatenate(result_rows), np.concatenate(result_scores)
+
+    def search(self, query, limit=SEARCH_LIMIT, prefix=True):
+        """Dataset rows matching query, best first"""
+        return self.search_scored(query, limit, prefix)[0].tolist()
+
+    def suggest(self, text, limit=SUGGEST_LIMIT):
+        """Autocomplete the last word of text: [(completed text, facility count)]
+
+        Completions are indexed words starting with the last word, most
+        facilities first; earlier words are kept as typed (folded).
+        """
+        terms = tokenize(text)
+        if not terms or text[-1:].isspace():
+            return []
+        lo, hi = self.prefix_range(terms[-1])
+        head = ' '.join(terms[:-1] + [''])
+        return [(head + self.vocab[t], int(self.df[t]))
+                for t in self._most_frequent(np.arange(lo, hi), limit).tolist()]
+
+
+def load_or_build(data, path=INDEX_FILE, source=None):
+    """Saved index if it covers data, otherwise a fresh in-memory build
+
+    The saved index is used when it has one row per facility, was built for
+    the current FIELDS and, if source (the dataset file) is given, is not
+    older than it.
+    """
+    try:
+        if source is None or os.path.getmtime(path) >= os.path.getmtime(source):
+            index = SearchIndex.load(path)
+            if len(index) == len(data):
+                return index
+    except (OSError, ValueError, KeyError):
+        pass
+    return SearchIndex.from_records(data)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--query':
+        index_file = sys.argv[3] if len(sys.argv) > 3 else INDEX_FILE
+        index = SearchIndex.load(index_file)
+        start = time.perf_counter()
+        rows, scores = index.search_scored(sys.argv[2])
+        elapsed = time.perf_counter() - start
+        print(f"{len(rows)} results in {elapsed*1000:.3f}ms")
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            print(f"  row {row:<8} score {score}")
+        sys.exit(0)
+
+    input_file = sys.argv[1] if len(sys.argv) > 1 else INPUT_FILE
+    output_file = sys.argv[2] if len(sys.argv) > 2 else INDEX_FILE
+
+    start = time.perf_counter()
+    index = SearchIndex.from_json(input_file)
+    index.save(output_file)
+    elapsed = time.perf_counter() - start
+    print(f"[SUCCESS] Indexed {len(index)} facilities ({len(index.vocab)} words) into {output_file} "
+          f"in {elapsed*1000:.1f}ms")
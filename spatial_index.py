@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Spatial Index for ATLAS Data Center Project
+
+Python-side equivalent of the map's Radius Search / Proximity Analysis for
+batch jobs, without computing haversineDistance against every facility.
+
+Points are bucketed into a fixed lat/lon grid and stored sorted by cell key,
+so a query only touches the cells its search area covers:
+- within_radius(lat, lon, km) - facilities within km, nearest first
+- nearest(lat, lon, k)        - k nearest facilities
+- bbox(south, west, north, east) - facilities inside a bounding box
+  (west > east crosses the antimeridian)
+
+Candidates are filtered with exact haversine distances (same formula and
+Earth radius as index.html). The index saves to a .npz file so it is not
+rebuilt on every start.
+
+Usage:
+    python spatial_index.py [input.json] [output.npz]
+"""
+
+import math
+import sys
+import time
+
+import numpy as np
+
+INPUT_FILE = 'datacenters_cleaned.json'
+INDEX_FILE = 'datacenters_cleaned.spatial.npz'
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+DEFAULT_CELL_DEGREES = 0.5
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Haversine distance in km from one point to arrays of points"""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - np.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _ranges_to_indices(lo, hi):
+    """Concatenate arange(lo[i], hi[i]) for all i without a Python loop"""
+    lengths = hi - lo
+    keep = lengths > 0
+    lo, lengths = lo[keep], lengths[keep]
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # Each run starts at lo[i]; within a run indices step by 1
+    steps = np.ones(total, dtype=np.int64)
+    run_starts = np.cumsum(lengths)[:-1]
+    steps[0] = lo[0]
+    steps[run_starts] = lo[1:] - (lo[:-1] + lengths[:-1] - 1)
+    return np.cumsum(steps)
+
+
+class SpatialIndex:
+    """Grid index over facility coordinates"""
+
+    def __init__(self, lats, lons, ids=None, cell_degrees=DEFAULT_CELL_DEGREES):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        ids = np.arange(len(lats), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+
+        self.cell_degrees = float(cell_degrees)
+        self.n_lat = int(math.ceil(180 / self.cell_degrees))
+        self.n_lon = int(math.ceil(360 / self.cell_degrees))
+
+        keys = self._keys(lats, lons)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.lats = lats[order]
+        self.lons = lons[order]
+        self.ids = ids[order]
+
+    @classmethod
+    def from_records(cls, data, cell_degrees=DEFAULT_CELL_DEGREES):
+        """Build from facility dicts; ids are positions in data"""
+        ids = [i for i, dc in enumerate(data) if dc.get('city_coords')]
+        coords = np.array([data[i]['city_coords'] for i in ids], dtype=np.float64).reshape(-1, 2)
+        return cls(coords[:, 0], coords[:, 1], ids, cell_degrees)
+
+    @classmethod
+    def from_json(cls, path=INPUT_FILE, cell_degrees=DEFAULT_CELL_DEGREES):
+        """Build from a JSON dataset file"""
+        from dataset_io import load_dataset
+        return cls.from_records(load_dataset(path), cell_degrees)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Grid helpers
+
+    def _lat_cells(self, lats):
+        return np.clip(np.floor((np.asarray(lats) + 90) / self.cell_degrees).astype(np.int64), 0, self.n_lat - 1)
+
+    def _lon_cells(self, lons):
+        return np.floor((np.asarray(lons) + 180) / self.cell_degrees).astype(np.int64) % self.n_lon
+
+    def _lon_cell_clipped(self, lon):
+        return min(max(int(math.floor((lon + 180) / self.cell_degrees)), 0), self.n_lon - 1)
+
+    def _keys(self, lats, lons):
+        return self._lat_cells(lats) * self.n_lon + self._lon_cells(lons)
+
+    def _candidates(self, south, north, lon_intervals):
+        """Row positions of points in cells covering [south, north] x lon intervals
+
+        lon_intervals is a list of (west, east) with west <= east, or None for
+        every longitude.
+        """
+        rows = np.arange(self._lat_cells(south), self._lat_cells(north) + 1, dtype=np.int64)
+        if lon_intervals is None:
+            cell_ranges = [(0, self.n_lon - 1)]
+        else:
+            # Intervals never wrap, so clip instead of wrapping: east == 180
+            # must map to the last cell, not back to cell 0
+            cell_ranges = []
+            for first, last in sorted((self._lon_cell_clipped(west), self._lon_cell_clipped(east))
+                                      for west, east in lon_intervals):
+                # Both sides of a near-360 span can land in the same cell -
+                # merge so no cell is scanned twice
+                if cell_ranges and first <= cell_ranges[-1][1] + 1:
+                    cell_ranges[-1] = (cell_ranges[-1][0], max(last, cell_ranges[-1][1]))
+                else:
+                    cell_ranges.append((first, last))
+
+        lo_parts = []
+        hi_parts = []
+        for first, last in cell_ranges:
+            lo_parts.append(np.searchsorted(self.keys, rows * self.n_lon + first, 'left'))
+            hi_parts.append(np.searchsorted(self.keys, rows * self.n_lon + last + 1, 'left'))
+        return _ranges_to_indices(np.concatenate(lo_parts), np.concatenate(hi_parts))
+
+    @staticmethod
+    def _lon_intervals(west, east):
+        """Split a longitude span into non-wrapping intervals (None = all)"""
+        if east - west >= 360:
+            return None
+        west = (west + 180) % 360 - 180
+        east = (east + 180) % 360 - 180
+        if west <= east:
+            return [(west, east)]
+        return [(west, 180.0), (-180.0, east)]
+
+    # Queries
+
+    def within_radius(self, lat, lon, km):
+        """Facilities within km of (lat, lon) -> (ids, distances_km), nearest first"""
+        angle = km / EARTH_RADIUS_KM
+        dlat = math.degrees(angle)
+        south, north = lat - dlat, lat + dlat
+
+        if south <= -90 or north >= 90 or angle >= math.pi / 2:
+            # Cap reaches a pole - every longitude is in range
+            lon_intervals = None
+        else:
+            dlon = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(lat)))))
+            lon_intervals = self._lon_intervals(lon - dlon, lon + dlon)
+
+        rows = self._candidates(max(south, -90.0), min(north, 90.0), lon_intervals)
+        distances = haversine_km(lat, lon, self.lats[rows], self.lons[rows])
+        inside = distances <= km
+        rows, distances = rows[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return self.ids[rows[order]], distances[order]
+
+    def nearest(self, lat, lon, k=1):
+        """k nearest facilities to (lat, lon) -> (ids, distances_km), nearest first"""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Grow the search radius until it holds k points; every point within
+        # the radius is exact, so the k nearest are among them
+        km = self.cell_degrees * KM_PER_DEGREE
+        max_km = math.pi * EARTH_RADIUS_KM
+        while True:
+            ids, distances = self.within_radius(lat, lon, km)
+            if len(ids) >= k or km >= max_km:
+                return ids[:k], distances[:k]
+            km = min(km * 2, max_km)
+
+    def bbox(self, south, west, north, east):
+        """Facility ids inside a bounding box (west > east crosses the antimeridian)"""
+        lon_intervals = self._lon_intervals(west, east) if west <= east else self._lon_intervals(west, east + 360)
+        rows = self._candidates(max(south, -90.0), min(north, 90.0), lon_intervals)
+
+        lats = self.lats[rows]
+        lons = self.lons[rows]
+        inside = (lats >= south) & (lats <= north)
+        if west <= east:
+            inside &= (lons >= west) & (lons <= east)
+        else:
+            inside &= (lons >= west) | (lons <= east)
+        return np.sort(self.ids[rows[inside]])
+
+    # Serialization
+
+    def save(self, path=INDEX_FILE):
+        np.savez(path, keys=self.keys, lats=self.lats, lons=self.lons, ids=self.ids,
+                 cell_degrees=np.array(self.cell_degrees))
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        """Load a saved index without re-sorting"""
+        with np.load(path) as saved:
+            index = cls.__new__(cls)
+            index.cell_degrees = float(saved['cell_degrees'])
+            index.n_lat = int(math.ceil(180 / index.cell_degrees))
+            index.n_lon = int(math.ceil(360 / index.cell_degrees))
+            index.keys = saved['keys']
+            index.lats = saved['lats']
+            index.lons = saved['lons']
+            index.ids = saved['ids']
+        return index
+
+
+if __name__ == '__main__':
+    input_file = sys.argv[1] if len(sys.argv) > 1 else INPUT_FILE
+    output_file = sys.argv[2] if len(sys.argv) > 2 else INDEX_FILE
+
+    start = time.perf_counter()
+    index = SpatialIndex.from_json(input_file)
+    index.save(output_file)
+    elapsed = time.perf_counter() - start
+    print(f"[SUCCESS] Indexed {len(index)} facilities into {output_file} in {elapsed*1000:.1f}ms")
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Incremental Statistics for ATLAS Data Center Project
+
+Keeps the dataset aggregates behind STATISTICS.md and /api/stats up to date
+as records change, instead of recounting the whole list with Counter.
+
+Aggregates:
+- facilities per country and per company (so country/company totals)
+- facilities per region (derived from the country counts)
+- coordinate coverage tier per record: valid, missing, out_of_range,
+  null_island, outside_country (coord_validation reasons that depend only on
+  the record itself)
+- records with a country / with a state
+
+Built once from the records (one vectorized validation pass), then updated
+with per-record deltas: add_record / remove_record / replace_record, or
+update_rows(data, rows) for rows edited in place. STATISTICS.md and the stats
+JSON are rendered from that state without touching the dataset. The stats
+JSON also holds the full counts, so the state can be reloaded and kept
+current from there.
+
+Usage:
+    python stats_engine.py [input.json] [STATISTICS.md] [stats.json]
+"""
+
+import datetime
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from coord_validation import DUPLICATE_SENTINEL, REASONS, coords_to_arrays, get_validator
+
+INPUT_FILE = 'datacenters_cleaned.json'
+MARKDOWN_FILE = 'STATISTICS.md'
+STATS_FILE = 'datacenters_cleaned.stats.json'
+
+TOP_N = 20
+REGION_TOP = 10
+UNKNOWN_COUNTRY = 'Unknown'
+OTHER_REGION = 'Other'
+
+# Coverage tiers: per-record validation reasons (duplicate sentinels depend
+# on other records, so they count as valid here)
+TIERS = [REASONS[code] for code in sorted(REASONS) if code != DUPLICATE_SENTINEL]
+
+REGIONS = {
+    'North America': [
+        'United States', 'Canada', 'Mexico', 'Greenland', 'Bermuda', 'Belize', 'Costa Rica', 'El Salvador',
+        'Guatemala', 'Honduras', 'Nicaragua', 'Panama', 'Antigua and Barbuda', 'Aruba', 'Bahamas', 'Barbados',
+        'British Virgin Islands', 'Cayman Islands', 'Cuba', 'Curaçao', 'Dominica', 'Dominican Republic',
+        'Grenada', 'Guadeloupe', 'Haiti', 'Jamaica', 'Martinique', 'Puerto Rico', 'Saint Kitts and Nevis',
+        'Saint Lucia', 'Saint Vincent and the Grenadines', 'Trinidad', 'Trinidad and Tobago',
+        'US Virgin Islands',
+    ],
+    'South America': [
+        'Argentina', 'Bolivia', 'Brazil', 'Chile', 'Colombia', 'Ecuador', 'French Guiana', 'Guyana',
+        'Paraguay', 'Peru', 'Suriname', 'Uruguay', 'Venezuela',
+    ],
+    'Europe': [
+        'Albania', 'Andorra', 'Armenia', 'Austria', 'Azerbaijan', 'Belarus', 'Belgium', 'Bosnia',
+        'Bosnia and Herzegovina', 'Bulgaria', 'Croatia', 'Cyprus', 'Czech Republic', 'Denmark', 'Estonia',
+        'Faroe Islands', 'Finland', 'France', 'Georgia', 'Germany', 'Gibraltar', 'Greece', 'Guernsey',
+        'Hungary', 'Iceland', 'Ireland', 'Isle of Man', 'Italy', 'Jersey', 'Kosovo', 'Latvia',
+        'Liechtenstein', 'Lithuania', 'Luxembourg', 'Malta', 'Moldova', 'Monaco', 'Montenegro',
+        'Netherlands', 'North Macedonia', 'Norway', 'Poland', 'Portugal', 'Romania', 'Russia', 'San Marino',
+        'Serbia', 'Slovakia', 'Slovenia', 'Spain', 'Sweden', 'Switzerland', 'Ukraine', 'United Kingdom',
+    ],
+    'Middle East': [
+        'Bahrain', 'Iran', 'Iraq', 'Israel', 'Jordan', 'Kuwait', 'Lebanon', 'Oman', 'Palestine', 'Qatar',
+        'Saudi Arabia', 'Syria', 'Turkey', 'United Arab Emirates', 'Yemen',
+    ],
+    'Africa': [
+        'Algeria', 'Angola', 'Benin', 'Botswana', 'Burkina Faso', 'Burundi', 'Cameroon', 'Cape Verde',
+        'Central African Republic', 'Chad', 'Comoros', 'Congo', "Côte d'Ivoire",
+        'Democratic Republic of the Congo', 'Djibouti', 'Egypt', 'Equatorial Guinea', 'Eritrea', 'Eswatini',
+        'Ethiopia', 'Gabon', 'Gambia', 'Ghana', 'Guinea', 'Guinea-Bissau', 'Kenya', 'Lesotho', 'Liberia',
+        'Libya', 'Madagascar', 'Malawi', 'Mali', 'Mauritania', 'Mauritius', 'Morocco', 'Mozambique',
+        'Namibia', 'Niger', 'Nigeria', 'Republic of the Congo', 'Réunion', 'Rwanda', 'Senegal', 'Seychelles',
+        'Sierra Leone', 'Somalia', 'South Africa', 'South Sudan', 'Sudan', 'Swaziland', 'Tanzania', 'Togo',
+        'Tunisia', 'Uganda', 'Zambia', 'Zimbabwe',
+    ],
+    'Asia-Pacific': [
+        'Afghanistan', 'Australia', 'Bangladesh', 'Bhutan', 'Brunei', 'Cambodia', 'China', 'East Timor',
+        'Fiji', 'French Polynesia', 'Guam', 'Hong Kong', 'India', 'Indonesia', 'Japan', 'Kazakhstan',
+        'Kyrgyzstan', 'Laos', 'Macau', 'Malaysia', 'Maldives', 'Mongolia', 'Myanmar', 'Nepal',
+        'New Caledonia', 'New Zealand', 'North Korea', 'Pakistan', 'Papua New Guinea', 'Philippines',
+        'Samoa', 'Singapore', 'Solomon Islands', 'South Korea', 'Sri Lanka', 'Taiwan', 'Tajikistan',
+        'Thailand', 'Timor-Leste', 'Tonga', 'Turkmenistan', 'Uzbekistan', 'Vanuatu', 'Vietnam',
+    ],
+}
+COUNTRY_REGION = {country: region for region, countries in REGIONS.items() for country in countries}
+
+
+def region_of(country):
+    return COUNTRY_REGION.get(country, OTHER_REGION)
+
+
+def record_keys(data):
+    """Aggregation key (country, company, tier, has_state) per record"""
+    validator = get_validator()
+    lats, lons = coords_to_arrays(data)
+    codes = validator.country_codes([dc.get('country') for dc in data])
+    reasons = validator.validate_arrays(lats, lons, codes, duplicates=False)
+    return [(dc.get('country') or None, dc.get('company') or None, REASONS[reason], bool(dc.get('state')))
+            for dc, reason in zip(data, reasons.tolist())]
+
+
+class DatasetStats:
+    """Aggregates kept current with per-record deltas"""
+
+    def __init__(self):
+        self.total = 0
+        self.countries = Counter()
+        self.companies = Counter()
+        self.tiers = Counter()
+        self.with_state = 0
+        self.row_keys = None     # Per-row keys when built from records (for update_rows)
+
+    @classmethod
+    def from_records(cls, data):
+        stats = cls()
+        stats.row_keys = record_keys(data)
+        for key in stats.row_keys:
+            stats._apply(key, 1)
+        return stats
+
+    @classmethod
+    def from_json(cls, path=STATS_FILE):
+        """Restore the aggregate state saved by save_json"""
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        stats = cls()
+        stats.total = saved['total']
+        stats.with_state = saved['with_state']
+        stats.countries = Counter(saved['counts']['country'])
+        stats.companies = Counter(saved['counts']['company'])
+        stats.tiers = Counter(saved['coverage'])
+        stats.countries[None] = saved['total'] - saved['with_country']
+        stats.companies[None] = saved['counts']['company_missing']
+        stats._drop_zeros()
+        return stats
+
+    # Deltas
+
+    def _apply(self, key, sign):
+        country, company, tier, has_state = key
+        self.total += sign
+        self.countries[country] += sign
+        self.companies[company] += sign
+        self.tiers[tier] += sign
+        self.with_state += sign if has_state else 0
+
+    def _drop_zeros(self):
+        for counter in (self.countries, self.companies, self.tiers):
+            for value in [value for value, count in counter.items() if count <= 0]:
+                del counter[value]
+
+    def _delta(self, old_key, new_key):
+        if old_key == new_key:
+            return False
+        if old_key is not None:
+            self._apply(old_key, -1)
+        if new_key is not None:
+            self._apply(new_key, 1)
+        self._drop_zeros()
+        return True
+
+    def add_record(self, dc):
+        self._delta(None, record_keys([dc])[0])
+
+    def remove_record(self, dc):
+        self._delta(record_keys([dc])[0], None)
+
+    def replace_record(self, old, new):
+        """Account for old being replaced by new (e.g. an edited copy)"""
+        old_key, new_key = record_keys([old, new])
+        self._delta(old_key, new_key)
+
+    def update_rows(self, data, rows):
+        """Re-key rows of data edited in place (needs from_records); returns rows changed"""
+        rows = sorted(set(rows))
+        if not rows:
+            return 0
+        new_keys = record_keys([data[i] for i in rows])
+        changed = 0
+        for i, key in zip(rows, new_keys):
+            old_key = self.row_keys[i]
+            if old_key != key:
+                self._apply(old_key, -1)
+                self._apply(key, 1)
+                self.row_keys[i] = key
+                changed += 1
+        self._drop_zeros()
+        return changed
+
+    # Derived values
+
+    def known_countries(self):
+        return Counter({c: n for c, n in self.countries.items() if c is not None})
+
+    def known_companies(self):
+        return Counter({c: n for c, n in self.companies.items() if c is not None})
+
+    def regions(self):
+        """{region: Counter(country: facilities)} for countries with facilities"""
+        regions = {}
+        for country, count in self.known_countries().items():
+            regions.setdefault(region_of(country), Counter())[country] = count
+        return regions
+
+    def _percent(self, count):
+        return round(100.0 * count / self.total, 1) if self.total else 0.0
+
+    def _sorted(self, counter, limit=None):
+        return sorted(counter.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def to_json(self, full=True):
+        """Stats as a JSON-ready dict (full=False drops the complete counts)"""
+        countries = self.known_countries()
+        companies = self.known_companies()
+        regions = self.regions()
+        region_order = sorted(regions, key=lambda r: (-sum(regions[r].values()), r))
+        stats = {
+            'total': self.total,
+            'countries': len(countries),
+            'companies': len(companies),
+            'with_coords': self.total - self.tiers.get('missing', 0),
+            'with_country': sum(countries.values()),
+            'with_state': self.with_state,
+            'unknown_country': self.countries.get(None, 0) + countries.get(UNKNOWN_COUNTRY, 0),
+            'top_countries': [{'country': c, 'count': n, 'percent': self._percent(n)}
+                              for c, n in self._sorted(countries, TOP_N)],
+            'top_companies': [{'company': c, 'count': n, 'percent': self._percent(n)}
+                              for c, n in self._sorted(companies, TOP_N)],
+            'regions': [{'region': r, 'count': sum(regions[r].values()),
+                         'percent': self._percent(sum(regions[r].values())),
+                         'countries': [{'country': c, 'count': n} for c, n in self._sorted(regions[r], REGION_TOP)]}
+                        for r in region_order],
+            'coverage': {tier: self.tiers.get(tier, 0) for tier in TIERS},
+            'generated': datetime.date.today().isoformat(),
+        }
+        if full:
+            stats['counts'] = {
+                'country': dict(self._sorted(countries)),
+                'company': dict(self._sorted(companies)),
+                'company_missing': self.companies.get(None, 0),
+            }
+        return stats
+
+    def save_json(self, path=STATS_FILE):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def render_markdown(self):
+        """STATISTICS.md contents"""
+        stats = self.to_json(full=False)
+        lines = [
+            "# Global Data Center Statistics",
+            "",
+            "## Overview",
+            "",
+            f"- **Total Data Centers**: {stats['total']:,}",
+            f"- **Total Countries**: {stats['countries']:,}",
+            f"- **Total Companies**: {stats['companies']:,}",
+            "",
+            "---",
+            "",
+            f"## Top {TOP_N} Countries by Data Center Count",
+            "",
+            "| Rank | Country | Count | % of Total |",
+            "|------|---------|-------|-----------|",
+        ]
+        for rank, row in enumerate(stats['top_countries'], 1):
+            lines.append(f"| {rank} | {row['country']} | {row['count']:,} | {row['percent']:.1f}% |")
+
+        lines += [
+            "",
+            "---",
+            "",
+            f"## Top {TOP_N} Data Center Operators",
+            "",
+            "| Rank | Company | Facilities |",
+            "|------|---------|-----------|",
+        ]
+        for rank, row in enumerate(stats['top_companies'], 1):
+            lines.append(f"| {rank} | {row['company']} | {row['count']:,} |")
+
+        lines += ["", "---", "", "## Regional Distribution"]
+        for region in stats['regions']:
+            lines += ["", f"### {region['region']}"]
+            lines += [f"- {row['country']}: {row['count']:,}" for row in region['countries']]
+            lines.append(f"- **Total**: {region['count']:,} ({region['percent']:.1f}%)")
+
+        coverage = stats['coverage']
+        lines += [
+            "",
+            "---",
+            "",
+            "## Data Quality Metrics",
+            "",
+            f"- **Valid Coordinates**: {coverage['valid']:,} ({self._percent(coverage['valid']):.1f}%)",
+            f"- **Missing Coordinates**: {coverage['missing']:,} ({self._percent(coverage['missing']):.1f}%)",
+            f"- **Outside Country Bounds**: {coverage['outside_country']:,} "
+            f"({self._percent(coverage['outside_country']):.1f}%)",
+            f"- **Null Island / Out of Range**: {coverage['null_island'] + coverage['out_of_range']:,} "
+            f"({self._percent(coverage['null_island'] + coverage['out_of_range']):.1f}%)",
+            f"- **Records with State**: {stats['with_state']:,} ({self._percent(stats['with_state']):.1f}%)",
+            f"- **Records with Unknown Country**: {stats['unknown_country']:,} "
+            f"({self._percent(stats['unknown_country']):.1f}%)",
+            "",
+            "---",
+            "",
+            "*Statistics generated from datacenter intelligence database*",
+            f"*Last updated: {stats['generated']}*",
+            "",
+        ]
+        return '\n'.join(lines)
+
+    def save_markdown(self, path=MARKDOWN_FILE):
+        tmp_path = path + '.tmp'
+        # CRLF, as STATISTICS.md is committed with
+        with open(tmp_path, 'w', encoding='utf-8', newline='\r\n') as f:
+            f.write(self.render_markdown())
+        os.replace(tmp_path, path)
+
+
+def load_or_build(data, path=STATS_FILE, source=None):
+    """Saved stats if current (not older than source, same total), else built from data"""
+    try:
+        if source is None or os.path.getmtime(path) >= os.path.getmtime(source):
+            stats = DatasetStats.from_json(path)
+            if stats.total == len(data):
+                return stats
+    except (OSError, ValueError, KeyError):
+        pass
+    return DatasetStats.from_records(data)
+
+
+if __name__ == '__main__':
+    input_file = sys.argv[1] if len(sys.argv) > 1 else INPUT_FILE
+    markdown_file = sys.argv[2] if len(sys.argv) > 2 else MARKDOWN_FILE
+    stats_file = sys.argv[3] if len(sys.argv) > 3 else STATS_FILE
+
+    from dataset_io import load_dataset
+    data = load_dataset(input_file)
+
+    start = time.perf_counter()
+    stats = DatasetStats.from_records(data)
+    elapsed = time.perf_counter() - start
+
+    stats.save_markdown(markdown_file)
+    stats.save_json(stats_file)
+    print(f"[SUCCESS] Stats for {stats.total} facilities ({elapsed*1000:.1f}ms) -> {markdown_file}, {stats_file}")
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Tile Shards for ATLAS Data Center Project
+
+Splits datacenters_cleaned.json into slippy-map (Web Mercator, z/x/y) tiles
+at one zoom level, so the map or an API can fetch only the tiles covering
+the current viewport instead of the whole dataset from /api/all.
+
+Output (in the output directory):
+- {zoom}/{x}/{y}.json    minified JSON array of the tile's facilities
+                         (.json.gz with --gzip)
+- unlocated.json         facilities without usable coordinates
+- index.json             zoom, totals and per-tile entries keyed by quadkey:
+                         x, y, count, tile bounds, extent of the facilities
+                         in it and file size
+
+Tiles covering a viewport: tiles_for_bbox(south, west, north, east, zoom),
+or TileIndex.load(dir).tiles_for_bbox(...) for the non-empty ones only.
+Build time and the distribution of tile sizes / facility counts are
+reported.
+
+Usage:
+    python tile_shards.py [input.json] [--out tiles] [--zoom 6] [--gzip]
+"""
+
+import argparse
+import gzip
+import json
+import math
+import os
+import shutil
+import time
+
+import numpy as np
+
+from coord_validation import coords_to_arrays
+from dataset_io import replace_directory, staging_dir
+
+INPUT_FILE = 'datacenters_cleaned.json'
+OUTPUT_DIR = 'tiles'
+INDEX_NAME = 'index.json'
+UNLOCATED_NAME = 'unlocated.json'
+
+DEFAULT_ZOOM = 6
+MAX_ZOOM = 22
+MAX_LATITUDE = 85.0511287798066   # Web Mercator limit
+
+
+# Web Mercator tile math
+
+def lonlat_to_mercator(lats, lons):
+    """Web Mercator x, y in [0, 1] (y = 0 at the north edge)"""
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    lons = np.asarray(lons, dtype=np.float64)
+    lat_rad = np.radians(lats)
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0
+    return (lons + 180.0) / 360.0, y
+
+
+def mercator_to_lonlat(x, y):
+    """Inverse of lonlat_to_mercator -> (lats, lons)"""
+    lats = np.degrees(np.arctan(np.sinh(math.pi * (1.0 - 2.0 * np.asarray(y, dtype=np.float64)))))
+    return lats, np.asarray(x, dtype=np.float64) * 360.0 - 180.0
+
+
+def lonlat_to_tile(lats, lons, zoom):
+    """Tile x, y (int64 arrays) containing each point at zoom"""
+    n = 1 << zoom
+    x, y = lonlat_to_mercator(lats, lons)
+    return (np.clip(np.floor(x * n), 0, n - 1).astype(np.int64),
+            np.clip(np.floor(y * n), 0, n - 1).astype(np.int64))
+
+
+def tile_bounds(x, y, zoom):
+    """(south, west, north, east) of a tile in degrees"""
+    n = 1 << zoom
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def quadkey(x, y, zoom):
+    """Bing-style quadkey of a tile ('' at zoom 0)"""
+    digits = []
+    for level in range(zoom, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return ''.join(digits)
+
+
+def tiles_for_bbox(south, west, north, east, zoom):
+    """[(x, y)] of every tile covering a bounding box (west > east crosses the antimeridian)"""
+    n = 1 << zoom
+    (x0, x1), (y_top, y_bottom) = lonlat_to_tile([north, south], [west, east], zoom)
+    ys = range(int(y_top), int(y_bottom) + 1)
+    if east - west >= 360:
+        xs = range(n)
+    elif west <= east:
+        xs = range(int(x0), int(x1) + 1)
+    else:
+        xs = list(range(int(x0), n)) + list(range(0, int(x1) + 1))
+    return [(x, y) for x in xs for y in ys]
+
+
+# Build
+
+def tile_path(x, y, zoom, compress=False):
+    """Tile file path relative to the output directory"""
+    return f"{zoom}/{x}/{y}.json" + ('.gz' if compress else '')
+
+
+def _write(path, records, compress):
+    body = json.dumps(records, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if compress:
+        body = gzip.compress(body, compresslevel=9, mtime=0)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(body)
+    return len(body)
+
+
+def locate(data):
+    """Lat/lon arrays and a mask of facilities with usable (finite, in-range) coordinates"""
+    lats, lons = coords_to_arrays(data)
+    with np.errstate(invalid='ignore'):
+        located = np.isfinite(lats) & np.isfinite(lons) & (np.abs(lats) <= 90) & (np.abs(lons) <= 180)
+    return lats, lons, located
+
+
+def build_tiles(data, out_dir=OUTPUT_DIR, zoom=DEFAULT_ZOOM, compress=False):
+    """Write tile shards and index.json for data; returns the index dict
+
+    The new tile set is written next to out_dir and swapped in when
+    complete, so readers never see a half-built directory. An existing
+    out_dir that is not a tile set (no index.json with tiles) is left
+    alone and ValueError raised.
+    """
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f"zoom must be between 0 and {MAX_ZOOM}")
+
+    lats, lons, located = locate(data)
+    rows = np.flatnonzero(located)
+    xs, ys = lonlat_to_tile(lats[rows], lons[rows], zoom)
+
+    # Group rows by tile: one sort, then contiguous runs per key
+    keys = xs * (1 << zoom) + ys
+    order = np.argsort(keys, kind='stable')
+    keys, rows = keys[order], rows[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+    ends = np.r_[starts[1:], len(keys)].astype(np.int64)
+
+    tmp_dir = staging_dir(out_dir)
+    try:
+        tiles = {}
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            key = int(keys[start])
+            x, y = key >> zoom, key & ((1 << zoom) - 1)
+            members = rows[start:end]
+            path = tile_path(x, y, zoom, compress)
+            size = _write(os.path.join(tmp_dir, path), [data[i] for i in members.tolist()], compress)
+            tile_lats, tile_lons = lats[members], lons[members]
+            tiles[quadkey(x, y, zoom)] = {
+                'x': x,
+                'y': y,
+                'count': int(end - start),
+                'bounds': [round(v, 6) for v in tile_bounds(x, y, zoom)],
+                'extent': [float(tile_lats.min()), float(tile_lons.min()), float(tile_lats.max()), float(tile_lons.max())],
+                'path': path,
+                'bytes': size,
+            }
+
+        unlocated = np.flatnonzero(~located).tolist()
+        unlocated_path = UNLOCATED_NAME + ('.gz' if compress else '')
+        unlocated_size = _write(os.path.join(tmp_dir, unlocated_path), [data[i] for i in unlocated], compress)
+
+        index = {
+            'zoom': zoom,
+            'scheme': 'xyz',
+            'gzip': compress,
+            'total': len(data),
+            'located': int(len(rows)),
+            'unlocated': {'count': len(unlocated), 'path': unlocated_path, 'bytes': unlocated_size},
+            'tiles': tiles,
+        }
+        with open(os.path.join(tmp_dir, INDEX_NAME), 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    replace_directory(tmp_dir, out_dir, INDEX_NAME, 'tiles')
+    return index
+
+
+class TileIndex:
+    """Reader for a built tile set"""
+
+    def __init__(self, index, directory=OUTPUT_DIR):
+        self.index = index
+        self.directory = directory
+        self.zoom = index['zoom']
+        self.by_xy = {(tile['x'], tile['y']): tile for tile in index['tiles'].values()}
+
+    @classmethod
+    def load(cls, directory=OUTPUT_DIR):
+        with open(os.path.join(directory, INDEX_NAME), 'r', encoding='utf-8') as f:
+            return cls(json.load(f), directory)
+
+    def tiles_for_bbox(self, south, west, north, east):
+        """Index entries of the non-empty tiles covering a bounding box"""
+        return [self.by_xy[xy] for xy in tiles_for_bbox(south, west, north, east, self.zoom) if xy in self.by_xy]
+
+    def read(self, tile):
+        """Facilities of one tile entry"""
+        path = os.path.join(self.directory, tile['path'])
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def viewport(self, south, west, north, east):
+        """Facilities in the tiles covering a bounding box (may include some just outside it)"""
+        records = []
+        for tile in self.tiles_for_bbox(south, west, north, east):
+            records.extend(self.read(tile))
+        return records
+
+
+def print_report(index, elapsed):
+    tiles = list(index['tiles'].values())
+    print(f"\nBuilt {len(tiles)} tiles at zoom {index['zoom']} in {elapsed*1000:.1f}ms")
+    print(f"  Facilities: {index['located']} located, {index['unlocated']['count']} unlocated")
+    if not tiles:
+        return
+
+    sizes = np.array([tile['bytes'] for tile in tiles])
+    counts = np.array([tile['count'] for tile in tiles])
+    print(f"  Total size: {sizes.sum()/1024:.1f}KB ({'gzip' if index['gzip'] else 'minified JSON'})")
+    for label, values, unit in (('Tile size', sizes / 1024, 'KB'), ('Facilities per tile', counts, '')):
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        print(f"  {label:<20} min {values.min():8.1f}{unit}  p50 {p50:8.1f}{unit}  p90 {p90:8.1f}{unit}  "
+              f"p99 {p99:8.1f}{unit}  max {values.max():8.1f}{unit}")
+
+    print("\n  Largest tiles:")
+    for key, tile in sorted(index['tiles'].items(), key=lambda item: -item[1]['bytes'])[:5]:
+        south, west, north, east = tile['bounds']
+        print(f"    {tile['path']:<16} quadkey {key:<{index['zoom']}}  {tile['count']:6} facilities  "
+              f"{tile['bytes']/1024:8.1f}KB  ({south:.2f}, {west:.2f}) - ({north:.2f}, {east:.2f})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Split the dataset into slippy-map tile shards')
+    parser.add_argument('input', nargs='?', default=INPUT_FILE)
+    parser.add_argument('--out', default=OUTPUT_DIR)
+    parser.add_argument('--zoom', type=int, default=DEFAULT_ZOOM)
+    parser.add_argument('--gzip', action='store_true', help='write gzip-compressed tiles (.json.gz)')
+    args = parser.parse_args()
+
+    from dataset_io import load_dataset
+    data = load_dataset(args.input)
+
+    start = time.perf_counter()
+    try:
+        index = build_tiles(data, args.out, args.zoom, args.gzip)
+    except ValueError as e:
+        raise SystemExit(f"[ERROR] {e}")
+    print_report(index, time.perf_counter() - start)
+    print(f"\n[SUCCESS] Wrote {args.out}/{INDEX_NAME}")